@@ -1,7 +1,13 @@
 from __future__ import annotations
 from pathlib import Path
-import shutil, json, datetime, os
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import shutil, datetime, os, sys, time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+from .journal import (GROUP_MS, GROUP_OPS, JOURNAL_DIR, Journal, done_flags, journal_path, owner_alive,
+                      pending_journals, read_journal, truncate_to, undo_line_complete, write_undo_record)
+from .undo import rollback_batch
 
 def _open_folder_in_explorer(path: Path) -> None:
     """플랫폼별로 폴더 열기."""
@@ -17,7 +23,186 @@ def _open_folder_in_explorer(path: Path) -> None:
     except Exception:
         pass
 
-def apply_moves(move_map: Dict[Path, Path], undo_log: Path, mode: str = "move") -> str:
+@dataclass
+class MoveStats:
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    renamed: int = 0      # 같은 파일시스템: os.rename 빠른 경로
+    copied: int = 0       # 다른 장치(또는 copy 모드): 워커 풀에서 복사(+삭제)
+    by_devices: Dict[Tuple[int, int], int] = field(default_factory=dict)  # (원본 장치, 대상 장치) → 건수
+
+    @property
+    def files_per_s(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_s(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+class MoveExecutor:
+    """
+    이동 실행기.
+    - (원본 장치, 대상 장치)가 같으면 호출 스레드에서 os.rename (메타데이터만 변경)
+    - 장치가 다르거나 copy 모드면 workers 개 스레드 풀로 복사(+삭제), 대기 작업은 workers*2 로 제한
+    - 이미 확인/생성한 대상 폴더는 캐시하여 exists()/mkdir 을 반복하지 않음
+    """
+
+    def __init__(self, mode: str = "move", workers: int = 4):
+        self.mode = mode
+        self.workers = workers
+        self.stats = MoveStats()
+        self.created_dirs: List[Path] = []
+        self._dir_dev: Dict[Path, int] = {}
+
+    def _ensure_dir(self, d: Path) -> int:
+        """대상 폴더를 (필요하면) 만들고 그 장치 번호를 반환. 새로 만든 폴더는 상위까지 모두 기록."""
+        dev = self._dir_dev.get(d)
+        if dev is not None:
+            return dev
+        missing: List[Path] = []
+        p = d
+        while not p.exists() and p != p.parent:
+            missing.append(p)
+            p = p.parent
+        if missing:
+            d.mkdir(parents=True, exist_ok=True)
+            self.created_dirs.extend(reversed(missing))
+        dev = self._dir_dev[d] = os.stat(d).st_dev
+        return dev
+
+    def _slow(self, src: Path, dst: Path) -> None:
+        if self.mode == "copy":
+            shutil.copy2(str(src), str(dst))
+        else:
+            shutil.move(str(src), str(dst))
+
+    def run(self, pairs: Iterable[Tuple[Path, Path]], on_done: Optional[Callable[[Path, Path], None]] = None) -> None:
+        """pairs 를 실행. 완료될 때마다 on_done(src, dst) 호출(호출 스레드에서). 첫 오류는 남은 작업을 마친 뒤 다시 발생."""
+        t0 = time.perf_counter()
+        errors: List[BaseException] = []
+        inflight: Dict[Future, Tuple[Path, Path, int]] = {}
+
+        def reap(block: bool) -> None:
+            done, _ = wait(list(inflight), return_when=FIRST_COMPLETED) if block else (
+                [f for f in inflight if f.done()], None)
+            for fut in done:
+                src, dst, size = inflight.pop(fut)
+                try:
+                    fut.result()
+                except Exception as ex:
+                    errors.append(ex)
+                    continue
+                self.stats.copied += 1
+                self._count(size)
+                if on_done: on_done(src, dst)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="aifiler-move") as pool:
+            for src, dst in pairs:
+                if errors:
+                    break
+                try:
+                    dst_dev = self._ensure_dir(dst.parent)
+                    st = os.lstat(src)
+                except OSError as ex:
+                    errors.append(ex)
+                    break
+                pair_key = (st.st_dev, dst_dev)
+                self.stats.by_devices[pair_key] = self.stats.by_devices.get(pair_key, 0) + 1
+                if self.mode != "copy" and st.st_dev == dst_dev:
+                    try:
+                        os.rename(src, dst)
+                        self.stats.renamed += 1
+                        self._count(st.st_size)
+                        if on_done: on_done(src, dst)
+                        continue
+                    except OSError:
+                        pass  # (예: Windows 에서 대상이 이미 있음) → shutil.move 로 처리
+                inflight[pool.submit(self._slow, src, dst)] = (src, dst, st.st_size)
+                if len(inflight) >= self.workers * 2:
+                    reap(block=True)
+                elif inflight:
+                    reap(block=False)
+            while inflight:
+                reap(block=True)
+        self.stats.seconds += time.perf_counter() - t0
+        if errors:
+            raise errors[0]
+
+    def _count(self, size: int) -> None:
+        self.stats.files += 1
+        self.stats.bytes += size
+
+IndexedMove = Tuple[int, Path, Path]
+
+def _journaled_run(ex: MoveExecutor, j: Journal, items: Iterable[IndexedMove], flags: bytearray,
+                   write_intents: bool = True, progress: Optional[Callable[[MoveStats], None]] = None) -> None:
+    """
+    group_ops 개씩 intent 를 기록하고 fsync 한 뒤에야 그 묶음을 실행(선행 기록).
+    완료(done)·폴더 생성(mkdir) 기록은 그룹 커밋으로 모아서 fsync.
+    progress 를 주면 이동이 하나 끝날 때마다 progress(ex.stats) 호출.
+    """
+    pos: Dict[Path, int] = {}
+    logged = [0]
+
+    def log_dirs() -> None:
+        # 폴더 생성은 드물므로 바로 fsync(롤백 때 빈 폴더가 남지 않도록)
+        if len(ex.created_dirs) > logged[0]:
+            for d in ex.created_dirs[logged[0]:]:
+                j.write({"t": "mkdir", "path": str(d)}, sync=False)
+            logged[0] = len(ex.created_dirs)
+            j.sync()
+
+    def chunks() -> Iterator[Tuple[Path, Path]]:
+        it = iter(items)
+        while True:
+            chunk = list(islice(it, j.group_ops))
+            if not chunk:
+                return
+            for i, src, dst in chunk:
+                if write_intents:
+                    j.write({"t": "intent", "i": i, "src": str(src), "dst": str(dst)}, sync=False)
+                if i >= len(flags):
+                    flags.extend(b"\0" * (i + 1 - len(flags)))
+                pos[src] = i
+            log_dirs()
+            j.sync()
+            for _, src, dst in chunk:
+                yield src, dst
+
+    def on_done(src: Path, dst: Path) -> None:
+        i = pos.pop(src)
+        flags[i] = 1
+        log_dirs()
+        j.write({"t": "done", "i": i})
+        if progress: progress(ex.stats)
+
+    try:
+        ex.run(chunks(), on_done)
+    finally:
+        log_dirs()
+        j.sync()
+
+def _commit(j: Journal, undo_log: Path, header: Dict[str, Any], flags: bytearray, created_dirs: List[str],
+            extra: Optional[Dict[str, Any]] = None) -> None:
+    """
+    undo.jsonl 의 현재 끝 위치를 저널에 먼저 남기고, 완료분을 배치 레코드로 스트리밍한 뒤 저널 삭제.
+    완료된 이동도 새로 만든 폴더도 없으면(예: 첫 이동부터 실패) 빈 배치를 남기지 않고 저널만 지움.
+    """
+    if not any(flags) and not created_dirs:
+        j.close(remove=True)
+        return
+    undo_log.parent.mkdir(parents=True, exist_ok=True)
+    off = undo_log.stat().st_size if undo_log.exists() else 0
+    j.write({"t": "commit", "undo_off": off}, sync=False)
+    j.sync()
+    write_undo_record(j.path, undo_log, header, flags, created_dirs, extra)
+    j.close(remove=True)
+
+def apply_moves_with_stats(move_map: Union[Mapping[Path, Path], Iterable[Tuple[Path, Path]]], undo_log: Path,
+                           mode: str = "move", workers: int = 4, journal_dir: Path = JOURNAL_DIR,
+                           group_ops: int = GROUP_OPS, group_ms: float = GROUP_MS,
+                           progress: Optional[Callable[[MoveStats], None]] = None) -> Tuple[str, MoveStats]:
     """
     한 번의 '적용' 버튼 클릭을 배치 1건으로 기록.
     로그 레코드 구조:
@@ -28,39 +213,100 @@ def apply_moves(move_map: Dict[Path, Path], undo_log: Path, mode: str = "move")
       "moves": [ {"src": "...", "dst": "..."} , ... ],
       "created_dirs": ["...", "..."]   # 이번 적용 중 새로 만든 폴더들
     }
-    반환값: 생성된 batch_id
+    이동 중에는 journal_dir 의 저널에 intent/done 을 스트리밍하고, 끝나면(오류로 중단돼도) 완료된 이동만
+    위 레코드로 옮김. 프로세스가 죽어 남은 저널은 recover_interrupted() 가 처리.
+    move_map 은 (src, dst) 제너레이터여도 됨(group_ops 개씩만 읽음). progress(stats) 는 이동 1건마다 호출.
+    반환값: (생성된 batch_id, 처리량 통계)
     """
-    undo_log.parent.mkdir(parents=True, exist_ok=True)
-
     now = datetime.datetime.utcnow().isoformat()
     batch_id = now.replace(":", "").replace("-", "").replace(".", "")
+    header = {"id": batch_id, "time": now, "mode": mode}
+
+    pairs = move_map.items() if isinstance(move_map, Mapping) else move_map
+    ex = MoveExecutor(mode=mode, workers=workers)
+    flags = bytearray()
+    j = Journal(journal_path(batch_id, journal_dir), group_ops, group_ms)
+    j.write({"t": "begin", **header, "pid": os.getpid()}, sync=False)
+    j.sync()
+    try:
+        _journaled_run(ex, j, ((i, Path(s), Path(d)) for i, (s, d) in enumerate(pairs)), flags, progress=progress)
+    finally:
+        _commit(j, undo_log, header, flags, [str(p) for p in ex.created_dirs])
 
-    created_dirs: set[Path] = set()
-    moves_rec: List[Dict[str, str]] = []
+    return batch_id, ex.stats
 
-    # 실제 이동
-    for src, dst in move_map.items():
-        dst_parent = dst.parent
-        if not dst_parent.exists():
-            dst_parent.mkdir(parents=True, exist_ok=True)
-            created_dirs.add(dst_parent)
-        if mode == "move":
-            shutil.move(str(src), str(dst))
-        elif mode == "copy":
-            shutil.copy2(str(src), str(dst))
-        else:
-            shutil.move(str(src), str(dst))
-        moves_rec.append({"src": str(src), "dst": str(dst)})
-
-    record = {
-        "id": batch_id,
-        "time": now,
-        "mode": mode,
-        "moves": moves_rec,
-        "created_dirs": [str(p) for p in sorted(created_dirs)],
-    }
+def apply_moves(move_map: Dict[Path, Path], undo_log: Path, mode: str = "move") -> str:
+    """apply_moves_with_stats 와 같되 batch_id 만 반환."""
+    return apply_moves_with_stats(move_map, undo_log, mode)[0]
+
+@dataclass
+class RecoveryResult:
+    batch_id: str
+    policy: str            # "complete" | "rollback" | "committed"(커밋은 끝났고 저널만 남았던 경우)
+    done: int = 0          # 중단 전에 완료돼 있던 이동(파일시스템으로 확인한 것 포함)
+    completed: int = 0     # complete: 복구 중 마저 실행한 이동
+    restored: int = 0      # rollback: 원위치로 되돌린 이동
+
+def recover_interrupted(undo_log: Path, journal_dir: Path = JOURNAL_DIR, policy: str = "complete",
+                        workers: int = 4) -> List[RecoveryResult]:
+    """
+    비정상 종료로 남은 저널을 처리(앱 시작 시 호출).
+    - 커밋 기록이 있으면: undo 레코드가 온전하면 저널만 지우고, 잘렸으면 잘린 줄을 지운 뒤 다시 커밋
+    - policy="complete": 남은 intent 를 마저 실행하고 {"recovered": true} 배치 레코드로 커밋
+    - policy="rollback": 완료분을 배치 레코드로 커밋한 뒤 undo.rollback_batch 로 되돌림
+    done 기록이 fsync 전에 끊긴 이동은 (원본 없음 + 대상 있음) 으로 완료 판정.
+    """
+    if policy not in ("complete", "rollback"):
+        raise ValueError(f"알 수 없는 복구 정책: {policy}")
+    results: List[RecoveryResult] = []
+    for path in pending_journals(journal_dir):
+        if owner_alive(path):
+            continue
+        header: Optional[Dict[str, Any]] = None
+        created: List[str] = []
+        commit_off: Optional[int] = None
+        for rec in read_journal(path):
+            t = rec.get("t")
+            if t == "begin":
+                header = {"id": rec["id"], "time": rec["time"], "mode": rec["mode"]}
+            elif t == "mkdir":
+                created.append(rec["path"])
+            elif t == "commit":
+                commit_off = rec["undo_off"]
+        if header is None:
+            path.unlink(missing_ok=True)  # begin 전에 끊김 → 실행된 이동 없음
+            continue
+        res = RecoveryResult(header["id"], policy)
+        if commit_off is not None:
+            if undo_line_complete(undo_log, commit_off):
+                path.unlink(missing_ok=True)
+                res.policy = "committed"
+                results.append(res)
+                continue
+            truncate_to(undo_log, commit_off)
 
-    with undo_log.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        flags = done_flags(path)
+        pending: List[IndexedMove] = []
+        for rec in read_journal(path):
+            if rec.get("t") != "intent" or flags[rec["i"]]:
+                continue
+            src, dst = Path(rec["src"]), Path(rec["dst"])
+            if header["mode"] != "copy" and not src.exists() and dst.exists():
+                flags[rec["i"]] = 1
+            elif src.exists():
+                pending.append((rec["i"], src, dst))
+        res.done = sum(flags)
 
-    return batch_id
+        j = Journal(path)
+        if policy == "complete" and pending:
+            ex = MoveExecutor(mode=header["mode"], workers=workers)
+            try:
+                _journaled_run(ex, j, pending, flags, write_intents=False)
+            finally:
+                created.extend(str(p) for p in ex.created_dirs)
+                res.completed = sum(flags) - res.done
+        _commit(j, undo_log, header, flags, created, {"recovered": True})
+        if policy == "rollback":
+            res.restored = rollback_batch(undo_log, header["id"])
+        results.append(res)
+    return results
@@ -0,0 +1,335 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+import argparse, json, os, platform, shutil, subprocess, sys, tempfile, time, tracemalloc
+from .scanner import FileEntry, iter_tree, iter_tree_parallel
+from .entrytable import EntryTable
+from .blacklist import EXCLUDE_DIR_NAMES
+from .hashing import ALGORITHMS, READERS, hash_file
+from .meta import peek_with_stats
+from .synth import SynthSpec, ensure_tree
+
+def _count_rate(make_iter: Callable[[], Iterable]) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    n = sum(1 for _ in make_iter())
+    dt = time.perf_counter() - t0
+    return {"entries": n, "seconds": round(dt, 4), "entries_per_s": round(n / dt, 1) if dt else 0.0}
+
+def bench_scan(root: Path, workers: List[int], max_depth: int = 12) -> List[Dict[str, float]]:
+    """직렬 iter_tree 대비 iter_tree_parallel 의 entries/s 비교."""
+    rows = []
+    base = _count_rate(lambda: iter_tree(root, set(), EXCLUDE_DIR_NAMES, max_depth=max_depth))
+    rows.append({"walker": "serial", **base, "speedup": 1.0})
+    for w in workers:
+        for ordered in (False, True):
+            r = _count_rate(lambda: iter_tree_parallel(root, set(), EXCLUDE_DIR_NAMES, max_depth=max_depth,
+                                                       workers=w, ordered=ordered))
+            speedup = round(r["entries_per_s"] / base["entries_per_s"], 2) if base["entries_per_s"] else 0.0
+            rows.append({"walker": f"parallel(w={w}{',ordered' if ordered else ''})", **r, "speedup": speedup})
+    return rows
+
+def _fake_entries(n: int, per_dir: int = 200) -> Iterable[FileEntry]:
+    base = Path.home() / "bench"
+    for i in range(n):
+        yield FileEntry(base / f"d{i // per_dir:05d}" / f"IMG_{i:08d}.jpg", False, 1000 + i, 1.7e9 + i)
+
+def bench_entry_memory(n: int = 100_000) -> Dict[str, float]:
+    """list[FileEntry] 와 EntryTable 의 항목당 메모리(바이트)를 tracemalloc 으로 측정."""
+    def measure(build: Callable[[], object]) -> int:
+        tracemalloc.start()
+        obj = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del obj
+        return used
+
+    list_bytes = measure(lambda: [FileEntry(e.path, e.is_dir, e.size, e.mtime) for e in _fake_entries(n)])
+    table_bytes = measure(lambda: EntryTable.from_entries(_fake_entries(n)))
+    return {
+        "entries": n,
+        "list_bytes_per_entry": round(list_bytes / n, 1),
+        "table_bytes_per_entry": round(table_bytes / n, 1),
+        "ratio": round(list_bytes / table_bytes, 1) if table_bytes else 0.0,
+    }
+
+HASH_SIZE_CLASSES = {"4KiB": 4 << 10, "256KiB": 256 << 10, "8MiB": 8 << 20, "64MiB": 64 << 20}
+
+def bench_hash(total_bytes: int = 256 << 20, size_classes: Dict[str, int] | None = None) -> List[Dict[str, float]]:
+    """
+    파일 크기 구간별로 (알고리즘 × 읽기 방식) 전체 해시 처리량(MB/s) 측정.
+    각 구간은 total_bytes 만큼(최소 1개 파일) 임시 파일을 만들어 페이지 캐시가 데워진 상태에서 잰다.
+    """
+    size_classes = size_classes or HASH_SIZE_CLASSES
+    rows: List[Dict[str, float]] = []
+    with tempfile.TemporaryDirectory(prefix="aifiler-bench-") as tmp:
+        for label, size in size_classes.items():
+            n_files = max(1, total_bytes // size)
+            paths = []
+            for i in range(n_files):
+                p = Path(tmp) / f"{label}_{i}"
+                p.write_bytes(os.urandom(size))
+                paths.append(p)
+            for p in paths:  # 캐시 워밍
+                hash_file(p, "sha1", "read")
+            for algo in ALGORITHMS:
+                for reader in READERS:
+                    t0 = time.perf_counter()
+                    for p in paths:
+                        hash_file(p, algo, reader)
+                    dt = time.perf_counter() - t0
+                    mb = n_files * size / 1e6
+                    rows.append({"size_class": label, "algorithm": algo, "reader": reader,
+                                 "files": n_files, "mb_per_s": round(mb / dt, 1) if dt else 0.0})
+            for p in paths:
+                p.unlink()
+    return rows
+
+def bench_meta(root: Path) -> List[Dict[str, float]]:
+    """root 아래 파일에 대해 확장자별 메타 확인의 평균 읽은 바이트/지연(ms)/파일 크기."""
+    acc: Dict[str, List[float]] = {}
+    for e in iter_tree(root, set(), EXCLUDE_DIR_NAMES):
+        if e.is_dir: continue
+        ext = e.path.suffix.lower()
+        t0 = time.perf_counter()
+        _, n = peek_with_stats(e.path)
+        dt = time.perf_counter() - t0
+        if n == 0: continue  # 메타 확인 대상이 아닌 확장자
+        a = acc.setdefault(ext, [0, 0.0, 0.0, 0.0])
+        a[0] += 1; a[1] += n; a[2] += dt; a[3] += e.size
+    return [{"ext": ext, "files": int(c), "avg_bytes_read": round(b / c), "avg_ms": round(t * 1000 / c, 3),
+             "avg_file_bytes": round(sz / c)} for ext, (c, b, t, sz) in sorted(acc.items())]
+
+# ---- 단계별 벤치마크 모음(합성 트리 × 파일 수, 단계마다 별도 프로세스) ----
+
+SUITE_STAGES = ("scan", "dupes", "recommend", "diff", "actions", "undo")
+SUITE_SIZES = (10_000, 100_000, 1_000_000)
+REGRESSION_THRESHOLD = 0.2    # 기준보다 20% 넘게 느리거나 메모리를 더 쓰면 회귀
+MIN_COMPARE_S = 0.05          # 이보다 짧은 측정은 잡음이 커서 시간 회귀 판정에서 제외
+
+def _peak_rss_kb() -> Optional[int]:
+    """이 프로세스의 최대 RSS(KiB). resource 모듈이 없는 플랫폼(Windows)은 None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS 는 바이트 단위
+
+def _load_files(root: Path) -> List:
+    return list(EntryTable.from_entries(iter_tree(root, set(), EXCLUDE_DIR_NAMES)).iter_files())
+
+def _rule_names(files: Sequence) -> List[str]:
+    from .recommender import recommend_batch
+    return [rec["rule"] for _, rec in recommend_batch(files)]
+
+def _plan(files: Sequence, names: Sequence[str], dest: Path, rules):
+    from .diff import MovePlan
+    from .recommender import plan_destinations
+    plan = MovePlan()
+    for e, dst in zip(files, plan_destinations(files, names, {r.name: r for r in rules}, dest, as_str=True)):
+        src = os.fspath(e.path)
+        if src != dst:
+            plan.add(src, dst)
+    return plan
+
+def run_stage(stage: str, root: Path, work: Path) -> Dict[str, Any]:
+    """
+    단계 하나를 실행하고 {"seconds", "items", "setup_rss_kb", "peak_rss_kb", ...} 반환.
+    준비 작업(앞 단계 결과 만들기)은 시간에서 빼고, 준비 후 RSS 를 setup_rss_kb 로 함께 기록.
+    actions 는 root 의 파일을 work/dest 로 옮기고, undo 는 그 배치를 되돌려 트리를 원상태로 돌려놓음.
+    """
+    from .rules import load_rules
+    rules = load_rules(Path(__file__).resolve().parent.parent / "data" / "rules.yaml")
+    undo_log = work / "undo.jsonl"
+    extra: Dict[str, Any] = {}
+    if stage == "scan":
+        setup = _peak_rss_kb()
+        t0 = time.perf_counter()
+        items = len(EntryTable.from_entries(iter_tree(root, set(), EXCLUDE_DIR_NAMES)))
+        dt = time.perf_counter() - t0
+    elif stage == "undo":
+        from .undo import rollback_batch_report
+        from .undostore import UndoStore
+        with UndoStore(undo_log, journal_dir=work / "journal") as store:
+            batches = store.list_batches(limit=1)
+        if not batches:
+            raise SystemExit("undo: 되돌릴 배치가 없음(actions 를 먼저 실행)")
+        setup = _peak_rss_kb()
+        t0 = time.perf_counter()
+        r = rollback_batch_report(undo_log, batches[0]["id"])
+        dt = time.perf_counter() - t0
+        items, extra = r.restored, {"conflicts": len(r.conflicts)}
+    else:
+        files = _load_files(root)
+        items = len(files)
+        if stage == "dupes":
+            from .dupes import find_duplicates_staged
+            setup = _peak_rss_kb()
+            t0 = time.perf_counter()
+            report = find_duplicates_staged(files)
+            dt = time.perf_counter() - t0
+            extra = {"groups": len(report.groups), "bytes_read": sum(report.stats.bytes_read.values())}
+        elif stage == "recommend":
+            setup = _peak_rss_kb()
+            t0 = time.perf_counter()
+            _rule_names(files)
+            dt = time.perf_counter() - t0
+        elif stage == "diff":
+            names = _rule_names(files)
+            setup = _peak_rss_kb()
+            t0 = time.perf_counter()
+            plan = _plan(files, names, work / "dest", rules)
+            plan.per_dest()
+            dt = time.perf_counter() - t0
+            extra = {"moves": len(plan)}
+        elif stage == "actions":
+            from .actions import apply_moves_with_stats
+            plan = _plan(files, _rule_names(files), work / "dest", rules)
+            del files
+            setup = _peak_rss_kb()
+            t0 = time.perf_counter()
+            _, st = apply_moves_with_stats(plan.items(), undo_log, journal_dir=work / "journal")
+            dt = time.perf_counter() - t0
+            items, extra = st.files, {"renamed": st.renamed, "copied": st.copied}
+        else:
+            raise SystemExit(f"알 수 없는 단계: {stage}")
+    return {"stage": stage, "seconds": round(dt, 4), "items": items,
+            "items_per_s": round(items / dt, 1) if dt else 0.0,
+            "setup_rss_kb": setup, "peak_rss_kb": _peak_rss_kb(), **extra}
+
+def _run_stage_subprocess(stage: str, root: Path, work: Path) -> Dict[str, Any]:
+    repo = Path(__file__).resolve().parent.parent
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(repo), os.environ.get("PYTHONPATH")])))
+    out = subprocess.run([sys.executable, "-m", "aifiler.bench", "stage", stage, str(root), "--work", str(work)],
+                         cwd=repo, env=env, check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def bench_suite(sizes: Sequence[int] = SUITE_SIZES, stages: Sequence[str] = SUITE_STAGES, work: Optional[Path] = None,
+                seed: int = 0, repeat: int = 1, log: Callable[[str], None] = lambda msg: None) -> Dict[str, Any]:
+    """
+    파일 수마다 합성 트리를 만들고(work 를 주면 같은 설정의 트리는 재사용) 단계별로 별도 프로세스에서 측정.
+    actions 를 고르면 트리를 원래대로 돌리기 위해 undo 도 항상 실행.
+    repeat 번 반복해 단계별 가장 빠른 시간(최대 RSS 는 가장 큰 값)을 기록.
+    """
+    stages = [s for s in SUITE_STAGES if s in stages or (s == "undo" and "actions" in stages)]
+    tmp = None
+    if work is None:
+        work = Path(tmp := tempfile.mkdtemp(prefix="aifiler-suite-"))
+    results: List[Dict[str, Any]] = []
+    trees: Dict[str, Any] = {}
+    try:
+        for n in sizes:
+            root = work / f"tree-{n}"
+            t0 = time.perf_counter()
+            made = ensure_tree(root, SynthSpec(files=n, seed=seed))
+            trees[str(n)] = {"generated": made is not None, "seconds": round(time.perf_counter() - t0, 2)}
+            log(f"tree {n:,}: {'generated' if made else 'reused'} in {trees[str(n)]['seconds']}s")
+            best: Dict[str, Dict[str, Any]] = {}
+            for _ in range(max(1, repeat)):
+                run_dir = work / f"run-{n}"
+                shutil.rmtree(run_dir, ignore_errors=True)
+                run_dir.mkdir(parents=True)
+                for stage in stages:
+                    r = _run_stage_subprocess(stage, root, run_dir)
+                    b = best.setdefault(stage, r)
+                    peak = max(r["peak_rss_kb"] or 0, b["peak_rss_kb"] or 0) or None
+                    if r["seconds"] < b["seconds"]:
+                        best[stage] = b = r
+                    b["peak_rss_kb"] = peak
+                    log(f"  {stage:<10} {r['seconds']:>9.3f}s {r['items_per_s']:>12,.0f}/s  "
+                        f"peak {r['peak_rss_kb'] or 0:>9,} KiB")
+                shutil.rmtree(run_dir, ignore_errors=True)
+            results.extend({"files": n, **best[s]} for s in stages)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "seed": seed, "repeat": repeat,
+                 "trees": trees},
+        "results": results,
+    }
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """(단계, 파일 수) 별로 기준 대비 시간/최대 RSS 비율. regressed = 둘 중 하나라도 1+threshold 초과."""
+    base = {(r["stage"], r["files"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        b = base.get((r["stage"], r["files"]))
+        if b is None:
+            continue
+        time_ratio = r["seconds"] / b["seconds"] if b["seconds"] else None
+        rss_ratio = r["peak_rss_kb"] / b["peak_rss_kb"] if r.get("peak_rss_kb") and b.get("peak_rss_kb") else None
+        slow = time_ratio is not None and max(r["seconds"], b["seconds"]) >= MIN_COMPARE_S and time_ratio > 1 + threshold
+        fat = rss_ratio is not None and rss_ratio > 1 + threshold
+        rows.append({"stage": r["stage"], "files": r["files"], "time_ratio": time_ratio, "rss_ratio": rss_ratio,
+                     "regressed": slow or fat})
+    return rows
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m aifiler.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("scan", help="직렬/병렬 디렉터리 탐색 속도 비교")
+    sp.add_argument("root", type=Path)
+    sp.add_argument("--workers", type=int, nargs="+", default=[4, 8, 16])
+    sp.add_argument("--max-depth", type=int, default=12)
+    sm = sub.add_parser("memory", help="FileEntry 리스트 vs EntryTable 항목당 메모리")
+    sm.add_argument("-n", type=int, default=100_000)
+    sh = sub.add_parser("hash", help="해시 알고리즘/읽기 방식별 MB/s")
+    sh.add_argument("--total-mb", type=int, default=256, help="크기 구간마다 해시할 총량(MB)")
+    sm2 = sub.add_parser("meta", help="확장자별 메타 확인 읽기량/지연")
+    sm2.add_argument("root", type=Path)
+    ss = sub.add_parser("suite", help="합성 트리로 단계별 시간/최대 RSS 측정(JSON), 기준과 비교")
+    ss.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES))
+    ss.add_argument("--stages", nargs="+", choices=SUITE_STAGES, default=list(SUITE_STAGES))
+    ss.add_argument("--work", type=Path, help="합성 트리를 보관/재사용할 폴더(기본: 임시 폴더, 끝나면 삭제)")
+    ss.add_argument("--seed", type=int, default=0)
+    ss.add_argument("--repeat", type=int, default=1, help="반복 횟수(단계별 최솟값 기록)")
+    ss.add_argument("--out", type=Path, help="결과 JSON 저장 경로(기본: 표준 출력)")
+    ss.add_argument("--baseline", type=Path, help="비교할 기준 결과 JSON")
+    ss.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    st = sub.add_parser("stage", help="(suite 내부용) 단계 하나를 이 프로세스에서 실행")
+    st.add_argument("stage", choices=SUITE_STAGES)
+    st.add_argument("root", type=Path)
+    st.add_argument("--work", type=Path, required=True)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "scan":
+        for row in bench_scan(args.root, args.workers, args.max_depth):
+            print(f"{row['walker']:<26} {row['entries']:>9} entries  {row['seconds']:>8.3f}s  "
+                  f"{row['entries_per_s']:>11.1f}/s  x{row['speedup']}")
+    elif args.cmd == "memory":
+        r = bench_entry_memory(args.n)
+        print(f"{r['entries']} entries: list[FileEntry] {r['list_bytes_per_entry']} B/entry, "
+              f"EntryTable {r['table_bytes_per_entry']} B/entry (x{r['ratio']} smaller)")
+    elif args.cmd == "meta":
+        for row in bench_meta(args.root):
+            print(f"{row['ext']:<6} {row['files']:>6} files  read {row['avg_bytes_read']:>8} B/file "
+                  f"of {row['avg_file_bytes']:>10} B  {row['avg_ms']:>8.3f} ms/file")
+    elif args.cmd == "hash":
+        for row in bench_hash(args.total_mb << 20):
+            print(f"{row['size_class']:>7} {row['algorithm']:<8} {row['reader']:<9} "
+                  f"{row['files']:>6} files {row['mb_per_s']:>9.1f} MB/s")
+    elif args.cmd == "stage":
+        print(json.dumps(run_stage(args.stage, args.root.resolve(), args.work.resolve())))
+    elif args.cmd == "suite":
+        res = bench_suite(args.sizes, args.stages, args.work, args.seed, args.repeat,
+                          log=lambda msg: print(msg, file=sys.stderr, flush=True))
+        text = json.dumps(res, ensure_ascii=False, indent=2)
+        if args.out:
+            args.out.write_text(text + "\n", encoding="utf-8")
+        else:
+            print(text)
+        if args.baseline:
+            rows = compare_results(res, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+            for row in rows:
+                tr = f"x{row['time_ratio']:.2f}" if row["time_ratio"] is not None else "-"
+                rr = f"x{row['rss_ratio']:.2f}" if row["rss_ratio"] is not None else "-"
+                print(f"{row['stage']:<10} {row['files']:>9,}  time {tr:>7}  rss {rr:>7}"
+                      f"{'  REGRESSION' if row['regressed'] else ''}", file=sys.stderr)
+            if any(row["regressed"] for row in rows):
+                raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from __future__ import annotations
-import sys, os, string
+import sys, os, string, json
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import yaml
-from typing import List, Set, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 USER_BL_PATH = Path("data/blacklist.yaml")
 
@@ -48,6 +51,66 @@ def save_user_blacklist(paths: List[str]) -> None:
 def combined_blacklist() -> set[Path]:
     return default_blacklist() | load_user_blacklist()
 
+# ---- 컴파일된 블랙리스트(경로 구성요소 트라이) ----
+
+_END = ""  # 종단 표시(빈 문자열은 경로 구성요소로 나올 수 없음)
+
+class BlacklistTrie:
+    """
+    블랙리스트 경로를 구성요소 단위 트라이로 컴파일.
+    스캐너는 디렉터리마다 현재 노드만 들고 내려가며 자식 이름 1회 조회(O(1))로 판정하므로
+    경로 전체 판정은 O(depth), 블랙리스트 크기와 무관.
+    """
+
+    def __init__(self, roots: Iterable[Path], dirnames: Iterable[str] = ()):
+        self.root: Dict[str, Any] = {}
+        self.dirnames = frozenset(os.path.normcase(n) for n in dirnames)
+        for b in roots:
+            try:
+                b = b.resolve()
+            except OSError:
+                pass
+            node = self.root
+            for part in b.parts:
+                node = node.setdefault(os.path.normcase(part), {})
+            node[_END] = True
+
+    def locate(self, path: Path) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(차단 여부, path 에 해당하는 노드). 노드가 None 이면 하위에 경로 블랙리스트가 없음."""
+        node: Optional[Dict[str, Any]] = self.root
+        if _END in self.root:
+            return True, None
+        for part in path.parts:
+            node = node.get(os.path.normcase(part))
+            if node is None:
+                return False, None
+            if _END in node:
+                return True, None
+        return False, node
+
+    def step(self, node: Optional[Dict[str, Any]], name: str, is_dir: bool = True) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """부모 노드에서 자식 name 으로 한 단계 내려감. (차단 여부, 자식 노드)"""
+        key = os.path.normcase(name)
+        if is_dir and key in self.dirnames:
+            return True, None
+        if node is None:
+            return False, None
+        child = node.get(key)
+        if child is not None and _END in child:
+            return True, None
+        return False, child
+
+    def is_blocked(self, path: Path) -> bool:
+        return self.locate(path)[0]
+
+@lru_cache(maxsize=16)
+def _compile(roots: frozenset, dirnames: frozenset) -> BlacklistTrie:
+    return BlacklistTrie(roots, dirnames)
+
+def compile_blacklist(roots: Iterable[Path], dirnames: Iterable[str] = ()) -> BlacklistTrie:
+    """같은 블랙리스트 조합은 한 번만 resolve/컴파일하여 재사용."""
+    return _compile(frozenset(roots), frozenset(dirnames))
+
 # ---- 드라이브/루트/추천 계산 ----
 
 def list_drive_roots_windows() -> List[Path]:
@@ -123,44 +186,137 @@ SYSTEM_LIKE_NAMES = {
     "$Recycle.Bin","System Volume Information","Recovery","PerfLogs"
 }
 
-def recommend_blacklist_from_scan(drives: List[Path]) -> List[Path]:
+EXT_EXEC = frozenset({".exe", ".dll", ".msi", ".sys", ".bat", ".cmd"})
+EXEC_THRESHOLD = 20        # 실행파일이 이만큼 보이면 더 보지 않고 추천(조기 종료)
+DENSITY_THRESHOLD = 0.3    # 또는 하위 파일 중 실행파일 비율이 이 이상이면 추천
+DENSITY_MIN_FILES = 10     # 비율은 파일이 이 개수 이상일 때만 판단
+SCAN_MAX_ENTRIES = 20000   # 폴더 하나당 살펴볼 최대 파일 수
+BL_SCAN_CACHE_PATH = Path("data/blacklist_scan_cache.json")
+
+@dataclass
+class ExecScore:
+    path: Path
+    exec_files: int
+    files: int
+    early_exit: bool = False   # 임계치에 닿아 도중에 멈춤
+
+    @property
+    def density(self) -> float:
+        """실행파일 밀도(살펴본 파일 중 실행파일 비율)."""
+        return self.exec_files / self.files if self.files else 0.0
+
+    @property
+    def recommended(self) -> bool:
+        return self.early_exit or (self.files >= DENSITY_MIN_FILES and self.density >= DENSITY_THRESHOLD)
+
+def _score_subtree(root: str, max_depth: int, threshold: int, max_entries: int) -> Tuple[int, int, bool]:
+    """
+    os.scandir 로 max_depth 단계까지 한 번 훑으며 실행파일 수/파일 수를 셈.
+    DirEntry.is_dir(follow_symlinks=False) 는 d_type 을 쓰므로 항목별 stat 호출이 없음.
+    """
+    exe = files = 0
+    stack = [(root, 0)]
+    while stack:
+        cur, depth = stack.pop()
+        try:
+            it = os.scandir(cur)
+        except OSError:
+            continue
+        with it:
+            for de in it:
+                try:
+                    if de.is_dir(follow_symlinks=False):
+                        if depth < max_depth:
+                            stack.append((de.path, depth + 1))
+                        continue
+                except OSError:
+                    continue
+                files += 1
+                name = de.name
+                dot = name.rfind(".")
+                if dot > 0 and name[dot:].lower() in EXT_EXEC:
+                    exe += 1
+                    if exe >= threshold:
+                        return exe, files, True
+                if files >= max_entries:
+                    return exe, files, False
+    return exe, files, False
+
+def _load_scan_cache(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def score_exec_density(dirs: Iterable[Path], max_depth: int = 2, workers: int = 8, threshold: int = EXEC_THRESHOLD,
+                       max_entries: int = SCAN_MAX_ENTRIES, cache_path: Optional[Path] = BL_SCAN_CACHE_PATH) -> List[ExecScore]:
+    """
+    폴더별 실행파일 밀도 점수를 workers 개 스레드로 동시에 계산.
+    결과는 cache_path 에 (경로, 폴더 mtime, 설정) 단위로 저장해 다음 실행에서 재사용.
+    (하위 폴더만 바뀐 경우는 감지하지 않음 — 설치 폴더는 보통 최상위 mtime 도 함께 바뀜)
+    """
+    params = [max_depth, threshold, max_entries]
+    cache = _load_scan_cache(cache_path) if cache_path is not None else {}
+    out: List[ExecScore] = []
+    todo: List[Tuple[Path, int]] = []
+    for d in dirs:
+        try:
+            mtime_ns = os.stat(d).st_mtime_ns
+        except OSError:
+            continue
+        hit = cache.get(str(d))
+        if hit and hit["mtime_ns"] == mtime_ns and hit["params"] == params:
+            out.append(ExecScore(d, hit["exe"], hit["files"], hit["early"]))
+        else:
+            todo.append((d, mtime_ns))
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aifiler-bl") as pool:
+            scores = pool.map(lambda t: _score_subtree(str(t[0]), max_depth, threshold, max_entries), todo)
+            for (d, mtime_ns), (exe, files, early) in zip(todo, scores):
+                out.append(ExecScore(d, exe, files, early))
+                cache[str(d)] = {"mtime_ns": mtime_ns, "params": params, "exe": exe, "files": files, "early": early}
+        if cache_path is not None:
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+            except OSError:
+                pass
+    return out
+
+def recommend_blacklist_from_scan(drives: List[Path], max_depth: int = 2, workers: int = 8,
+                                  cache_path: Optional[Path] = BL_SCAN_CACHE_PATH) -> List[Path]:
     """
     실제 PC를 가볍게 스캔하여 블랙리스트 후보 추천:
     - 시스템성 폴더 이름 매치
-    - 상위 폴더 내 .exe/.dll 등 실행파일 개수가 많은 폴더
+    - 실행파일(.exe/.dll 등) 밀도가 높은 폴더 (max_depth 단계까지, 폴더별 병렬 + 결과 캐시)
     - 프로그램 설치 루트 (위에서 정의된 program_dirs)
+    드라이브 최상위는 한 번만 나열(scandir).
     """
     recs: Set[Path] = set(default_blacklist())
-    # 시스템 같은 이름
+    candidates: List[Path] = []
     for d in drives:
         try:
-            for entry in d.iterdir():
-                if entry.is_dir() and entry.name in SYSTEM_LIKE_NAMES:
-                    recs.add(entry)
-        except Exception:
+            with os.scandir(d) as it:
+                for de in it:
+                    try:
+                        if not de.is_dir(follow_symlinks=False):
+                            continue
+                    except OSError:
+                        continue
+                    if de.name in SYSTEM_LIKE_NAMES:
+                        recs.add(Path(de.path))   # 시스템 같은 이름
+                    else:
+                        candidates.append(Path(de.path))
+        except OSError:
             continue
     # 프로그램 루트
     for p in list_program_dirs():
         recs.add(p)
 
-    # 실행파일 다량 포함 폴더 (최상위 1레벨만 간단히)
-    EXT_EXEC = {".exe",".dll",".msi",".sys",".bat",".cmd"}
-    for d in drives:
-        try:
-            for entry in d.iterdir():
-                if entry.is_dir() and entry.name not in SYSTEM_LIKE_NAMES:
-                    cnt = 0
-                    try:
-                        for child in entry.iterdir():
-                            if child.is_file() and child.suffix.lower() in EXT_EXEC:
-                                cnt += 1
-                                if cnt >= 20:  # 임계치
-                                    recs.add(entry)
-                                    break
-                    except Exception:
-                        pass
-        except Exception:
-            pass
+    # 실행파일 다량 포함 폴더
+    for sc in score_exec_density(candidates, max_depth=max_depth, workers=workers, cache_path=cache_path):
+        if sc.recommended:
+            recs.add(sc.path)
 
     # 사용자 블랙리스트와 합치되 중복 제거하여 정렬 반환
     user = load_user_blacklist()
@@ -0,0 +1,321 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+import argparse, json, os, sys, time
+
+from .scanner import FileEntry, iter_tree_parallel
+from .blacklist import EXCLUDE_DIR_NAMES, combined_blacklist
+from .rules import Rule, load_rules
+from .rulematch import compile_rules
+from .recommender import name_based_label, plan_destinations, recommend_batch
+from .dupes import find_duplicates_staged
+from .hashcache import HashCache
+from .meta import META_CACHE_PATH
+from .actions import MoveStats, apply_moves_with_stats, recover_interrupted
+from .journal import owner_alive, pending_journals
+from .undostore import UndoStore
+from .undo import rollback_batch_report
+
+UNDO_LOG = Path("data/undo.jsonl")
+RULES_PATH = Path("data/rules.yaml")
+PLAN_CHUNK = 5000          # plan: 이 개수 이상 모이면 폴더 경계에서 끊어 처리
+PROGRESS_EVERY_S = 1.0
+
+# 파이프라인 레코드(JSONL, 한 줄 = 한 항목)
+#   scan  → {"path", "size", "mtime"} (+ "dir": true, --dirs 일 때 폴더)
+#   plan  → {"src", "dst", "rule", "why"}   (제자리인 파일은 내보내지 않음)
+#   dupes → {"size", "algorithm", "digest", "paths": [...]}
+
+def _line(rec: Dict[str, Any]) -> str:
+    s = json.dumps(rec, ensure_ascii=False)
+    if not s.isascii():
+        try:
+            s.encode("utf-8")
+        except UnicodeEncodeError:
+            s = json.dumps(rec)  # UTF-8 이 아닌 파일명(서로게이트)은 \\u 이스케이프로 왕복 보존
+    return s + "\n"
+
+def _read_jsonl(src: TextIO) -> Iterator[Dict[str, Any]]:
+    for ln in src:
+        if ln.strip():
+            yield json.loads(ln)
+
+def _open_in(path: Optional[Path]) -> TextIO:
+    return sys.stdin if path is None or str(path) == "-" else path.open("r", encoding="utf-8")
+
+def _open_out(path: Optional[Path]) -> TextIO:
+    return sys.stdout if path is None or str(path) == "-" else path.open("w", encoding="utf-8")
+
+def _close(f: TextIO) -> None:
+    if f is sys.stdout:
+        f.flush()
+    elif f is not sys.stdin:
+        f.close()
+
+class _Progress:
+    """stderr 진행 표시. interval 초마다 한 줄(크론 로그에서도 읽기 쉽도록 줄 단위)."""
+
+    def __init__(self, stage: str, quiet: bool = False, interval: float = PROGRESS_EVERY_S):
+        self.stage = stage
+        self.quiet = quiet
+        self.interval = interval
+        self.t0 = self.last = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.t0
+
+    def tick(self, msg: str, force: bool = False) -> None:
+        now = time.monotonic()
+        if self.quiet or (not force and now - self.last < self.interval):
+            return
+        self.last = now
+        print(f"[{self.stage} {now - self.t0:7.1f}s] {msg}", file=sys.stderr, flush=True)
+
+def _entries(records: Iterable[Dict[str, Any]]) -> Iterator[FileEntry]:
+    for r in records:
+        if not r.get("dir"):
+            yield FileEntry(Path(r["path"]), False, int(r["size"]), float(r["mtime"]))
+
+# ---- scan ----
+
+def cmd_scan(args: argparse.Namespace) -> int:
+    bl = set() if args.no_blacklist else combined_blacklist()
+    exts = {e.lower() if e.startswith(".") else "." + e.lower() for e in args.ext}
+    prog = _Progress("scan", args.quiet)
+    out = _open_out(args.output)
+    n = nbytes = 0
+    for root in args.roots:
+        for e in iter_tree_parallel(root, bl, EXCLUDE_DIR_NAMES, max_depth=args.max_depth, workers=args.workers):
+            if e.is_dir:
+                if args.dirs:
+                    out.write(_line({"path": os.fspath(e.path), "dir": True, "size": 0, "mtime": e.mtime}))
+                continue
+            if exts and e.path.suffix.lower() not in exts:
+                continue
+            out.write(_line({"path": os.fspath(e.path), "size": e.size, "mtime": e.mtime}))
+            n += 1
+            nbytes += e.size
+            prog.tick(f"{n:,} files, {nbytes / 1e9:,.2f} GB, {n / max(prog.elapsed(), 1e-9):,.0f} files/s")
+    _close(out)
+    prog.tick(f"done: {n:,} files, {nbytes / 1e9:,.2f} GB", force=True)
+    return 0
+
+# ---- plan ----
+
+def _dir_chunks(entries: Iterable[FileEntry], size: int) -> Iterator[List[FileEntry]]:
+    """
+    같은 부모 폴더의 연속 구간을 끊지 않고 size 개 안팎으로 묶음. 이웃 다수결은 폴더 안에서만 계산되므로
+    폴더가 연속으로 들어오면(scan 출력은 폴더 단위로 연속) 전체를 한 번에 계산한 것과 결과가 같음.
+    """
+    chunk: List[FileEntry] = []
+    last = None
+    for e in entries:
+        parent = e.path.parent
+        if len(chunk) >= size and parent != last:
+            yield chunk
+            chunk = []
+        chunk.append(e)
+        last = parent
+    if chunk:
+        yield chunk
+
+def _recommend(files: List[FileEntry], mode: str, rules: List[Rule], matcher, use_meta: bool,
+                meta_cache: Optional[HashCache]) -> List[Dict[str, Any]]:
+    """앱 미리보기와 같은 우선순위: auto = 이름만, rules = rules.yaml match 우선 + 추천, recommend = 추천."""
+    if mode == "auto":
+        recs = []
+        for e in files:
+            lab, sc, _ = name_based_label(e)
+            recs.append({"rule": lab, "score": sc, "why": "auto"} if lab else
+                        {"rule": "others_review", "score": 0.0, "why": "fallback"})
+        return recs
+    hits = matcher.match_batch(e.path.name for e in files) if matcher is not None else None
+    meta_mask = [not h for h in hits] if hits else None
+    recs = [rec for _, rec in recommend_batch(files, use_meta=use_meta, meta_mask=meta_mask, meta_cache=meta_cache)]
+    if hits:
+        for i, h in enumerate(hits):
+            if h:
+                recs[i] = {"rule": rules[h[0]].name, "score": 1.0, "why": "rule:match"}
+    return recs
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    rules = load_rules(args.rules)
+    rule_map = {r.name: r for r in rules}
+    matcher = compile_rules(rules) if args.mode == "rules" else None
+    meta_cache = HashCache(META_CACHE_PATH) if args.meta else None
+    prog = _Progress("plan", args.quiet)
+    src, out = _open_in(args.input), _open_out(args.output)
+    n = planned = 0
+    try:
+        for files in _dir_chunks(_entries(_read_jsonl(src)), args.chunk):
+            recs = _recommend(files, args.mode, rules, matcher, args.meta, meta_cache)
+            dsts = plan_destinations(files, [r["rule"] for r in recs], rule_map, args.dest, as_str=True)
+            for e, rec, dst in zip(files, recs, dsts):
+                s = os.fspath(e.path)
+                if s != dst:
+                    out.write(_line({"src": s, "dst": dst, "rule": rec["rule"], "why": rec["why"]}))
+                    planned += 1
+            n += len(files)
+            prog.tick(f"{n:,} files, {planned:,} moves planned")
+    finally:
+        if meta_cache is not None:
+            meta_cache.close()
+    _close(src)
+    _close(out)
+    prog.tick(f"done: {n:,} files, {planned:,} moves planned", force=True)
+    return 0
+
+# ---- dupes ----
+
+def cmd_dupes(args: argparse.Namespace) -> int:
+    """크기 버킷을 만들려면 입력 전체가 필요하므로 파일 목록은 메모리에 올림(해시는 후보만)."""
+    prog = _Progress("dupes", args.quiet)
+    src, out = _open_in(args.input), _open_out(args.output)
+
+    def progress(stage: str, done: int, total: int, nbytes: int) -> None:
+        prog.tick(f"{stage} hash {done:,}/{total:,}, read {nbytes / 1e6:,.1f} MB")
+
+    cache = None if args.no_cache else HashCache()
+    try:
+        report = find_duplicates_staged(_entries(_read_jsonl(src)), workers=args.workers, cache=cache,
+                                        progress=progress)
+    finally:
+        if cache is not None:
+            cache.close()
+        _close(src)
+    for (size, algo, digest), group in report.groups.items():
+        out.write(_line({"size": size, "algorithm": algo, "digest": digest,
+                         "paths": [os.fspath(e.path) for e in group]}))
+    _close(out)
+    s = report.stats
+    prog.tick(f"done: {len(report.groups):,} groups from {s.files:,} files "
+              f"(size candidates {s.size_candidates:,}, sample candidates {s.sample_candidates:,})", force=True)
+    return 0
+
+# ---- apply / rollback ----
+
+def cmd_apply(args: argparse.Namespace) -> int:
+    if args.dry_run:
+        # 시험 실행은 파일을 건드리지 않음 — 중단된 배치는 복구하지 않고 알리기만 함
+        for path in pending_journals():
+            if not owner_alive(path):
+                print(f"interrupted batch pending recovery (not recovered in dry run): {path}", file=sys.stderr)
+    else:
+        for r in recover_interrupted(args.undo_log, policy=args.recover):
+            print(f"recovered interrupted batch {r.batch_id}: {r.policy}, done {r.done}, "
+                  f"completed {r.completed}, restored {r.restored}", file=sys.stderr)
+    prog = _Progress("apply", args.quiet)
+
+    def report(st: MoveStats) -> None:
+        dt = max(prog.elapsed(), 1e-9)
+        prog.tick(f"{st.files:,} moved, {st.bytes / 1e9:,.2f} GB, {st.files / dt:,.0f} files/s, "
+                  f"{st.bytes / dt / 1e6:,.1f} MB/s")
+
+    src = _open_in(args.input)
+    # 계획은 한 줄씩 읽어 넘기고, apply_moves_with_stats 가 group_ops 개씩 저널에 기록한 뒤 실행
+    pairs = ((r["src"], r["dst"]) for r in _read_jsonl(src))
+    try:
+        if args.dry_run:
+            n = sum(1 for _ in pairs)
+            prog.tick(f"dry run: {n:,} moves", force=True)
+            return 0
+        batch_id, st = apply_moves_with_stats(pairs, args.undo_log, mode=args.mode, workers=args.workers,
+                                              progress=report)
+    finally:
+        _close(src)
+    prog.tick(f"done: batch {batch_id}, {st.files:,} files, {st.bytes / 1e9:,.2f} GB, "
+              f"rename {st.renamed:,} / copy {st.copied:,}, {st.files_per_s:,.0f} files/s, "
+              f"{st.bytes_per_s / 1e6:,.1f} MB/s", force=True)
+    print(batch_id)
+    return 0
+
+def cmd_rollback(args: argparse.Namespace) -> int:
+    if not args.undo_log.exists():
+        print("no undo log", file=sys.stderr)
+        return 1
+    if args.list:
+        with UndoStore(args.undo_log) as store:
+            for b in store.list_batches(limit=args.recent or 50):
+                sys.stdout.write(_line(b))
+        return 0
+    ids = list(args.batch_ids)
+    if args.recent:
+        with UndoStore(args.undo_log) as store:
+            ids += [b["id"] for b in store.list_batches(limit=args.recent)]
+    if not ids:
+        print("batch id 또는 --recent N 이 필요합니다", file=sys.stderr)
+        return 2
+    status = 0
+    for batch_id in ids:
+        r = rollback_batch_report(args.undo_log, batch_id, workers=args.workers)
+        print(f"rollback {batch_id}: restored {r.restored:,} (rename {r.renamed:,} / copy {r.copied:,}), "
+              f"removed dirs {r.removed_dirs:,}, conflicts {len(r.conflicts):,}, {r.files_per_s:,.0f} files/s",
+              file=sys.stderr)
+        if r.conflicts:
+            status = 1
+    return status
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m aifiler",
+                                 description="scan → plan → apply 를 Streamlit 없이 실행. 단계 사이는 JSONL 파이프.")
+    ap.add_argument("-q", "--quiet", action="store_true", help="stderr 진행 표시 끔")
+    # 하위 명령 뒤에도 -q 를 받도록 공통 부모로 추가. SUPPRESS 라서 앞에 준 -q 를 기본값으로 덮어쓰지 않음
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-q", "--quiet", action="store_true", default=argparse.SUPPRESS, help="stderr 진행 표시 끔")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("scan", parents=[common], help="파일 목록 → JSONL")
+    sp.add_argument("roots", type=Path, nargs="+")
+    sp.add_argument("--ext", nargs="*", default=[], help="이 확장자만(예: .jpg .pdf)")
+    sp.add_argument("--max-depth", type=int, default=12)
+    sp.add_argument("--workers", type=int, default=8)
+    sp.add_argument("--dirs", action="store_true", help="폴더 항목도 내보냄")
+    sp.add_argument("--no-blacklist", action="store_true")
+    sp.add_argument("-o", "--output", type=Path)
+    sp.set_defaults(func=cmd_scan)
+
+    pp = sub.add_parser("plan", parents=[common], help="scan JSONL → 이동 계획 JSONL")
+    pp.add_argument("input", type=Path, nargs="?")
+    pp.add_argument("--dest", type=Path, required=True, help="정리 대상 루트")
+    pp.add_argument("--mode", choices=["recommend", "rules", "auto"], default="recommend")
+    pp.add_argument("--rules", type=Path, default=RULES_PATH)
+    pp.add_argument("--meta", action="store_true", help="이름/이웃으로 정해지지 않은 파일은 메타데이터 확인")
+    pp.add_argument("--chunk", type=int, default=PLAN_CHUNK)
+    pp.add_argument("-o", "--output", type=Path)
+    pp.set_defaults(func=cmd_plan)
+
+    dp = sub.add_parser("dupes", parents=[common], help="scan JSONL → 중복 그룹 JSONL")
+    dp.add_argument("input", type=Path, nargs="?")
+    dp.add_argument("--workers", type=int, default=4)
+    dp.add_argument("--no-cache", action="store_true", help="해시 캐시를 쓰지 않음")
+    dp.add_argument("-o", "--output", type=Path)
+    dp.set_defaults(func=cmd_dupes)
+
+    xp = sub.add_parser("apply", parents=[common], help="계획 JSONL 실행(저널 + undo 로그)")
+    xp.add_argument("input", type=Path, nargs="?")
+    xp.add_argument("--mode", choices=["move", "copy"], default="move")
+    xp.add_argument("--workers", type=int, default=4)
+    xp.add_argument("--undo-log", type=Path, default=UNDO_LOG)
+    xp.add_argument("--recover", choices=["complete", "rollback"], default="complete",
+                     help="이전에 중단된 배치를 처리하는 방식")
+    xp.add_argument("--dry-run", action="store_true")
+    xp.set_defaults(func=cmd_apply)
+
+    rp = sub.add_parser("rollback", parents=[common], help="배치 되돌리기")
+    rp.add_argument("batch_ids", nargs="*")
+    rp.add_argument("--recent", type=int, default=0, help="최근 N개 배치")
+    rp.add_argument("--list", action="store_true", help="배치 목록(JSONL)만 출력")
+    rp.add_argument("--workers", type=int, default=4)
+    rp.add_argument("--undo-log", type=Path, default=UNDO_LOG)
+    rp.set_defaults(func=cmd_rollback)
+    return ap
+
+def main(argv: List[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # 다음 단계(head 등)가 먼저 끝난 경우: 남은 출력은 버리고 조용히 종료
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
@@ -1,7 +1,9 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from array import array
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TextIO, Tuple
 from collections import defaultdict
+import csv, json, os, sys
 
 def plan_moves(move_map: Dict[Path, Path]) -> Dict[str, Any]:
     total = len(move_map)
@@ -20,3 +22,142 @@ def plan_moves(move_map: Dict[Path, Path]) -> Dict[str, Any]:
         "per_dest_items": per_dest_items,
         "changes": changes
     }
+
+class MovePlan:
+    """
+    이동 계획(src → dst)을 열 단위로 한 번만 보관.
+    - 폴더 문자열은 intern 하여 id 로, 파일명은 UTF-8 버퍼 + 오프셋으로 저장
+    - dst 파일명이 src 와 같으면(대부분) 따로 저장하지 않음
+    - 대상 폴더별 개수는 집계값으로 유지하고, 목록은 페이지/구간 단위로 필요할 때만 문자열화
+    """
+
+    def __init__(self) -> None:
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self.src_dir = array("I")
+        self.dst_dir = array("I")
+        self._name_off = array("Q", [0])
+        self._names = bytearray()
+        self._dst_names: Dict[int, str] = {}      # dst 파일명이 src 와 다른 경우만
+        self._dest_count: Dict[int, int] = {}
+        self._by_dest: Optional[Tuple[array, Dict[int, Tuple[int, int]]]] = None
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[Any, Any]]) -> "MovePlan":
+        plan = cls()
+        for src, dst in pairs:
+            plan.add(src, dst)
+        return plan
+
+    def _intern_dir(self, d: str) -> int:
+        i = self._dir_ids.get(d)
+        if i is None:
+            i = len(self._dirs)
+            self._dirs.append(d)
+            self._dir_ids[d] = i
+        return i
+
+    def add(self, src: Path | str, dst: Path | str) -> int:
+        sd, sname = os.path.split(os.fspath(src))
+        dd, dname = os.path.split(os.fspath(dst))
+        idx = len(self.src_dir)
+        self.src_dir.append(self._intern_dir(sd))
+        did = self._intern_dir(dd)
+        self.dst_dir.append(did)
+        self._names += sname.encode("utf-8", "surrogatepass")
+        self._name_off.append(len(self._names))
+        if dname != sname:
+            self._dst_names[idx] = dname
+        self._dest_count[did] = self._dest_count.get(did, 0) + 1
+        self._by_dest = None
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.src_dir)
+
+    @property
+    def total(self) -> int:
+        return len(self)
+
+    # ---- 행 접근 ----
+
+    def _name(self, i: int) -> str:
+        return self._names[self._name_off[i]:self._name_off[i + 1]].decode("utf-8", "surrogatepass")
+
+    def src_str(self, i: int) -> str:
+        return os.path.join(self._dirs[self.src_dir[i]], self._name(i))
+
+    def dst_str(self, i: int) -> str:
+        name = self._dst_names.get(i)
+        return os.path.join(self._dirs[self.dst_dir[i]], self._name(i) if name is None else name)
+
+    def items(self) -> Iterator[Tuple[Path, Path]]:
+        """(src, dst) Path 쌍을 순서대로. apply_moves 에 그대로 넘길 수 있음."""
+        for i in range(len(self)):
+            yield Path(self.src_str(i)), Path(self.dst_str(i))
+
+    def page(self, offset: int = 0, limit: int = 300) -> List[Dict[str, str]]:
+        """전체 변경 목록의 한 구간({"src", "dst"} 목록, st.dataframe 용)."""
+        stop = min(len(self), offset + limit)
+        return [{"src": self.src_str(i), "dst": self.dst_str(i)} for i in range(max(0, offset), stop)]
+
+    # ---- 대상 폴더별 ----
+
+    def per_dest(self) -> Dict[str, int]:
+        return {self._dirs[d]: n for d, n in self._dest_count.items()}
+
+    def _dest_index(self) -> Tuple[array, Dict[int, Tuple[int, int]]]:
+        """대상 폴더 id 순으로 정렬한 행 번호 배열 + 폴더별 (시작, 끝). 첫 요청 때 한 번 계산(계수 정렬)."""
+        if self._by_dest is None:
+            starts: Dict[int, int] = {}
+            pos = 0
+            for d in sorted(self._dest_count):
+                starts[d] = pos
+                pos += self._dest_count[d]
+            ranges = {d: (s, s + self._dest_count[d]) for d, s in starts.items()}
+            order = array("I", bytes(4 * len(self)))
+            for i, d in enumerate(self.dst_dir):
+                order[starts[d]] = i
+                starts[d] += 1
+            self._by_dest = (order, ranges)
+        return self._by_dest
+
+    def dest_page(self, dest: str, offset: int = 0, limit: int = 500) -> List[Tuple[str, str]]:
+        """특정 대상 폴더로 가는 (src, dst) 문자열 쌍의 한 구간."""
+        did = self._dir_ids.get(dest)
+        if did is None or did not in self._dest_count:
+            return []
+        order, ranges = self._dest_index()
+        start, end = ranges[did]
+        lo = start + max(0, offset)
+        return [(self.src_str(i), self.dst_str(i)) for i in order[lo:min(end, lo + limit)]]
+
+    # ---- 내보내기(스트리밍) ----
+
+    def write_csv(self, fp: TextIO) -> int:
+        w = csv.writer(fp)
+        w.writerow(["src", "dst"])
+        for i in range(len(self)):
+            w.writerow([self.src_str(i), self.dst_str(i)])
+        return len(self)
+
+    def write_jsonl(self, fp: TextIO) -> int:
+        for i in range(len(self)):
+            fp.write(json.dumps({"src": self.src_str(i), "dst": self.dst_str(i)}, ensure_ascii=False) + "\n")
+        return len(self)
+
+    def export(self, path: Path) -> int:
+        """확장자(.csv / .jsonl)에 맞춰 파일로 내보냄. 반환: 기록한 행 수."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8", newline="") as fp:
+            if path.suffix.lower() == ".csv":
+                return self.write_csv(fp)
+            return self.write_jsonl(fp)
+
+    def nbytes(self) -> int:
+        """대략적인 메모리(바이트). 폴더 문자열 포함, 정렬 인덱스 제외."""
+        cols = (self.src_dir, self.dst_dir, self._name_off)
+        total = sum(c.buffer_info()[1] * c.itemsize for c in cols) + len(self._names)
+        total += sys.getsizeof(self._dirs) + sum(sys.getsizeof(d) for d in self._dirs)
+        total += sys.getsizeof(self._dir_ids) + sys.getsizeof(self._dst_names) + sys.getsizeof(self._dest_count)
+        return total
@@ -1,8 +1,15 @@
 from __future__ import annotations
 from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import hashlib
 from collections import defaultdict
 from .scanner import FileEntry
+from .hashcache import HashCache, StatKey, hash_kind, stat_key
+from .hashing import DEFAULT_ALGORITHM, DEFAULT_READER, hash_file, hash_ranges, new_hasher
+
+SAMPLE_BYTES = 64 * 1024       # 2단계: 앞/뒤 샘플 크기
 
 def head_hash(path: Path, n_bytes=1024*1024) -> str:
     h = hashlib.sha1()
@@ -10,13 +17,152 @@ def head_hash(path: Path, n_bytes=1024*1024) -> str:
         h.update(f.read(n_bytes))
     return h.hexdigest()
 
-def find_duplicates(files: list[FileEntry]):
-    bins = defaultdict(list)
-    for e in files:
-        if e.is_dir: continue
+def sample_hash(path: Path, size: int, n_bytes: int = SAMPLE_BYTES, algorithm: str = DEFAULT_ALGORITHM,
+                reader: str = DEFAULT_READER) -> Tuple[str, int]:
+    """앞 n_bytes + 뒤 n_bytes 해시. 파일이 2*n_bytes 이하이면 전체를 읽으므로 full_hash 와 같은 값. (digest, 읽은 바이트)"""
+    if size <= 2 * n_bytes:
+        return full_hash(path, algorithm, reader)
+    return hash_ranges(path, [(0, n_bytes), (size - n_bytes, n_bytes)], algorithm, reader)
+
+def full_hash(path: Path, algorithm: str = DEFAULT_ALGORITHM, reader: str = DEFAULT_READER) -> Tuple[str, int]:
+    """파일 전체 해시. (digest, 읽은 바이트)"""
+    return hash_file(path, algorithm, reader)
+
+@dataclass
+class DupeStats:
+    files: int = 0
+    size_candidates: int = 0      # 크기가 겹쳐 2단계로 넘어간 파일 수
+    sample_candidates: int = 0    # 샘플 해시가 겹쳐 3단계로 넘어간 파일 수
+    bytes_read: Dict[str, int] = field(default_factory=lambda: {"size": 0, "sample": 0, "full": 0})
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+GroupKey = Tuple[int, str, str]  # (size, algorithm, digest) — 알고리즘이 같은 키끼리만 비교 가능
+
+@dataclass
+class DupeReport:
+    groups: Dict[GroupKey, List[FileEntry]]
+    stats: DupeStats
+    algorithm: str = DEFAULT_ALGORITHM
+
+Progress = Callable[[str, int, int, int], None]  # (단계, 처리한 파일 수, 단계 전체, 지금까지 읽은 바이트)
+
+def _hash_many(pool: ThreadPoolExecutor, fn, items: List[FileEntry], progress: Optional[Callable[[int], None]] = None
+               ) -> List[Tuple[FileEntry, Optional[str], int]]:
+    def one(e: FileEntry) -> Tuple[FileEntry, Optional[str], int]:
         try:
-            hh = head_hash(e.path)
-            bins[(e.size, hh)].append(e)
+            digest, n = fn(e)
+            return e, digest, n
         except Exception:
-            continue
-    return {k:v for k,v in bins.items() if len(v)>=2}
+            return e, None, 0
+    if progress is None:
+        return list(pool.map(one, items))
+    out = []
+    for r in pool.map(one, items):  # 콜백이 예외(취소)를 던지면 map 이 남은 작업을 취소
+        out.append(r)
+        progress(r[2])
+    return out
+
+def _safe_stat(e: FileEntry) -> Optional[StatKey]:
+    try:
+        return stat_key(e.path)
+    except OSError:
+        return None
+
+def _digest_stage(pool: ThreadPoolExecutor, items: List[FileEntry], fn, kind: str,
+                  cache: Optional[HashCache], stats: DupeStats, stage: str,
+                  progress: Optional[Progress] = None) -> List[Tuple[FileEntry, str]]:
+    """한 단계의 해시를 계산. 캐시가 있으면 (dev, ino, size, mtime_ns) 로 먼저 조회하고 미스만 읽음."""
+    out: List[Tuple[FileEntry, str]] = []
+    tick = None
+    if progress is not None:
+        counter = [len(items), 0, sum(stats.bytes_read.values())]  # [전체, 처리, 바이트]
+
+        def tick(n: int) -> None:
+            counter[1] += 1
+            counter[2] += n
+            progress(stage, counter[1], counter[0], counter[2])
+    if cache is None:
+        for e, digest, n in _hash_many(pool, fn, items, tick):
+            stats.bytes_read[stage] += n
+            if digest is not None:
+                out.append((e, digest))
+        return out
+    misses: List[Tuple[FileEntry, StatKey]] = []
+    for e, key in zip(items, pool.map(_safe_stat, items)):
+        if key is None: continue
+        digest = cache.get(key, kind)
+        if digest is None:
+            misses.append((e, key))
+        else:
+            stats.cache_hits += 1
+            out.append((e, digest))
+    stats.cache_misses += len(misses)
+    if progress is not None:
+        counter[1] = len(items) - len(misses)  # 캐시 적중분은 처리된 것으로
+    hashed = _hash_many(pool, fn, [e for e, _ in misses], tick)
+    for (e, key), (_, digest, n) in zip(misses, hashed):
+        stats.bytes_read[stage] += n
+        if digest is not None:
+            cache.put(key, kind, digest)
+            out.append((e, digest))
+    return out
+
+def find_duplicates_staged(files: Iterable[FileEntry], sample_bytes: int = SAMPLE_BYTES, workers: int = 4,
+                           cache: Optional[HashCache] = None, algorithm: str = DEFAULT_ALGORITHM,
+                           reader: str = DEFAULT_READER, progress: Optional[Progress] = None) -> DupeReport:
+    """
+    단계별 중복 탐지:
+    1) 크기 버킷 — 크기가 유일한 파일은 읽지 않고 제외
+    2) 앞/뒤 샘플 해시 — 샘플이 다르면 제외
+    3) 전체 해시 — 남은 후보만 전체 내용으로 확정
+    해시는 workers 개 스레드(동시 I/O 상한)로 병렬 처리, 단계별 읽은 바이트를 stats 에 기록.
+    cache 를 주면 2/3단계 모두 파일을 읽기 전에 해시 캐시를 먼저 조회.
+    algorithm/reader 는 hashing 백엔드 선택(그룹 키에 알고리즘을 함께 기록).
+    progress 를 주면 파일 하나를 해시할 때마다 (단계, 처리 수, 단계 전체, 누적 읽은 바이트) 로 호출.
+    """
+    new_hasher(algorithm)  # 잘못된 알고리즘은 스캔 전에 바로 실패
+    stats = DupeStats()
+    by_size: Dict[int, List[FileEntry]] = defaultdict(list)
+    for e in files:
+        if e.is_dir: continue
+        stats.files += 1
+        by_size[e.size].append(e)
+
+    groups: Dict[GroupKey, List[FileEntry]] = {}
+    stage2 = [e for size, g in by_size.items() if len(g) >= 2 and size > 0 for e in g]
+    # 빈 파일은 내용이 같으므로 읽을 필요 없음
+    empty = by_size.get(0, [])
+    if len(empty) >= 2:
+        groups[(0, algorithm, new_hasher(algorithm).hexdigest())] = empty
+    stats.size_candidates = len(stage2)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aifiler-hash") as pool:
+        by_sample: Dict[Tuple[int, str], List[FileEntry]] = defaultdict(list)
+        sampled = _digest_stage(pool, stage2, lambda e: sample_hash(e.path, e.size, sample_bytes, algorithm, reader),
+                                hash_kind(algorithm, sample_bytes), cache, stats, "sample", progress)
+        for e, digest in sampled:
+            by_sample[(e.size, digest)].append(e)
+
+        stage3: List[FileEntry] = []
+        for (size, digest), g in by_sample.items():
+            if len(g) < 2: continue
+            if size <= 2 * sample_bytes:
+                groups[(size, algorithm, digest)] = g  # 샘플이 곧 전체 내용
+            else:
+                stage3.extend(g)
+        stats.sample_candidates = len(stage3)
+
+        by_full: Dict[GroupKey, List[FileEntry]] = defaultdict(list)
+        for e, digest in _digest_stage(pool, stage3, lambda e: full_hash(e.path, algorithm, reader),
+                                       hash_kind(algorithm, None), cache, stats, "full", progress):
+            by_full[(e.size, algorithm, digest)].append(e)
+        groups.update({k: v for k, v in by_full.items() if len(v) >= 2})
+
+    if cache is not None:
+        cache.flush()
+
+    return DupeReport(groups, stats, algorithm)
+
+def find_duplicates(files: list[FileEntry], cache: Optional[HashCache] = None):
+    return find_duplicates_staged(files, cache=cache).groups
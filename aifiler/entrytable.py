@@ -0,0 +1,146 @@
+from __future__ import annotations
+from pathlib import Path
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+import os, sys
+from .scanner import FileEntry
+
+class EntryRow:
+    """EntryTable 의 한 행을 가리키는 가벼운 뷰. FileEntry 와 같은 속성(path/is_dir/size/mtime)을 제공."""
+    __slots__ = ("_t", "_i", "_path")
+
+    def __init__(self, table: "EntryTable", idx: int):
+        self._t = table
+        self._i = idx
+        self._path: Optional[Path] = None
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._path = self._t.path(self._i)
+        return self._path
+
+    @property
+    def is_dir(self) -> bool:
+        return bool(self._t.is_dir[self._i])
+
+    @property
+    def size(self) -> int:
+        return self._t.size[self._i]
+
+    @property
+    def mtime(self) -> float:
+        return self._t.mtime[self._i]
+
+    @property
+    def index(self) -> int:
+        return self._i
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EntryRow):
+            return self._t is other._t and self._i == other._i
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._t), self._i))
+
+    def __repr__(self) -> str:
+        return f"EntryRow(path={str(self.path)!r}, is_dir={self.is_dir}, size={self.size}, mtime={self.mtime})"
+
+class EntryTable:
+    """
+    FileEntry 목록을 열(column) 단위로 압축 보관.
+    - 부모 디렉터리 문자열은 한 번만 저장(intern)하고 행에는 dir id 만 기록
+    - 파일명은 UTF-8 바이트 버퍼 + 오프셋 배열
+    - size/mtime/is_dir 는 array 로 보관, Path 객체는 접근할 때만 생성
+    """
+
+    def __init__(self) -> None:
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_paths: Dict[int, Path] = {}
+        self.parent = array("I")
+        self._name_off = array("Q", [0])
+        self._names = bytearray()
+        self.size = array("q")
+        self.mtime = array("d")
+        self.is_dir = bytearray()
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[FileEntry]) -> "EntryTable":
+        t = cls()
+        t.extend(entries)
+        return t
+
+    def _intern_dir(self, d: str) -> int:
+        i = self._dir_ids.get(d)
+        if i is None:
+            i = len(self._dirs)
+            self._dirs.append(d)
+            self._dir_ids[d] = i
+        return i
+
+    def append(self, path: Path | str, is_dir: bool, size: int, mtime: float) -> int:
+        d, name = os.path.split(os.fspath(path))
+        self.parent.append(self._intern_dir(d))
+        self._names += name.encode("utf-8", "surrogatepass")
+        self._name_off.append(len(self._names))
+        self.size.append(size)
+        self.mtime.append(mtime)
+        self.is_dir.append(1 if is_dir else 0)
+        return len(self.size) - 1
+
+    def extend(self, entries: Iterable[FileEntry]) -> None:
+        for e in entries:
+            self.append(e.path, e.is_dir, e.size, e.mtime)
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def __getitem__(self, idx: int) -> EntryRow:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return EntryRow(self, idx)
+
+    def __iter__(self) -> Iterator[EntryRow]:
+        for i in range(len(self)):
+            yield EntryRow(self, i)
+
+    def iter_files(self) -> Iterator[EntryRow]:
+        is_dir = self.is_dir
+        for i in range(len(self)):
+            if not is_dir[i]:
+                yield EntryRow(self, i)
+
+    # ---- 열 접근 ----
+
+    def name(self, idx: int) -> str:
+        return self._names[self._name_off[idx]:self._name_off[idx+1]].decode("utf-8", "surrogatepass")
+
+    def parent_str(self, idx: int) -> str:
+        return self._dirs[self.parent[idx]]
+
+    def parent_path(self, idx: int) -> Path:
+        did = self.parent[idx]
+        p = self._dir_paths.get(did)
+        if p is None:
+            p = self._dir_paths[did] = Path(self._dirs[did])
+        return p
+
+    def path(self, idx: int) -> Path:
+        return self.parent_path(idx) / self.name(idx)
+
+    @property
+    def n_dirs(self) -> int:
+        return len(self._dirs)
+
+    def nbytes(self) -> int:
+        """테이블이 차지하는 대략적인 메모리(바이트). 디렉터리 문자열 포함, 지연 생성된 Path 캐시는 제외."""
+        cols = (self.parent, self._name_off, self.size, self.mtime)
+        total = sum(c.buffer_info()[1] * c.itemsize for c in cols)
+        total += len(self._names) + len(self.is_dir)
+        total += sys.getsizeof(self._dirs) + sum(sys.getsizeof(d) for d in self._dirs)
+        total += sys.getsizeof(self._dir_ids)
+        return total
@@ -0,0 +1,135 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse, os, sqlite3, time
+
+CACHE_PATH = Path("data/hash_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 2_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (dev, ino, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hashes_used ON hashes(used);
+"""
+
+StatKey = Tuple[int, int, int, int]  # (st_dev, st_ino, size, mtime_ns)
+
+def stat_key(path: Path) -> StatKey:
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def hash_kind(algorithm: str, sample_len: Optional[int]) -> str:
+    """캐시 구분자. sample_len=None 이면 전체 해시."""
+    return f"{algorithm}:{'full' if sample_len is None else sample_len}"
+
+class HashCache:
+    """
+    파일 내용 해시 캐시(SQLite). 키: (st_dev, st_ino, 알고리즘:샘플길이) + 검증용 size/mtime_ns.
+    - size 나 mtime_ns 가 달라지면 미스로 처리하고 행을 지움(변경 시 무효화)
+    - used(마지막 사용 시각) 기준 LRU 로 max_entries 를 넘는 행은 정리
+    sqlite 연결은 만든 스레드에서만 사용.
+    """
+
+    def __init__(self, db_path: Path = CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._touched: List[Tuple[int, int, int, str]] = []
+        self._dirty = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "HashCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, key: StatKey, kind: str) -> Optional[str]:
+        dev, ino, size, mtime_ns = key
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, digest FROM hashes WHERE dev=? AND ino=? AND kind=?", (dev, ino, kind)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        if row[0] != size or row[1] != mtime_ns:
+            self.conn.execute("DELETE FROM hashes WHERE dev=? AND ino=? AND kind=?", (dev, ino, kind))
+            self._dirty += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((time.time_ns(), dev, ino, kind))
+        return row[2]
+
+    def put(self, key: StatKey, kind: str, digest: str) -> None:
+        dev, ino, size, mtime_ns = key
+        self.conn.execute(
+            "INSERT OR REPLACE INTO hashes(dev, ino, kind, size, mtime_ns, digest, used) VALUES (?,?,?,?,?,?,?)",
+            (dev, ino, kind, size, mtime_ns, digest, time.time_ns()),
+        )
+        self._dirty += 1
+
+    def flush(self) -> None:
+        """지연된 LRU 갱신 반영 + 용량 초과분 정리 + 커밋."""
+        if self._touched:
+            self.conn.executemany("UPDATE hashes SET used=? WHERE dev=? AND ino=? AND kind=?", self._touched)
+            self._touched.clear()
+        if self._dirty:
+            self._evict()
+            self._dirty = 0
+        self.conn.commit()
+
+    def _evict(self) -> int:
+        n = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        over = n - self.max_entries
+        if over <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM hashes WHERE (dev, ino, kind) IN (SELECT dev, ino, kind FROM hashes ORDER BY used LIMIT ?)", (over,)
+        )
+        return over
+
+    def compact(self) -> Dict[str, int]:
+        """용량 상한까지 LRU 정리 후 VACUUM. 반환: 정리 전/후 행 수."""
+        self.flush()
+        before = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        self._evict()
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        after = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        return {"before": before, "after": after}
+
+    def stats(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        return {"rows": rows, "hits": self.hits, "misses": self.misses}
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m aifiler.hashcache")
+    ap.add_argument("cmd", choices=["compact", "stats"])
+    ap.add_argument("--db", type=Path, default=CACHE_PATH)
+    ap.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    args = ap.parse_args(argv)
+    with HashCache(args.db, args.max_entries) as cache:
+        if args.cmd == "compact":
+            r = cache.compact()
+            print(f"compacted: {r['before']} -> {r['after']} rows")
+        else:
+            print(cache.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple
+import hashlib, mmap, os, threading
+
+CHUNK_BYTES = 1024 * 1024
+
+# 표준 라이브러리 다이제스트만 사용(추가 의존성 없음)
+ALGORITHMS: Dict[str, Callable[[], "hashlib._Hash"]] = {
+    "blake2b": lambda: hashlib.blake2b(digest_size=16),
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+}
+READERS = ("auto", "readinto", "mmap", "read")
+DEFAULT_ALGORITHM = "sha1"
+DEFAULT_READER = "auto"
+MMAP_MIN_BYTES = 1024 * 1024  # auto: 이 크기 이상은 mmap, 미만은 재사용 버퍼 readinto
+
+Range = Tuple[int, int]  # (offset, length)
+
+def new_hasher(algorithm: str = DEFAULT_ALGORITHM):
+    try:
+        return ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"지원하지 않는 해시 알고리즘: {algorithm} (가능: {', '.join(ALGORITHMS)})") from None
+
+_local = threading.local()
+
+def _buffer(chunk: int) -> memoryview:
+    """스레드마다 재사용하는 읽기 버퍼(파일마다 새 bytes 를 만들지 않음)."""
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) < chunk:
+        buf = _local.buf = memoryview(bytearray(chunk))
+    return buf
+
+def _hash_readinto(f, h, ranges: Iterable[Range], chunk: int) -> int:
+    buf = _buffer(chunk)
+    read = 0
+    for off, length in ranges:
+        f.seek(off)
+        remain = length
+        while remain > 0:
+            n = f.readinto(buf[:min(chunk, remain)])
+            if not n:
+                break
+            h.update(buf[:n])
+            read += n
+            remain -= n
+    return read
+
+def _hash_mmap(f, h, ranges: Iterable[Range], size: int) -> int:
+    if size == 0:
+        return 0
+    read = 0
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mv = memoryview(mm)
+        try:
+            for off, length in ranges:
+                part = mv[off:off + length]
+                h.update(part)
+                read += len(part)
+                part.release()
+        finally:
+            mv.release()
+    return read
+
+def _hash_read(f, h, ranges: Iterable[Range], chunk: int) -> int:
+    read = 0
+    for off, length in ranges:
+        f.seek(off)
+        remain = length
+        while remain > 0:
+            data = f.read(min(chunk, remain))
+            if not data:
+                break
+            h.update(data)
+            read += len(data)
+            remain -= len(data)
+    return read
+
+def hash_ranges(path: Path, ranges: Iterable[Range], algorithm: str = DEFAULT_ALGORITHM,
+                reader: str = DEFAULT_READER, chunk: int = CHUNK_BYTES) -> Tuple[str, int]:
+    """지정한 (offset, length) 구간들을 순서대로 해시. 반환: (hexdigest, 읽은 바이트)"""
+    h = new_hasher(algorithm)
+    with open(path, "rb", buffering=0) as f:
+        if reader in ("auto", "mmap"):
+            size = os.fstat(f.fileno()).st_size
+            if reader == "auto":
+                reader = "mmap" if size >= MMAP_MIN_BYTES else "readinto"
+        if reader == "mmap":
+            n = _hash_mmap(f, h, ranges, size)
+        elif reader == "readinto":
+            n = _hash_readinto(f, h, ranges, chunk)
+        elif reader == "read":
+            n = _hash_read(f, h, ranges, chunk)
+        else:
+            raise ValueError(f"지원하지 않는 읽기 방식: {reader} (가능: {', '.join(READERS)})")
+    return h.hexdigest(), n
+
+def hash_file(path: Path, algorithm: str = DEFAULT_ALGORITHM, reader: str = DEFAULT_READER,
+              chunk: int = CHUNK_BYTES) -> Tuple[str, int]:
+    """파일 전체 해시. 반환: (hexdigest, 읽은 바이트)"""
+    size = os.stat(path).st_size
+    return hash_ranges(path, [(0, size)], algorithm, reader, chunk)
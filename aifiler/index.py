@@ -0,0 +1,198 @@
+from __future__ import annotations
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+import os, sqlite3
+from .scanner import FileEntry
+from .blacklist import compile_blacklist
+
+INDEX_PATH = Path("data/scan_index.sqlite")
+LOCK_TIMEOUT = 30.0  # 다른 스캔이 디렉터리 하나를 기록하는 동안 기다릴 최대 시간(초)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (parent, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS delta (
+    root TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS delta_root ON delta(root);
+"""
+
+Row = Tuple[str, bool, int, float]  # (name, is_dir, size, mtime)
+
+@dataclass
+class ScanDelta:
+    """직전 스캔 대비 변경 내역. initial=True 이면 첫 스캔이라 비교 대상이 없음."""
+    added: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    modified: List[Path] = field(default_factory=list)
+    initial: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+class ScanIndex:
+    """
+    디렉터리 mtime + 자식 항목을 SQLite에 보관하는 증분 스캔 인덱스.
+    - 디렉터리 mtime이 그대로면 자식 목록은 인덱스에서 읽고 stat을 생략
+    - 바뀐 디렉터리만 다시 scandir 하여 추가/삭제/변경을 delta 로 기록
+    ※ 파일 내용만 바뀐 경우(부모 mtime 불변)는 감지되지 않으므로 full=True 로 강제 재스캔.
+    """
+
+    def __init__(self, db_path: Path = INDEX_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        # 여러 작업이 같은 인덱스를 동시에 스캔할 수 있으므로 WAL(읽기는 쓰기와 무관) + 잠금 대기
+        self.conn = sqlite3.connect(str(db_path), timeout=LOCK_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.last_delta: Optional[ScanDelta] = None
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ScanIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- 내부 조회/기록 ----
+
+    def _dir_mtime(self, key: str) -> Optional[int]:
+        row = self.conn.execute("SELECT mtime_ns FROM dirs WHERE path=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _children(self, key: str) -> List[Row]:
+        cur = self.conn.execute("SELECT name, is_dir, size, mtime FROM entries WHERE parent=?", (key,))
+        return [(n, bool(d), s, m) for n, d, s, m in cur]
+
+    def _purge_subtree(self, key: str) -> None:
+        """삭제된 디렉터리의 하위 기록을 모두 제거."""
+        # LIKE 는 경로 속 '_'/'%' 를 와일드카드로 해석하므로 접두사 범위 조건 사용
+        lo = key.rstrip(os.sep) + os.sep
+        hi = lo[:-1] + chr(ord(os.sep) + 1)
+        self.conn.execute("DELETE FROM entries WHERE parent=? OR (parent>=? AND parent<?)", (key, lo, hi))
+        self.conn.execute("DELETE FROM dirs WHERE path=? OR (path>=? AND path<?)", (key, lo, hi))
+
+    def _store_dir(self, key: str, mtime_ns: int, rows: List[Row]) -> None:
+        self.conn.execute("DELETE FROM entries WHERE parent=?", (key,))
+        self.conn.executemany(
+            "INSERT INTO entries(parent, name, is_dir, size, mtime) VALUES (?,?,?,?,?)",
+            [(key, n, int(d), s, m) for n, d, s, m in rows],
+        )
+        self.conn.execute("INSERT OR REPLACE INTO dirs(path, mtime_ns) VALUES (?,?)", (key, mtime_ns))
+
+    @staticmethod
+    def _list_dir(cur: Path) -> List[Row]:
+        rows: List[Row] = []
+        with os.scandir(cur) as it:
+            for de in it:
+                try:
+                    st = de.stat(follow_symlinks=False)
+                    if de.is_dir(follow_symlinks=False):
+                        rows.append((de.name, True, 0, st.st_mtime))
+                    else:
+                        rows.append((de.name, False, st.st_size, st.st_mtime))
+                except (PermissionError, FileNotFoundError):
+                    continue
+        return rows
+
+    # ---- 공개 API ----
+
+    def scan(self, root: Path, exclude_roots: set[Path], exclude_dirnames: set[str],
+             max_depth: int = 12, full: bool = False) -> Iterator[FileEntry]:
+        """iter_tree 와 동일한 FileEntry 스트림을 반환하되, 변하지 않은 디렉터리는 인덱스에서 재사용."""
+        root = root.resolve()
+        trie = compile_blacklist(exclude_roots, exclude_dirnames)
+        blocked, node = trie.locate(root)
+        if blocked:
+            return
+        has_history = self._dir_mtime(str(root)) is not None
+        delta = ScanDelta(initial=not has_history)
+        stack = [(root, 0, node)]
+        try:
+            while stack:
+                cur, depth, node = stack.pop()
+                key = str(cur)
+                try:
+                    mtime_ns = os.stat(cur).st_mtime_ns
+                except (NotADirectoryError, PermissionError, FileNotFoundError):
+                    continue
+                cached = self._dir_mtime(key)
+                if cached == mtime_ns and not full:
+                    rows = self._children(key)
+                else:
+                    try:
+                        rows = self._list_dir(cur)
+                    except (NotADirectoryError, PermissionError, FileNotFoundError):
+                        continue
+                    if cached is not None and has_history:
+                        self._diff_into(delta, cur, self._children(key), rows)
+                    elif has_history:
+                        delta.added.extend(cur / n for n, _, _, _ in rows)
+                    self._store_dir(key, mtime_ns, rows)
+                    # 쓰기 잠금을 yield(소비자 처리 시간) 너머로 들고 있지 않도록 디렉터리마다 커밋
+                    self.conn.commit()
+                for name, is_dir, size, mtime in rows:
+                    blocked, child = trie.step(node, name, is_dir)
+                    if blocked:
+                        continue
+                    p = cur / name
+                    if is_dir:
+                        yield FileEntry(p, True, 0, mtime)
+                        if depth < max_depth:
+                            stack.append((p, depth+1, child))
+                    else:
+                        yield FileEntry(p, False, size, mtime)
+        finally:
+            self._save_delta(str(root), delta)
+            self.conn.commit()
+            self.last_delta = delta
+
+    def _diff_into(self, delta: ScanDelta, cur: Path, old_rows: List[Row], new_rows: List[Row]) -> None:
+        old = {r[0]: r for r in old_rows}
+        new = {r[0]: r for r in new_rows}
+        for name, row in new.items():
+            prev = old.get(name)
+            if prev is None:
+                delta.added.append(cur / name)
+            elif not row[1] and (prev[1] or prev[2] != row[2] or prev[3] != row[3]):
+                delta.modified.append(cur / name)
+        for name, row in old.items():
+            if name not in new:
+                delta.removed.append(cur / name)
+                if row[1]:
+                    self._purge_subtree(str(cur / name))
+
+    def _save_delta(self, root_key: str, delta: ScanDelta) -> None:
+        self.conn.execute("DELETE FROM delta WHERE root=?", (root_key,))
+        rows = [(root_key, "initial", "")] if delta.initial else []
+        rows += [(root_key, "added", str(p)) for p in delta.added]
+        rows += [(root_key, "removed", str(p)) for p in delta.removed]
+        rows += [(root_key, "modified", str(p)) for p in delta.modified]
+        self.conn.executemany("INSERT INTO delta(root, kind, path) VALUES (?,?,?)", rows)
+
+    def changes_since_last_scan(self, root: Path) -> ScanDelta:
+        """가장 최근 scan(root) 에서 기록된 변경 내역(직전 스캔 대비)."""
+        delta = ScanDelta()
+        cur = self.conn.execute("SELECT kind, path FROM delta WHERE root=?", (str(root.resolve()),))
+        for kind, path in cur:
+            if kind == "initial":
+                delta.initial = True
+            else:
+                getattr(delta, kind).append(Path(path))
+        return delta
@@ -0,0 +1,176 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import itertools, threading, time
+
+JobKey = Tuple[str, Hashable]  # (종류, 파라미터 키)
+
+class JobCancelled(Exception):
+    """작업 함수 안에서 job.check() 가 취소 요청을 감지하면 발생."""
+
+@dataclass
+class JobProgress:
+    done: int = 0
+    total: Optional[int] = None
+    bytes: int = 0
+    stage: str = ""
+    elapsed: float = 0.0
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """남은 예상 시간(초). total 을 모르거나 아직 진행이 없으면 None."""
+        if not self.total or not self.done:
+            return None
+        return self.elapsed * (self.total - self.done) / self.done
+
+class Job:
+    """
+    백그라운드 작업 1건. 작업 함수는 job.report() 로 진행률/부분 결과를 올리고,
+    주기적으로 job.check() 를 불러 취소 요청에 응답.
+    상태: running / done / cancelled / error
+    """
+
+    _seq = itertools.count(1)
+
+    def __init__(self, kind: str, key: Hashable):
+        self.kind = kind
+        self.key = key
+        self.seq = next(Job._seq)   # 같은 키로 다시 실행할 때마다 증가(하위 작업 키에 사용)
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self.partial: Any = None
+        self.warnings: List[str] = []  # 작업은 계속했지만 사용자에게 알릴 내용(건너뛴 단계 등)
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._progress = JobProgress()
+
+    # ---- 작업 함수 쪽 ----
+
+    def report(self, done: Optional[int] = None, total: Optional[int] = None, bytes: Optional[int] = None,
+               stage: Optional[str] = None, partial: Any = None) -> None:
+        with self._lock:
+            p = self._progress
+            if done is not None: p.done = done
+            if total is not None: p.total = total
+            if bytes is not None: p.bytes = bytes
+            if stage is not None:
+                if stage != p.stage:
+                    p.done, p.total = (done or 0), total
+                p.stage = stage
+            if partial is not None: self.partial = partial
+        self.check()
+
+    def warn(self, message: str) -> None:
+        with self._lock:
+            self.warnings.append(message)
+
+    def check(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    # ---- UI 쪽 ----
+
+    @property
+    def progress(self) -> JobProgress:
+        with self._lock:
+            p = self._progress
+            end = self.finished if self.finished is not None else time.monotonic()
+            return JobProgress(p.done, p.total, p.bytes, p.stage, end - self.started)
+
+    @property
+    def status(self) -> str:
+        f = self.future
+        if f is None or not f.done():
+            return "running"
+        if f.cancelled() or isinstance(f.exception(), JobCancelled):
+            return "cancelled"
+        return "error" if f.exception() is not None else "done"
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def result(self) -> Any:
+        """완료된 결과. 완료 전/취소/오류면 None."""
+        return self.future.result() if self.status == "done" else None
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self.future.exception() if self.status == "error" else None
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()  # 아직 시작 전이면 바로 취소
+
+class JobManager:
+    """
+    (종류, 파라미터) 키로 작업을 관리하는 스레드 풀. Streamlit 에서는 st.cache_resource 로 프로세스당 1개를 공유하므로
+    재실행(rerun)이나 새로고침, 다른 세션에서도 같은 루트/파라미터의 작업과 결과를 그대로 다시 사용.
+    """
+
+    def __init__(self, workers: int = 2, keep_done: int = 16):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aifiler-job")
+        self.keep_done = keep_done
+        self._jobs: Dict[JobKey, Job] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, key: Hashable) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get((kind, key))
+
+    def submit(self, kind: str, key: Hashable, fn: Callable[[Job], Any], restart: bool = False) -> Job:
+        """
+        작업 시작. 같은 키의 작업이 실행 중이거나 완료돼 있으면 그대로 반환(restart=True 면 취소 후 새로 시작).
+        취소/오류로 끝난 작업은 항상 새로 시작.
+        """
+        with self._lock:
+            old = self._jobs.get((kind, key))
+            if old is not None and not restart and old.status in ("running", "done"):
+                return old
+            if old is not None:
+                old.cancel()
+            job = Job(kind, key)
+
+            def run() -> Any:
+                try:
+                    return fn(job)
+                finally:
+                    job.finished = time.monotonic()
+
+            job.future = self.pool.submit(run)
+            self._jobs[(kind, key)] = job
+            self._trim()
+            return job
+
+    def forget(self, kind: str, key: Hashable) -> None:
+        with self._lock:
+            job = self._jobs.pop((kind, key), None)
+        if job is not None:
+            job.cancel()
+
+    def forget_kind(self, kind: str) -> None:
+        with self._lock:
+            keys = [k for k in self._jobs if k[0] == kind]
+            jobs = [self._jobs.pop(k) for k in keys]
+        for job in jobs:
+            job.cancel()
+
+    def running(self) -> List[Job]:
+        with self._lock:
+            return [j for j in self._jobs.values() if j.running]
+
+    def _trim(self) -> None:
+        """끝난 작업은 최근 keep_done 개만 보관(결과가 메모리를 계속 차지하지 않도록)."""
+        finished = [k for k, j in self._jobs.items() if not j.running]
+        for k in finished[:max(0, len(finished) - self.keep_done)]:
+            del self._jobs[k]
@@ -0,0 +1,160 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json, os, time
+
+JOURNAL_DIR = Path("data/journal")
+GROUP_OPS = 256        # 이 개수만큼 쌓이면 fsync
+GROUP_MS = 50.0        # 또는 마지막 fsync 후 이 시간이 지나면 fsync
+
+# 이 프로세스에서 진행 중인 저널(복구 대상에서 제외)
+_ACTIVE: set = set()
+
+class Journal:
+    """
+    배치 1건의 추가 전용(JSONL) 선행 기록.
+    레코드: begin / mkdir / intent(i, src, dst) / done(i) / commit(undo_off)
+    - write() 는 버퍼에 쓰고 GROUP_OPS 개 또는 GROUP_MS 마다 한 번 fsync(그룹 커밋)
+    - sync() 는 즉시 fsync(의도 기록을 실제 이동 전에 확정할 때 사용)
+    """
+
+    def __init__(self, path: Path, group_ops: int = GROUP_OPS, group_ms: float = GROUP_MS):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.group_ops = group_ops
+        self.group_ms = group_ms
+        self.f = path.open("a", encoding="utf-8")
+        self._pending = 0
+        self._last = time.monotonic()
+        _ACTIVE.add(str(path))
+
+    def write(self, rec: Dict[str, Any], sync: bool = True) -> None:
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._pending += 1
+        if sync and (self._pending >= self.group_ops or (time.monotonic() - self._last) * 1000 >= self.group_ms):
+            self.sync()
+
+    def sync(self) -> None:
+        if self._pending:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self._pending = 0
+        self._last = time.monotonic()
+
+    def close(self, remove: bool = False) -> None:
+        self.sync()
+        self.f.close()
+        _ACTIVE.discard(str(self.path))
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if not self.f.closed:
+            self.close()
+
+def journal_path(batch_id: str, journal_dir: Path = JOURNAL_DIR) -> Path:
+    return journal_dir / f"{batch_id}.jsonl"
+
+def read_journal(path: Path) -> Iterator[Dict[str, Any]]:
+    """저널 레코드를 순서대로. 비정상 종료로 잘린 마지막 줄은 무시."""
+    with path.open("r", encoding="utf-8") as f:
+        for ln in f:
+            if not ln.endswith("\n"):
+                return
+            try:
+                yield json.loads(ln)
+            except json.JSONDecodeError:
+                return
+
+def pending_journals(journal_dir: Path = JOURNAL_DIR) -> List[Path]:
+    """다른 실행(또는 비정상 종료)에서 남은 저널 목록. 이 프로세스에서 진행 중인 것은 제외."""
+    if not journal_dir.exists():
+        return []
+    out = []
+    for p in sorted(journal_dir.glob("*.jsonl")):
+        if str(p) in _ACTIVE:
+            continue
+        out.append(p)
+    return out
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False  # 같은 pid 인데 _ACTIVE 에 없으면 이전 실행의 잔여물
+    if os.name == "nt":
+        return False  # Windows 의 os.kill 은 프로세스를 종료시키므로 확인하지 않음
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def owner_alive(path: Path) -> bool:
+    """begin 레코드의 pid 가 아직 살아 있으면 True(다른 프로세스가 진행 중인 배치)."""
+    for rec in read_journal(path):
+        if rec.get("t") == "begin":
+            pid = rec.get("pid")
+            return isinstance(pid, int) and _pid_alive(pid)
+        break
+    return False
+
+def done_flags(path: Path) -> bytearray:
+    """intent 번호별 완료 여부(1바이트/건)."""
+    flags = bytearray()
+    for rec in read_journal(path):
+        t = rec.get("t")
+        if t == "intent":
+            i = rec["i"]
+            if i >= len(flags):
+                flags.extend(b"\0" * (i + 1 - len(flags)))
+        elif t == "done":
+            flags[rec["i"]] = 1
+    return flags
+
+def write_undo_record(path: Path, undo_log: Path, header: Dict[str, Any], flags: bytearray,
+                      created_dirs: List[str], extra: Optional[Dict[str, Any]] = None) -> None:
+    """
+    저널의 완료된 intent 만 골라 undo.jsonl 에 배치 레코드 한 줄로 스트리밍 기록(이동 목록을 메모리에 모으지 않음).
+    레코드 형식은 기존 apply_moves 와 같음: {"id", "time", "mode", "moves": [...], "created_dirs": [...]}
+    """
+    dumps = lambda x: json.dumps(x, ensure_ascii=False)
+    with undo_log.open("a", encoding="utf-8") as out:
+        out.write('{"id": %s, "time": %s, "mode": %s, "moves": [' % (dumps(header["id"]), dumps(header["time"]),
+                                                                    dumps(header["mode"])))
+        first = True
+        for rec in read_journal(path):
+            if rec.get("t") != "intent" or not flags[rec["i"]]:
+                continue
+            out.write(("" if first else ", ") + dumps({"src": rec["src"], "dst": rec["dst"]}))
+            first = False
+        out.write('], "created_dirs": ' + dumps(sorted(created_dirs)))
+        for k, v in (extra or {}).items():
+            out.write(", %s: %s" % (dumps(k), dumps(v)))
+        out.write("}\n")
+        out.flush()
+        os.fsync(out.fileno())
+
+def undo_line_complete(undo_log: Path, off: int) -> bool:
+    """undo_log 의 off 위치에서 시작하는 줄이 온전히 기록되었는지."""
+    if not undo_log.exists() or undo_log.stat().st_size <= off:
+        return False
+    with undo_log.open("rb") as f:
+        f.seek(off)
+        line = f.readline()
+    if not line.endswith(b"\n"):
+        return False
+    try:
+        json.loads(line)
+    except ValueError:
+        return False
+    return True
+
+def truncate_to(undo_log: Path, off: int) -> None:
+    """커밋 도중 끊겨 남은 불완전한 줄 제거."""
+    if undo_log.exists() and undo_log.stat().st_size > off:
+        with undo_log.open("r+b") as f:
+            f.truncate(off)
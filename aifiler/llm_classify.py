@@ -0,0 +1,140 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+import hashlib, json, os, re, sqlite3, time
+from .rules import Rule
+from .llm_local import LLM_CACHE_PATH, _strip_code_fences, generate_text, model_fingerprint
+
+BATCH_SIZE = 40          # generate 1회에 넣을 패턴 수
+PROMPT_VERSION = "v2"    # 프롬프트 문구를 바꾸면 올려서 캐시 무효화
+LLM_SCORE = 0.6
+
+_DATE_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}[-_.]?(?:0[1-9]|1[0-2])[-_.]?(?:0[1-9]|[12]\d|3[01])(?!\d)")
+_DIGITS_RE = re.compile(r"\d+")
+_HASH_RUN_RE = re.compile(r"#(?:[-_. ]*#)+")
+
+def filename_pattern(name: str) -> str:
+    """
+    파일명(확장자 제외)에서 날짜/숫자를 지운 패턴. 같은 패턴은 같은 답을 공유.
+    확장자는 그대로 둠(.mp3/.mp4, .m4a/.m4v, .7z 등이 한 패턴으로 합쳐지지 않도록).
+    예) "Report_2024-03-01_v2.DOCX" → "report_#_v#.docx", "IMG 0001 (3).jpg" → "img # (#).jpg"
+    """
+    stem, ext = os.path.splitext(name.casefold())
+    s = _DATE_RE.sub("#", stem)
+    s = _DIGITS_RE.sub("#", s)
+    return _HASH_RUN_RE.sub("#", s) + ext
+
+class PatternCache:
+    """패턴 → 규칙 이름(없으면 None) 캐시. 키: (패턴, 모델 해시, 규칙 목록 서명, 프롬프트 버전)."""
+
+    def __init__(self, db_path: Path = LLM_CACHE_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS patterns (key TEXT PRIMARY KEY, rule TEXT, created INTEGER NOT NULL)")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Optional[str]]:
+        out: Dict[str, Optional[str]] = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            q = "SELECT key, rule FROM patterns WHERE key IN (%s)" % ",".join("?" * len(chunk))
+            out.update(self.conn.execute(q, chunk).fetchall())
+        return out
+
+    def put_many(self, items: Dict[str, Optional[str]]) -> None:
+        now = int(time.time())
+        self.conn.executemany("INSERT OR REPLACE INTO patterns(key, rule, created) VALUES (?,?,?)",
+                              [(k, v, now) for k, v in items.items()])
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "PatternCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _rules_signature(rules: Sequence[Rule]) -> str:
+    return hashlib.sha1(json.dumps([(r.name, r.dest) for r in rules], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _build_prompt(examples: List[str], rules: Sequence[Rule]) -> str:
+    cats = "\n".join(f"- {r.name}: {r.dest}" for r in rules)
+    items = "\n".join(f"{i}. {name}" for i, name in enumerate(examples, start=1))
+    return (
+        "Classify each filename into exactly one category by its name.\n"
+        f"Categories (name: destination folder):\n{cats}\n"
+        "Answer ONLY with a JSON object mapping each item number to a category name, "
+        'or "none" if no category fits. No comments, no markdown.\n'
+        f"Filenames:\n{items}\nJSON:"
+    )
+
+def _parse_answer(text: str, n: int, rule_names: Dict[str, str]) -> Optional[List[Optional[str]]]:
+    """모델 답을 규칙 이름 목록으로. JSON 이 아니면 None(캐시하지 않음), 모르는 이름은 None."""
+    try:
+        data = json.loads(_strip_code_fences(text))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    out: List[Optional[str]] = []
+    for i in range(1, n + 1):
+        ans = data.get(str(i))
+        out.append(rule_names.get(ans.strip().casefold()) if isinstance(ans, str) else None)
+    return out
+
+def classify_patterns(names: Iterable[str], rules: Sequence[Rule], models_dir: Path,
+                      batch_size: int = BATCH_SIZE, cache_path: Optional[Path] = LLM_CACHE_PATH,
+                      timeout: Optional[float] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Optional[str]]:
+    """
+    파일명들을 패턴으로 묶어 패턴당 한 번만 분류. 반환: 패턴 → 규칙 이름(맞는 규칙이 없으면 None).
+    캐시에 없는 패턴만 batch_size 개씩 한 프롬프트로 모델에 보냄(대표 파일명 1개씩).
+    progress(처리한 패턴 수, 전체 패턴 수)
+    """
+    examples: Dict[str, str] = {}
+    for n in names:
+        examples.setdefault(filename_pattern(n), n)
+    if not examples or not rules:
+        return {p: None for p in examples}
+    sig = "\0".join((model_fingerprint(models_dir), _rules_signature(rules), PROMPT_VERSION))
+    key_of = {p: hashlib.sha256((p + "\0" + sig).encode("utf-8")).hexdigest() for p in examples}
+    rule_names = {r.name.casefold(): r.name for r in rules}
+
+    cache = PatternCache(cache_path) if cache_path is not None else None
+    try:
+        hits = cache.get_many(list(key_of.values())) if cache else {}
+        result: Dict[str, Optional[str]] = {p: hits[k] for p, k in key_of.items() if k in hits}
+        misses = [p for p in examples if p not in result]
+        total = len(examples)
+        if progress:
+            progress(len(result), total)
+        for i in range(0, len(misses), batch_size):
+            batch = misses[i:i + batch_size]
+            text = generate_text(_build_prompt([examples[p] for p in batch], rules), models_dir,
+                                 max_tokens=16 * len(batch) + 64, temp=0.0, timeout=timeout)
+            answers = _parse_answer(text, len(batch), rule_names)
+            if answers is None:
+                result.update((p, None) for p in batch)  # 형식 오류는 이번만 미분류로(캐시 안 함)
+            else:
+                result.update(zip(batch, answers))
+                if cache:
+                    cache.put_many({key_of[p]: a for p, a in zip(batch, answers)})
+            if progress:
+                progress(total - len(misses) + i + len(batch), total)
+        return result
+    finally:
+        if cache:
+            cache.close()
+
+def classify_others(names: Sequence[str], rules: Sequence[Rule], models_dir: Path, **kwargs) -> List[Optional[dict]]:
+    """
+    others_review 로 남은 파일명들에 대한 추천. 입력 순서대로 {"rule","score","why"} 또는 None(분류 못 함).
+    kwargs 는 classify_patterns 로 전달.
+    """
+    by_pattern = classify_patterns(names, rules, models_dir, **kwargs)
+    out: List[Optional[dict]] = []
+    for n in names:
+        rule = by_pattern.get(filename_pattern(n))
+        out.append({"rule": rule, "score": LLM_SCORE, "why": "llm:pattern"} if rule else None)
+    return out
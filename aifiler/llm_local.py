@@ -1,15 +1,12 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Optional, List
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, List, Tuple
 from ruamel.yaml import YAML
-import glob
+import glob, hashlib, json, queue, sqlite3, threading, time
 
-try:
-    from gpt4all import GPT4All  # pip install gpt4all
-except Exception as e:
-    raise RuntimeError("gpt4all가 설치되어 있어야 합니다: pip install gpt4all") from e
-
-_GPT: Optional[GPT4All] = None
+LLM_CACHE_PATH = Path("data/llm_cache.sqlite")
 
 # 기본적으로 찾을 모델 파일명 후보 (없으면 첫 번째 *.gguf 사용)
 DEFAULT_MODEL_NAME_CANDIDATES: List[str] = [
@@ -47,26 +44,205 @@ def _discover_model(models_dir: Path) -> tuple[str, Path]:
     # 3) 없으면 기본 후보 중 하나의 이름만 반환(다운로드 용)
     return (DEFAULT_MODEL_NAME_CANDIDATES[0], models_dir)
 
-def _ensure_model(model_file_or_name: str, model_dir: Path):
+@lru_cache(maxsize=8)
+def _discover_cached(models_dir: Path, dir_mtime_ns: int) -> tuple[str, Path]:
+    return _discover_model(models_dir)
+
+def discover_model(models_dir: Path) -> tuple[str, Path]:
+    """_discover_model 결과를 폴더 mtime 기준으로 캐시(모델 파일이 추가/삭제되면 다시 탐지)."""
+    models_dir.mkdir(parents=True, exist_ok=True)
+    return _discover_cached(models_dir.resolve(), models_dir.stat().st_mtime_ns)
+
+def _gpt4all_factory(model_file_or_name: str, model_dir: Path):
     """
     gpt4all은 (모델파일명, 모델디렉터리)로 생성 시,
     - 해당 파일이 있으면 그대로 사용
     - 없으면 같은 이름을 가진 모델을 인터넷에서 자동 다운로드 시도
     """
-    global _GPT
-    if _GPT is None:
-        _GPT = GPT4All(model_file_or_name, model_dir.as_posix())
+    try:
+        from gpt4all import GPT4All  # pip install gpt4all
+    except Exception as e:
+        raise RuntimeError("gpt4all가 설치되어 있어야 합니다: pip install gpt4all") from e
+    return GPT4All(model_file_or_name, model_dir.as_posix())
+
+ModelFactory = Callable[[str, Path], Any]  # (모델 파일명, 모델 폴더) → generate(prompt, max_tokens=, temp=) 를 가진 객체
+_factory: ModelFactory = _gpt4all_factory
+
+class _ModelWorker:
+    """
+    모델을 소유하고 요청을 순서대로 처리하는 백그라운드 스레드(첫 사용 후 모델을 계속 올려 둠).
+    로드에 실패하면 대기 중인 요청에 그 오류를 돌려주고 종료 — 다음 요청 때 _get_worker 가 새 워커로 다시 로드.
+    """
+
+    def __init__(self, factory: ModelFactory, model_file: str, model_dir: Path):
+        self.ident = (factory, model_file, model_dir)
+        self.requests: "queue.Queue[Optional[Tuple[str, Dict[str, Any], Future]]]" = queue.Queue()
+        self.loaded = threading.Event()
+        self.failed: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="aifiler-llm", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        factory, model_file, model_dir = self.ident
+        try:
+            model = factory(model_file, model_dir)
+        except BaseException as e:
+            with self._lock:  # 이후 submit 은 큐에 넣지 않고 바로 실패하므로, 여기서 비운 뒤에는 남는 요청이 없음
+                self.failed = e
+            self.loaded.set()
+            while True:
+                try:
+                    item = self.requests.get_nowait()
+                except queue.Empty:
+                    return
+                if item is not None and item[2].set_running_or_notify_cancel():
+                    item[2].set_exception(e)
+        self.loaded.set()
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            text, kwargs, fut = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(model.generate(text, **kwargs))
+            except BaseException as e:
+                fut.set_exception(e)
+
+    def submit(self, text: str, **kwargs: Any) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self.failed is not None:
+                fut.set_exception(self.failed)
+            else:
+                self.requests.put((text, kwargs, fut))
+        return fut
+
+    def stop(self) -> None:
+        self.requests.put(None)
+
+_worker: Optional[_ModelWorker] = None
+_worker_lock = threading.Lock()
+
+def _get_worker(model_file: str, model_dir: Path) -> _ModelWorker:
+    global _worker
+    with _worker_lock:
+        ident = (_factory, model_file, model_dir)
+        # 로드에 실패한 워커는 버리고 다시 로드(다운로드 중 네트워크 오류 등 일시적 실패에서 회복)
+        if _worker is None or _worker.ident != ident or _worker.failed is not None:
+            if _worker is not None:
+                _worker.stop()
+            _worker = _ModelWorker(_factory, model_file, model_dir)
+        return _worker
+
+def set_model_factory(factory: Optional[ModelFactory]) -> None:
+    """모델 생성 함수 교체(None 이면 gpt4all). 가짜 모델로 돌려 볼 때 사용. 기존 워커는 정리."""
+    global _factory, _worker
+    with _worker_lock:
+        _factory = factory or _gpt4all_factory
+        if _worker is not None:
+            _worker.stop()
+            _worker = None
+
+def warm_up(models_dir: Path) -> bool:
+    """모델 파일이 이미 있으면 백그라운드에서 미리 로드(다운로드는 하지 않음). 반환: 로드를 시작했는지."""
+    model_file, mdir = discover_model(models_dir)
+    if not (mdir / model_file).exists():
+        return False
+    _get_worker(model_file, mdir)
+    return True
+
+# ---- 프롬프트 → 규칙 JSON 캐시 ----
+
+def _normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+def _model_fingerprint(model_file: str, model_dir: Path) -> str:
+    """모델 파일 내용 해시(해시 캐시로 파일이 바뀌지 않았으면 다시 읽지 않음). 파일이 아직 없으면 이름."""
+    p = model_dir / model_file
+    if not p.exists():
+        return "name:" + model_file
+    from .hashcache import HashCache, hash_kind, stat_key
+    from .dupes import full_hash
+    key = stat_key(p)
+    with HashCache() as cache:
+        digest = cache.get(key, hash_kind("sha1", None))
+        if digest is None:
+            digest = full_hash(p)[0]
+            cache.put(key, hash_kind("sha1", None), digest)
+    return digest
+
+def model_fingerprint(models_dir: Path) -> str:
+    """models_dir 에서 탐지된 모델의 내용 해시(캐시 키용)."""
+    return _model_fingerprint(*discover_model(models_dir))
+
+def generate_text(text: str, models_dir: Path, max_tokens: int = 512, temp: float = 0.1,
+                  timeout: Optional[float] = None) -> str:
+    """탐지된 모델로 한 번 생성(백그라운드 워커 재사용)."""
+    model_file_name, mdir = discover_model(models_dir)
+    return _get_worker(model_file_name, mdir).submit(text, max_tokens=max_tokens, temp=temp).result(timeout)
+
+def prompt_cache_key(prompt: str, model_fingerprint: str, sys_prompt: str = SYS_PROMPT) -> str:
+    parts = (_normalize_prompt(prompt), model_fingerprint, hashlib.sha1(sys_prompt.encode("utf-8")).hexdigest())
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class PromptCache:
+    """검증된 규칙 JSON 을 (정규화된 프롬프트, 모델 파일 해시, SYS_PROMPT 해시) 키로 보관(SQLite)."""
+
+    def __init__(self, db_path: Path = LLM_CACHE_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS prompts (key TEXT PRIMARY KEY, rules_json TEXT NOT NULL, created INTEGER NOT NULL)")
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT rules_json FROM prompts WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, rules_json: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO prompts(key, rules_json, created) VALUES (?,?,?)",
+                          (key, rules_json, int(time.time())))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "PromptCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def validate_rules_json(json_text: str) -> str:
+    """SYS_PROMPT 스키마에 맞는지 확인하고 정규화된 JSON 문자열을 반환. 맞지 않으면 ValueError."""
+    try:
+        data = json.loads(json_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM 출력이 JSON 이 아닙니다: {e}") from e
+    rules = data.get("rules") if isinstance(data, dict) else None
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("LLM 출력에 rules 목록이 없습니다")
+    for r in rules:
+        if not isinstance(r, dict) or not isinstance(r.get("name"), str) or not isinstance(r.get("dest"), str):
+            raise ValueError(f"규칙에 name/dest 가 없습니다: {r!r}")
+        m = r.get("match", {})
+        if not isinstance(m, dict) or any(k not in ("ext", "name_like") or not isinstance(v, list) for k, v in m.items()):
+            raise ValueError(f"match 는 ext/name_like 목록만 가능합니다: {m!r}")
+    return json.dumps(data, ensure_ascii=False)
 
 def _strip_code_fences(text: str) -> str:
     t = text.strip()
     if t.startswith("```"):
         parts = t.split("```")
         if len(parts) >= 3:
-            return parts[1].strip()
+            body = parts[1]
+            if body[:4].lower() == "json":  # ```json 처럼 언어 표시가 붙은 경우
+                body = body[4:]
+            return body.strip()
     return t
 
 def _json_to_yaml(json_text: str) -> str:
-    import json
     data = json.loads(json_text)
     yaml = YAML()
     yaml.default_flow_style = False
@@ -75,20 +251,29 @@ def _json_to_yaml(json_text: str) -> str:
     yaml.dump(data, buf)
     return buf.getvalue()
 
-def prompt_to_rules_yaml(prompt: str, models_dir: Path) -> str:
+def prompt_to_rules_yaml(prompt: str, models_dir: Path, cache_path: Optional[Path] = LLM_CACHE_PATH,
+                         timeout: Optional[float] = None) -> str:
     """
     프롬프트 -> (gpt4all 내장 LLM) JSON -> YAML
-    - models_dir 에서 모델 자동 탐지
+    - models_dir 에서 모델 자동 탐지(폴더가 바뀌지 않으면 캐시된 결과 사용)
     - 파일이 없어도 같은 이름을 가진 모델 자동 다운로드 시도
+    - 모델은 백그라운드 스레드에 한 번 올려 두고 재사용
+    - 검증된 결과는 cache_path 에 저장, 같은 프롬프트/모델/SYS_PROMPT 면 모델을 부르지 않음(None 이면 캐시 안 함)
     """
-    model_file_name, mdir = _discover_model(models_dir)
-    _ensure_model(model_file_name, mdir)
-    assert _GPT is not None
-    sys_prompt = SYS_PROMPT + "\nOutput MUST be valid JSON. No markdown fences."
-    out = _GPT.generate(
-        f"{sys_prompt}\nUSER:\n{prompt}\nJSON:",
-        max_tokens=512,
-        temp=0.1
-    )
-    json_text = _strip_code_fences(out)
-    return _json_to_yaml(json_text)
+    model_file_name, mdir = discover_model(models_dir)
+    cache = PromptCache(cache_path) if cache_path is not None else None
+    try:
+        key = prompt_cache_key(prompt, _model_fingerprint(model_file_name, mdir)) if cache else ""
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            return _json_to_yaml(cached)
+        sys_prompt = SYS_PROMPT + "\nOutput MUST be valid JSON. No markdown fences."
+        out = generate_text(f"{sys_prompt}\nUSER:\n{prompt}\nJSON:", models_dir, max_tokens=512, temp=0.1,
+                            timeout=timeout)
+        json_text = validate_rules_json(_strip_code_fences(out))
+        if cache:
+            cache.put(key, json_text)
+        return _json_to_yaml(json_text)
+    finally:
+        if cache:
+            cache.close()
@@ -1,31 +1,414 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Tuple, Optional
-from PIL import Image
-from pypdf import PdfReader
-from mutagen import File as MutagenFile
+from typing import Callable, List, Optional, Tuple
+import json, re, struct, zlib
+from .hashcache import HashCache, StatKey
 
-def cheap_meta_peek(path: Path) -> Tuple[Optional[str], float, str]:
-    ext = path.suffix.lower()
-    if ext in {".jpg",".jpeg",".png",".heic"}:
-        try:
-            with Image.open(path) as im:
-                exif = im.getexif()
-                if exif: return ("photos_by_date", 0.8, "meta:exif")
-        except Exception:
-            pass
-    if ext == ".pdf":
-        try:
-            r = PdfReader(str(path))
-            info = r.metadata
-            if info and (info.title or info.producer or info.creator):
-                return ("receipts_pdf", 0.76, "meta:pdfinfo")
-        except Exception:
-            pass
-    if ext in {".mp3",".m4a",".flac",".mp4",".mkv",".mov"}:
+# 파일당 읽기 상한. 헤더/트레일러만 확인하므로 대용량 PDF/영상도 이 이상 읽지 않음.
+MAX_PEEK_BYTES = 256 * 1024
+META_CACHE_PATH = Path("data/meta_cache.sqlite")
+META_CACHE_KIND = "meta:v3"
+
+MetaResult = Tuple[Optional[str], float, str]
+
+class _CappedReader:
+    """읽은 바이트를 세고 상한을 넘으면 빈 값을 돌려주는 위치 지정 읽기."""
+
+    def __init__(self, f, cap: int):
+        self.f = f
+        self.cap = cap
+        self.bytes_read = 0
+        f.seek(0, 2)
+        self.size = f.tell()
+
+    def read_at(self, off: int, n: int) -> bytes:
+        n = min(n, self.cap - self.bytes_read, max(0, self.size - off))
+        if n <= 0 or off < 0:
+            return b""
+        self.f.seek(off)
+        data = self.f.read(n)
+        self.bytes_read += len(data)
+        return data
+
+# ---- 이미지: EXIF ----
+
+def _jpeg_has_exif(r: _CappedReader) -> bool:
+    if r.read_at(0, 2) != b"\xff\xd8":
+        return False
+    pos = 2
+    while True:
+        hdr = r.read_at(pos, 4)
+        if len(hdr) < 4 or hdr[0] != 0xFF:
+            return False
+        marker = hdr[1]
+        if marker in (0xD9, 0xDA):  # EOI / SOS 이후는 영상 데이터
+            return False
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        seg_len = struct.unpack(">H", hdr[2:4])[0]
+        if marker == 0xE1:
+            body = r.read_at(pos + 4, 16)
+            if body[:6] == b"Exif\x00\x00" and len(body) >= 14:
+                tiff = body[6:]
+                bo = "<" if tiff[:2] == b"II" else ">"
+                ifd_off = struct.unpack(bo + "I", tiff[4:8])[0]
+                cnt = r.read_at(pos + 4 + 6 + ifd_off, 2)
+                return len(cnt) == 2 and struct.unpack(bo + "H", cnt)[0] > 0
+        pos += 2 + seg_len
+
+def _png_has_exif(r: _CappedReader) -> bool:
+    if r.read_at(0, 8) != b"\x89PNG\r\n\x1a\n":
+        return False
+    pos = 8
+    while True:
+        hdr = r.read_at(pos, 8)
+        if len(hdr) < 8:
+            return False
+        length, ctype = struct.unpack(">I4s", hdr)
+        if ctype == b"eXIf":
+            return length > 0
+        if ctype in (b"IDAT", b"IEND"):
+            return False
+        pos += 12 + length
+
+def _iter_boxes(r: _CappedReader, start: int, end: int):
+    """ISO BMFF(MP4/MOV/HEIC) 박스 헤더만 읽으며 (type, payload 시작, 박스 끝) 반환."""
+    pos = start
+    while pos + 8 <= end:
+        hdr = r.read_at(pos, 8)
+        if len(hdr) < 8:
+            return
+        size, btype = struct.unpack(">I4s", hdr)
+        head = 8
+        if size == 1:
+            ext = r.read_at(pos + 8, 8)
+            if len(ext) < 8:
+                return
+            size = struct.unpack(">Q", ext)[0]
+            head = 16
+        elif size == 0:
+            size = end - pos
+        if size < head:
+            return
+        yield btype, pos + head, min(pos + size, end)
+        pos += size
+
+def _find_box(r: _CappedReader, start: int, end: int, btype: bytes) -> Optional[Tuple[int, int]]:
+    for t, s, e in _iter_boxes(r, start, end):
+        if t == btype:
+            return s, e
+    return None
+
+def _heic_has_exif(r: _CappedReader) -> bool:
+    meta = _find_box(r, 0, r.size, b"meta")
+    if meta is None:
+        return False
+    s, e = meta
+    iinf = _find_box(r, s + 4, e, b"iinf")  # meta 는 FullBox(버전/플래그 4바이트)
+    if iinf is None:
+        return False
+    return b"Exif" in r.read_at(iinf[0], min(iinf[1] - iinf[0], 16 * 1024))
+
+# ---- PDF: 트레일러의 /Info 사전 ----
+
+_INFO_REF = re.compile(rb"/Info\s+(\d+)\s+(\d+)\s+R")
+_INFO_KEYS = re.compile(rb"/(Title|Producer|Creator)\s*(\((?:\\.|[^\\)])+\)|<[0-9A-Fa-f\s]+>|\d+\s+\d+\s+R)")
+PDF_TAIL_BYTES = 64 * 1024
+PDF_HEAD_BYTES = 64 * 1024
+PDF_MAX_SECTIONS = 16   # /Prev 사슬을 따라갈 최대 xref 구획 수
+
+def _pdf_int(d: bytes, key: bytes) -> Optional[int]:
+    m = re.search(rb"/%s\s+(\d+)\b(?!\s+\d+\s+R)" % key, d)  # 간접 참조(/Length 12 0 R)는 따라가지 않음
+    return int(m.group(1)) if m else None
+
+def _png_unpredict(data: bytes, cols: int) -> Optional[bytes]:
+    """PNG 예측자(/Predictor >= 10, 1바이트 단위) 복원. None/Sub/Up 만 지원(xref 스트림은 보통 Up)."""
+    out = bytearray()
+    prev = bytearray(cols)
+    for i in range(0, len(data) - cols, cols + 1):
+        ft, row = data[i], bytearray(data[i + 1:i + 1 + cols])
+        if ft == 1:
+            for j in range(1, cols):
+                row[j] = (row[j] + row[j - 1]) & 0xFF
+        elif ft == 2:
+            for j in range(cols):
+                row[j] = (row[j] + prev[j]) & 0xFF
+        elif ft != 0:
+            return None
+        out += row
+        prev = row
+    return bytes(out)
+
+def _pdf_stream(head: bytes, read_body) -> Optional[Tuple[bytes, bytes]]:
+    """head 가 스트림 객체로 시작하면 (사전, 풀어낸 내용). 무압축과 FlateDecode(+PNG 예측자)만 지원."""
+    m = re.match(rb"\s*\d+\s+\d+\s+obj\s*(<<.*?>>)\s*stream\r?\n", head, re.S)
+    if not m:
+        return None
+    d = m.group(1)
+    length = _pdf_int(d, b"Length")
+    if length is None:
+        return None
+    data = read_body(m.end(), length)
+    if len(data) < length:
+        return None
+    filt = re.search(rb"/Filter\s*(?:\[([^\]]*)\]|(/\w+))", d)
+    if filt:
+        if (filt.group(1) or filt.group(2)).split() != [b"/FlateDecode"]:
+            return None
         try:
-            mf = MutagenFile(str(path))
-            if mf and mf.tags: return ("media_by_tag", 0.8, "meta:id3/mp4")
-        except Exception:
-            pass
-    return (None, 0.0, "meta:none")
+            data = zlib.decompress(data)
+        except zlib.error:
+            return None
+        pred = _pdf_int(d, b"Predictor") or 1
+        if pred >= 10:
+            data = _png_unpredict(data, _pdf_int(d, b"Columns") or 1)
+        elif pred != 1:
+            return None
+    return (d, data) if data is not None else None
+
+def _xref_stream_entry(d: bytes, data: bytes, num: int) -> Optional[Tuple[int, int, int]]:
+    """xref 스트림에서 객체 num 의 (type, 필드2, 필드3). type 1=(오프셋, 세대), 2=(객체 스트림 번호, 순번)."""
+    w = re.search(rb"/W\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]", d)
+    if not w:
+        return None
+    w0, w1, w2 = (int(x) for x in w.groups())
+    rowlen = w0 + w1 + w2
+    idx = re.search(rb"/Index\s*\[([\d\s]*)\]", d)
+    ranges = [int(x) for x in idx.group(1).split()] if idx else [0, _pdf_int(d, b"Size") or 0]
+    pos = 0
+    for first, count in zip(ranges[0::2], ranges[1::2]):
+        if first <= num < first + count:
+            row = data[pos + rowlen * (num - first):pos + rowlen * (num - first + 1)]
+            if len(row) < rowlen:
+                return None
+            t = int.from_bytes(row[:w0], "big") if w0 else 1  # 폭 0 이면 기본값 type 1
+            return t, int.from_bytes(row[w0:w0 + w1], "big"), int.from_bytes(row[w0 + w1:], "big")
+        pos += rowlen * count
+    return None
+
+# (트레일러 사전, 객체 번호 → xref 항목 (type, 필드2, 필드3) 또는 None)
+XrefSection = Tuple[bytes, Callable[[int], Optional[Tuple[int, int, int]]]]
+
+def _pdf_section(at: Callable[[int, int], bytes], off: int) -> Optional[XrefSection]:
+    """off 위치의 xref 구획 하나(고전 테이블 + trailer, 또는 PDF 1.5+ xref 스트림)."""
+    head = at(off, 4 * 1024)
+    if not head.startswith(b"xref"):
+        xs = _pdf_stream(head, lambda s, n: at(off + s, n))
+        if xs is None:
+            return None
+        d, data = xs
+        return d, lambda num: _xref_stream_entry(d, data, num)
+    subs: List[Tuple[int, int, int]] = []  # (첫 번호, 개수, 첫 항목의 파일 오프셋) — 항목은 20바이트 고정
+    pos = off + 4
+    while True:
+        sub = re.match(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n?", at(pos, 64))
+        if not sub:
+            break
+        first, count = int(sub.group(1)), int(sub.group(2))
+        subs.append((first, count, pos + sub.end()))
+        pos += sub.end() + 20 * count
+    tr = at(pos, 4 * 1024)
+    m = re.match(rb"\s*trailer", tr)
+    if not m:
+        return None
+    d = tr[m.end():].split(b"startxref", 1)[0]
+
+    def lookup(num: int) -> Optional[Tuple[int, int, int]]:
+        for first, count, start in subs:
+            if first <= num < first + count:
+                ent = at(start + 20 * (num - first), 20)
+                if len(ent) < 18 or not ent[:10].isdigit():
+                    return None
+                return (1 if ent[17:18] == b"n" else 0), int(ent[:10]), int(ent[11:16])
+        return None
+    return d, lookup
+
+def _pdf_sections(at: Callable[[int, int], bytes], tail: bytes) -> List[XrefSection]:
+    """마지막 startxref 부터 /Prev 를 따라간 xref 구획들(최신 순). 선형화 PDF 는 첫 페이지 구획 → 본 구획 순."""
+    sx = tail.rfind(b"startxref")
+    nums = re.match(rb"startxref\s+(\d+)", tail[sx:]) if sx >= 0 else None
+    out: List[XrefSection] = []
+    off: Optional[int] = int(nums.group(1)) if nums else None
+    seen = set()
+    while off is not None and off not in seen and len(out) < PDF_MAX_SECTIONS:
+        seen.add(off)
+        sec = _pdf_section(at, off)
+        if sec is None:
+            break
+        out.append(sec)
+        off = _pdf_int(sec[0], b"Prev")
+    return out
+
+def _xref_lookup(sections: List[XrefSection], num: int) -> Optional[Tuple[int, int, int]]:
+    """최신 구획부터 찾아 처음 나온 항목(나중 구획의 갱신/삭제가 우선)."""
+    for _, lookup in sections:
+        ent = lookup(num)
+        if ent is not None:
+            return ent
+    return None
+
+def _pdf_object(at: Callable[[int, int], bytes], sections: List[XrefSection], num: int, pat) -> Optional[bytes]:
+    ent = _xref_lookup(sections, num)
+    if ent is None or ent[0] not in (1, 2):
+        return None
+    if ent[0] == 1:
+        m = pat.search(at(ent[1], 8 * 1024))
+        return m.group(1) if m else None
+    # 객체 스트림 안의 객체: 스트림 위치를 xref 에서 찾아 풀고, 머리말의 (번호, 상대 오프셋) 으로 자름
+    st = _xref_lookup(sections, ent[1])
+    if st is None or st[0] != 1:
+        return None
+    os_off = st[1]
+    objs = _pdf_stream(at(os_off, 4 * 1024), lambda s, n: at(os_off + s, n))
+    first = _pdf_int(objs[0], b"First") if objs else None
+    if first is None:
+        return None
+    hdr = [int(x) for x in objs[1][:first].split()]
+    offs = dict(zip(hdr[0::2], hdr[1::2]))
+    if num not in offs:
+        return None
+    nxt = min([o for o in hdr[1::2] if o > offs[num]], default=len(objs[1]) - first)
+    return objs[1][first + offs[num]:first + nxt]
+
+def _pdf_has_info(r: _CappedReader) -> bool:
+    if r.read_at(0, 5) != b"%PDF-":
+        return False
+    tail_off = max(0, r.size - PDF_TAIL_BYTES)
+    tail = r.read_at(tail_off, PDF_TAIL_BYTES)
+    head: Optional[bytes] = None
+
+    def at(off: int, n: int) -> bytes:
+        return tail[off - tail_off:off - tail_off + n] if off >= tail_off else r.read_at(off, n)
+
+    def read_head() -> bytes:
+        nonlocal head
+        if head is None:
+            head = r.read_at(0, PDF_HEAD_BYTES) if tail_off > 0 else b""
+        return head
+
+    # /Info 는 startxref 가 가리키는 트레일러부터 /Prev 를 따라가며 찾음(선형화 PDF 는 첫 페이지 트레일러에만 있음)
+    sections = _pdf_sections(at, tail)
+    ref = next((m.groups() for m in (_INFO_REF.search(d) for d, _ in sections) if m), None)
+    if ref is None:
+        # xref 를 따라가지 못하면(손상/미지원 형식) 트레일러 문자열을 끝부분, 다음 앞부분에서 직접 찾음
+        refs = _INFO_REF.findall(tail)  # 증분 업데이트가 있으면 마지막 트레일러가 유효
+        ref = refs[-1] if refs else next(iter(_INFO_REF.findall(read_head())), None)
+        if ref is None:
+            return False
+    num, gen = (int(x) for x in ref)
+    pat = re.compile(rb"(?<!\d)%d\s+%d\s+obj(.*?)endobj" % (num, gen), re.S)
+    m = pat.search(tail)
+    info = m.group(1) if m else _pdf_object(at, sections, num, pat)
+    if info is None:
+        m = pat.search(read_head())
+        info = m.group(1) if m else None
+    if not info:
+        return False
+    for _key, val in _INFO_KEYS.findall(info):
+        if val.startswith(b"<"):
+            if re.sub(rb"[\s<>]", b"", val) not in (b"", b"FEFF", b"feff"):
+                return True
+        else:
+            return True
+    return False
+
+# ---- 오디오/비디오: ID3 / FLAC / MP4 atom / Matroska ----
+
+def _id3_has_tags(r: _CappedReader) -> bool:
+    hdr = r.read_at(0, 10)
+    if hdr[:3] == b"ID3" and len(hdr) == 10:
+        size = (hdr[6] << 21) | (hdr[7] << 14) | (hdr[8] << 7) | hdr[9]
+        pos = 10
+        if hdr[5] & 0x40:  # 확장 헤더
+            ext = r.read_at(10, 4)
+            pos += struct.unpack(">I", ext)[0] if hdr[3] >= 4 and len(ext) == 4 else 0
+        frame_id = r.read_at(pos, 4) if size else b""
+        if len(frame_id) >= 3 and frame_id[:3].isalnum():
+            return True
+    return r.size >= 128 and r.read_at(r.size - 128, 3) == b"TAG"
+
+def _flac_has_tags(r: _CappedReader) -> bool:
+    if r.read_at(0, 4) != b"fLaC":
+        return _id3_has_tags(r)
+    pos = 4
+    while True:
+        hdr = r.read_at(pos, 4)
+        if len(hdr) < 4:
+            return False
+        last, btype = hdr[0] & 0x80, hdr[0] & 0x7F
+        length = int.from_bytes(hdr[1:4], "big")
+        if btype == 4:  # VORBIS_COMMENT
+            vlen = r.read_at(pos + 4, 4)
+            if len(vlen) < 4:
+                return False
+            cnt = r.read_at(pos + 8 + struct.unpack("<I", vlen)[0], 4)
+            return len(cnt) == 4 and struct.unpack("<I", cnt)[0] > 0
+        if last:
+            return False
+        pos += 4 + length
+
+def _mp4_has_tags(r: _CappedReader) -> bool:
+    moov = _find_box(r, 0, r.size, b"moov")
+    if moov is None:
+        return False
+    udta = _find_box(r, moov[0], moov[1], b"udta")
+    if udta is None:
+        return False
+    meta = _find_box(r, udta[0], udta[1], b"meta")
+    if meta is not None:
+        ilst = _find_box(r, meta[0] + 4, meta[1], b"ilst")
+        if ilst is not None and ilst[1] > ilst[0]:
+            return True
+    # QuickTime 식 ©xxx 사용자 데이터
+    return any(t[:1] == b"\xa9" for t, _, _ in _iter_boxes(r, udta[0], udta[1]))
+
+_MKV_TAGS_ID = b"\x12\x54\xc3\x67"
+
+def _mkv_has_tags(r: _CappedReader) -> bool:
+    if r.read_at(0, 4) != b"\x1a\x45\xdf\xa3":
+        return False
+    half = r.cap // 2
+    return _MKV_TAGS_ID in r.read_at(0, half) or _MKV_TAGS_ID in r.read_at(max(0, r.size - half), half)
+
+_IMAGE_PROBES = {".jpg": _jpeg_has_exif, ".jpeg": _jpeg_has_exif, ".png": _png_has_exif, ".heic": _heic_has_exif}
+_MEDIA_PROBES = {".mp3": _id3_has_tags, ".flac": _flac_has_tags, ".m4a": _mp4_has_tags,
+                 ".mp4": _mp4_has_tags, ".mov": _mp4_has_tags, ".mkv": _mkv_has_tags}
+
+def peek_with_stats(path: Path, max_bytes: int = MAX_PEEK_BYTES) -> Tuple[MetaResult, int]:
+    """cheap_meta_peek 결과와 실제로 읽은 바이트 수."""
+    ext = path.suffix.lower()
+    probe, result = None, (None, 0.0, "meta:none")
+    if ext in _IMAGE_PROBES:
+        probe, result = _IMAGE_PROBES[ext], ("photos_by_date", 0.8, "meta:exif")
+    elif ext == ".pdf":
+        probe, result = _pdf_has_info, ("receipts_pdf", 0.76, "meta:pdfinfo")
+    elif ext in _MEDIA_PROBES:
+        probe, result = _MEDIA_PROBES[ext], ("media_by_tag", 0.8, "meta:id3/mp4")
+    if probe is None:
+        return (None, 0.0, "meta:none"), 0
+    try:
+        with path.open("rb") as f:
+            r = _CappedReader(f, max_bytes)
+            try:
+                hit = probe(r)
+            except (struct.error, ValueError, IndexError):
+                hit = False
+            return (result if hit else (None, 0.0, "meta:none")), r.bytes_read
+    except OSError:
+        return (None, 0.0, "meta:none"), 0
+
+def cheap_meta_peek(path: Path) -> Tuple[Optional[str], float, str]:
+    return peek_with_stats(path)[0]
+
+# ---- 결과 캐시 (inode, size, mtime) ----
+
+def meta_cache_get(cache: HashCache, key: StatKey) -> Optional[MetaResult]:
+    raw = cache.get(key, META_CACHE_KIND)
+    if raw is None:
+        return None
+    lab, score, why = json.loads(raw)
+    return (lab, score, why)
+
+def meta_cache_put(cache: HashCache, key: StatKey, result: MetaResult) -> None:
+    cache.put(key, META_CACHE_KIND, json.dumps(list(result), ensure_ascii=False))
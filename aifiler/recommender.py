@@ -1,20 +1,26 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Iterable, Tuple, Optional, Dict, Any
-import re, collections
+from typing import Iterable, Iterator, Tuple, Optional, Dict, Any, List, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import os, re, collections, time
 from .scanner import FileEntry
-from .rules import Rule, render_dest
-from .meta import cheap_meta_peek
+from .rules import Rule, render_dest, date_tokens_batch
+from .meta import cheap_meta_peek, meta_cache_get, meta_cache_put
+from .hashcache import HashCache, stat_key
+
+_PHOTO_EXTS = frozenset({".jpg",".jpeg",".png",".heic"})
+_PHOTO_NAME_RE = re.compile(r"(img_|dsc_|screenshot|스크린샷)")
+_RECEIPT_NAME_RE = re.compile(r"(영수증|청구서|invoice|receipt)")
 
 def name_based_label(e: FileEntry) -> Tuple[Optional[str], float, str]:
     ext = e.path.suffix.lower()
     name = e.path.name.lower()
-    if ext in {".jpg",".jpeg",".png",".heic"}:
-        if re.search(r"(img_|dsc_|screenshot|스크린샷)", name):
+    if ext in _PHOTO_EXTS:
+        if _PHOTO_NAME_RE.search(name):
             return ("photos_by_date", 0.9, "name:photo")
         return ("photos_by_date", 0.7, "ext:photo")
     if ext == ".pdf":
-        if re.search(r"(영수증|청구서|invoice|receipt)", name):
+        if _RECEIPT_NAME_RE.search(name):
             return ("receipts_pdf", 0.9, "name:receipt")
         return (None, 0.4, "ext:pdf")
     return (None, 0.0, "none")
@@ -22,7 +28,7 @@ def name_based_label(e: FileEntry) -> Tuple[Optional[str], float, str]:
 def neighbor_majority(e: FileEntry, siblings: Iterable[FileEntry]) -> Tuple[Optional[str], float, str]:
     counter = collections.Counter()
     for s in siblings:
-        if s is e or s.is_dir: continue
+        if s == e or s.is_dir: continue
         lab, score, _ = name_based_label(s)
         if lab and score>=0.7: counter[lab]+=1
     if counter:
@@ -41,6 +47,170 @@ def recommend_rule_for_file(e: FileEntry, siblings: Iterable[FileEntry], use_met
             return {"rule": meta_label, "score": meta_score, "why": meta_why}
     return {"rule":"others_review","score":0.0,"why":"fallback"}
 
+Label = Tuple[Optional[str], float, str]
+
+def neighbor_majority_batch(files: Sequence[FileEntry], labels: Optional[Sequence[Label]] = None) -> List[Label]:
+    """
+    neighbor_majority 를 전체 파일에 대해 한 번에 계산(결과 동일).
+    부모 폴더별 라벨 히스토그램을 한 번 만들고, 각 파일은 자기 기여분만 빼서 다수 라벨을 구함
+    → 폴더 크기 n 에 대해 O(n²) 대신 O(n).
+    동률은 Counter.most_common 과 같이 형제 목록에서 먼저 등장한 라벨을 택함.
+    """
+    if labels is None:
+        labels = [name_based_label(e) for e in files]
+    groups: Dict[Path, List[int]] = {}
+    for i, e in enumerate(files):
+        if e.is_dir: continue
+        groups.setdefault(e.path.parent, []).append(i)
+
+    out: List[Label] = [(None, 0.0, "none")] * len(files)
+    for idxs in groups.values():
+        hist: Dict[str, List[int]] = {}  # 라벨 → [개수, 첫 등장 위치, 두 번째 등장 위치]
+        own: List[Optional[str]] = []
+        for pos, i in enumerate(idxs):
+            lab, score, _ = labels[i]
+            q = lab if (lab and score>=0.7) else None
+            own.append(q)
+            if q:
+                h = hist.get(q)
+                if h is None:
+                    hist[q] = [1, pos, -1]
+                else:
+                    if h[0] == 1: h[2] = pos
+                    h[0] += 1
+        if not hist: continue
+        for pos, i in enumerate(idxs):
+            best: Optional[Tuple[str, int, int]] = None
+            for lab, (cnt, first, second) in hist.items():
+                if own[pos] == lab:
+                    cnt -= 1
+                    if first == pos: first = second
+                if cnt <= 0: continue
+                if best is None or cnt > best[1] or (cnt == best[1] and first < best[2]):
+                    best = (lab, cnt, first)
+            if best:
+                out[i] = (best[0], 0.7 + min(0.2, best[1]/50), f"neighbor({best[1]})")
+    return out
+
+_FALLBACK = {"rule":"others_review","score":0.0,"why":"fallback"}
+
+def _cheap_recs(files: Sequence[FileEntry]) -> List[Optional[Dict[str, Any]]]:
+    """이름/이웃 단계만으로 결정되는 추천. 결정되지 않은 파일은 None(메타 단계 대상)."""
+    labels = [name_based_label(e) for e in files]
+    neighbors = neighbor_majority_batch(files, labels)
+    recs: List[Optional[Dict[str, Any]]] = []
+    for (lab, sc, why), (lab2, sc2, why2) in zip(labels, neighbors):
+        if sc>=0.8 and lab:
+            recs.append({"rule": lab, "score": sc, "why": why})
+        elif sc2>=0.7 and lab2:
+            recs.append({"rule": lab2, "score": sc2, "why": why2})
+        else:
+            recs.append(None)
+    return recs
+
+def _meta_rec(result: Tuple[Optional[str], float, str]) -> Dict[str, Any]:
+    meta_label, meta_score, meta_why = result
+    if meta_label and meta_score>=0.75:
+        return {"rule": meta_label, "score": meta_score, "why": meta_why}
+    return dict(_FALLBACK)
+
+def recommend_batch(entries: Iterable[FileEntry], use_meta=False, workers: int = 4, timeout: float = 5.0,
+                    executor: str = "thread", meta_mask: Optional[Sequence[bool]] = None,
+                    window: Optional[int] = None, meta_cache: Optional[HashCache] = None) -> Iterator[Tuple[FileEntry, Dict[str, Any]]]:
+    """
+    스트리밍 일괄 추천. 입력 순서대로 (entry, rec) 를 내보냄.
+    1) 이름/이웃 단계(저렴)를 전체에 먼저 적용
+    2) 남은 파일만 메타 확인을 풀(executor="thread"|"process", workers 개)로 보냄
+    - timeout: 파일별 메타 확인 제한 시간(워커에서 실행을 시작한 때부터). 넘기면 fallback 처리
+      (실행 중인 확인은 멈출 수 없으므로 끝날 때까지 그 워커에는 새 작업을 넣지 않음)
+    - window: 내보내기 전에 쌓아 두는 항목 수 상한(기본 workers*4) — 결과는 앞에서부터 차례로 흘려보냄
+    - meta_cache: 메타 결과 캐시((inode, size, mtime) 기준). 조회/기록은 호출 스레드에서만 수행
+    """
+    files = entries if isinstance(entries, Sequence) else list(entries)
+    cheap = _cheap_recs(files)
+    if not use_meta:
+        for i, e in enumerate(files):
+            yield e, cheap[i] if cheap[i] is not None else dict(_FALLBACK)
+        return
+
+    window = window or workers * 4
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    pool = pool_cls(max_workers=workers)
+    queue: collections.deque = collections.deque()    # [entry, rec | None, Future | None, deadline, 캐시 키]
+    waiting: collections.deque = collections.deque()  # 아직 제출하지 않은 메타 작업(queue 의 항목)
+    busy: set = set()  # 실행 중인 future. 시간 초과로 포기한 것도 끝날 때까지 워커를 차지하므로 포함
+
+    def fill() -> None:
+        """빈 워커 수만큼만 제출. 제출 즉시 실행되므로 제한 시간은 실행 시작부터 잼(대기/소비 시간 제외)."""
+        busy.difference_update([f for f in busy if f.done()])
+        while waiting and len(busy) < workers:
+            item = waiting.popleft()
+            item[2] = pool.submit(cheap_meta_peek, item[0].path)
+            item[3] = time.monotonic() + timeout
+            busy.add(item[2])
+
+    def ready(item) -> bool:
+        fut = item[2]
+        return item[1] is not None or (fut is not None and (fut.done() or time.monotonic() >= item[3]))
+
+    def settle(item) -> Dict[str, Any]:
+        while item[1] is None:
+            fill()
+            fut = item[2]
+            if fut is None:
+                # 워커가 모두 (포기한) 앞선 작업에 묶여 있음 → 하나가 끝날 때까지 기다림(아직 시간은 안 셈)
+                wait(busy, return_when=FIRST_COMPLETED)
+                continue
+            remaining = item[3] - time.monotonic()
+            if not fut.done() and remaining > 0:
+                wait(busy, timeout=remaining, return_when=FIRST_COMPLETED)
+                continue
+            if not fut.done():
+                fut.cancel()
+                item[1] = {"rule":"others_review","score":0.0,"why":"meta:timeout"}
+                continue
+            try:
+                result = fut.result()
+            except Exception:
+                item[1] = dict(_FALLBACK)
+                continue
+            if meta_cache is not None and item[4] is not None:
+                meta_cache_put(meta_cache, item[4], result)
+            item[1] = _meta_rec(result)
+        return item[1]
+
+    try:
+        for i, e in enumerate(files):
+            rec = cheap[i]
+            if rec is None and (meta_mask is None or meta_mask[i]):
+                key = cached = None
+                if meta_cache is not None:
+                    try:
+                        key = stat_key(e.path)
+                        cached = meta_cache_get(meta_cache, key)
+                    except OSError:
+                        key = None
+                if cached is not None:
+                    queue.append([e, _meta_rec(cached), None, 0.0, None])
+                else:
+                    item = [e, None, None, 0.0, key]
+                    queue.append(item)
+                    waiting.append(item)
+                    fill()
+            else:
+                queue.append([e, rec if rec is not None else dict(_FALLBACK), None, 0.0, None])
+            # 앞쪽이 끝났거나 쌓아 둔 항목이 window 에 닿으면 앞에서부터 내보냄
+            while queue and (len(queue) >= window or ready(queue[0])):
+                item = queue.popleft()
+                yield item[0], settle(item)
+        while queue:
+            item = queue.popleft()
+            yield item[0], settle(item)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if meta_cache is not None:
+            meta_cache.flush()
+
 def to_move_dest(rule_map: Dict[str, Rule], rec: Dict[str, Any], e: FileEntry, base_dest: Path) -> Path:
     rname = rec["rule"]
     if rname == "others_review":
@@ -49,3 +219,37 @@ def to_move_dest(rule_map: Dict[str, Rule], rec: Dict[str, Any], e: FileEntry, b
     if not rule:
         return base_dest / "Unsorted" / e.path.name
     return base_dest / render_dest(rule, e.path, e.mtime)
+
+def plan_destinations(files: Sequence[FileEntry], rule_names: Sequence[str], rule_map: Dict[str, Rule],
+                      base_dest: Path, as_str: bool = False) -> List[Any]:
+    """
+    to_move_dest 의 일괄 버전(결과 동일).
+    날짜 토큰은 한 번에 계산하고, 대상 폴더는 (규칙, 날짜) 조합마다 한 번만 렌더링한 뒤 파일명만 붙임.
+    as_str=True 면 Path 대신 문자열을 반환(항목별 Path 생성 비용 생략).
+    """
+    tokens = date_tokens_batch(e.mtime for e in files)
+    review = base_dest / "기타/검토필요"
+    unsorted = base_dest / "Unsorted"
+    dirs: Dict[Tuple[str, Tuple[str, str, str]], Path] = {}
+    prefixes: Dict[Path, str] = {}
+    out: List[Any] = []
+    for e, rname, tok in zip(files, rule_names, tokens):
+        if rname == "others_review":
+            d = review
+        else:
+            rule = rule_map.get(rname)
+            if not rule:
+                d = unsorted
+            else:
+                d = dirs.get((rname, tok))
+                if d is None:
+                    year, month, day = tok
+                    d = dirs[(rname, tok)] = base_dest / rule.dest.format(year=year, month=month, day=day)
+        if as_str:
+            prefix = prefixes.get(d)
+            if prefix is None:
+                prefix = prefixes[d] = os.path.join(str(d), "")
+            out.append(prefix + e.path.name)
+        else:
+            out.append(d / e.path.name)
+    return out
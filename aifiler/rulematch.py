@@ -0,0 +1,108 @@
+from __future__ import annotations
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import os
+from .rules import Rule
+
+class AhoCorasick:
+    """여러 부분문자열을 한 번의 순회로 찾는 오토마톤. 패턴 수와 무관하게 O(len(text) + 결과)."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        # patterns: (패턴, 값) — 같은 패턴에 여러 값이 붙을 수 있음
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        out: List[set] = [set()]
+        for pat, value in patterns:
+            if not pat:
+                continue
+            node = 0
+            for ch in pat:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    out.append(set())
+                node = nxt
+            out[node].add(value)
+        # BFS 로 실패 링크 계산, 출력은 실패 링크를 따라 합쳐 둠
+        q = deque(self.goto[0].values())
+        while q:
+            node = q.popleft()
+            for ch, nxt in self.goto[node].items():
+                q.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                out[nxt] |= out[self.fail[nxt]]
+        self.out: List[FrozenSet[int]] = [frozenset(o) for o in out]
+
+    def find(self, text: str) -> set:
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        found: set = set()
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+def _norm_ext(ext: str) -> str:
+    ext = ext.strip().lower()
+    return ext if ext.startswith(".") else "." + ext
+
+class CompiledRules:
+    """
+    rules.yaml 의 match 절(ext, name_like)을 일괄 평가용으로 컴파일.
+    - 규칙은 ext 조건(있으면)과 name_like 조건(있으면)을 모두 만족해야 매치(대소문자 무시)
+    - match 절이 비어 있는 규칙은 아무 파일에도 매치하지 않음(전체 이동 방지)
+    - ext 는 해시 조회, name_like 는 전 규칙 패턴을 하나의 Aho-Corasick 로 묶어 파일명당 1회 순회
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._exts: List[Optional[FrozenSet[str]]] = []
+        ext_only: Dict[str, List[int]] = {}
+        patterns: List[Tuple[str, int]] = []
+        for rid, r in enumerate(rules):
+            m = r.match or {}
+            exts = frozenset(_norm_ext(x) for x in (m.get("ext") or []))
+            names = [str(x).casefold() for x in (m.get("name_like") or []) if str(x)]
+            self._exts.append(exts or None)
+            if names:
+                patterns.extend((n, rid) for n in names)
+            elif exts:
+                for x in exts:
+                    ext_only.setdefault(x, []).append(rid)
+        self._ext_only: Dict[str, Tuple[int, ...]] = {k: tuple(v) for k, v in ext_only.items()}
+        self._ac = AhoCorasick(patterns) if patterns else None
+
+    def match(self, name: str) -> Tuple[int, ...]:
+        """파일명 하나에 매치되는 규칙 id(rules 인덱스) 목록, 규칙 순서대로."""
+        ext = os.path.splitext(name)[1].lower()
+        hits: List[int] = list(self._ext_only.get(ext, ()))
+        if self._ac is not None:
+            exts = self._exts
+            for rid in self._ac.find(name.casefold()):
+                allowed = exts[rid]
+                if allowed is None or ext in allowed:
+                    hits.append(rid)
+        if len(hits) > 1:
+            hits.sort()
+        return tuple(hits)
+
+    def match_batch(self, names: Iterable[str]) -> List[Tuple[int, ...]]:
+        """파일명 묶음을 한 번에 평가. 입력 순서대로 규칙 id 튜플 반환."""
+        match = self.match
+        return [match(n) for n in names]
+
+    def rule_names(self, ids: Tuple[int, ...]) -> List[str]:
+        return [self.rules[i].name for i in ids]
+
+def compile_rules(rules: List[Rule]) -> CompiledRules:
+    return CompiledRules(rules)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import yaml, datetime
 
 @dataclass
@@ -28,6 +28,27 @@ def date_tokens(ts: float) -> dict[str,str]:
     dt = datetime.datetime.fromtimestamp(ts)
     return {"year": f"{dt.year:04d}", "month": f"{dt.month:02d}", "day": f"{dt.day:02d}"}
 
+# 모든 시간대 오프셋/서머타임 전환은 15분 단위이므로 같은 15분 구간의 시각은 지역 날짜가 같음
+DATE_BUCKET_SECONDS = 900
+
+DateKey = Tuple[str, str, str]  # (year, month, day)
+
+def date_tokens_batch(mtimes: Iterable[float]) -> List[DateKey]:
+    """
+    mtime 목록의 (year, month, day) 를 한 번에 계산.
+    15분 구간 단위로 datetime 변환을 메모이즈하므로 실제 변환 횟수는 서로 다른 구간 수만큼만.
+    """
+    memo: Dict[int, DateKey] = {}
+    out: List[DateKey] = []
+    for ts in mtimes:
+        b = int(ts // DATE_BUCKET_SECONDS)
+        key = memo.get(b)
+        if key is None:
+            dt = datetime.datetime.fromtimestamp(b * DATE_BUCKET_SECONDS)
+            key = memo[b] = (f"{dt.year:04d}", f"{dt.month:02d}", f"{dt.day:02d}")
+        out.append(key)
+    return out
+
 def render_dest(rule: Rule, src: Path, mtime: float, extra: Optional[Dict[str, Any]]=None) -> Path:
     tokens = date_tokens(mtime)
     if extra: tokens.update(extra)
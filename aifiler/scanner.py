@@ -1,7 +1,11 @@
 from __future__ import annotations
 from pathlib import Path
 from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterator, Optional
 import os
+from .blacklist import BlacklistTrie, compile_blacklist
 
 @dataclass(frozen=True)
 class FileEntry:
@@ -12,23 +16,28 @@ class FileEntry:
 
 def iter_tree(root: Path, exclude_roots: set[Path], exclude_dirnames: set[str], max_depth: int = 12):
     root = root.resolve()
-    if any(str(root).startswith(str(b.resolve())) for b in exclude_roots):
+    # 블랙리스트는 트라이로 컴파일해 모든 디렉터리 단계에서 하위 트리를 가지치기
+    trie = compile_blacklist(exclude_roots, exclude_dirnames)
+    blocked, node = trie.locate(root)
+    if blocked:
         return
-    stack = [(root, 0)]
+    stack = [(root, 0, node)]
     while stack:
-        cur, depth = stack.pop()
+        cur, depth, node = stack.pop()
         try:
             with os.scandir(cur) as it:
                 for de in it:
                     try:
+                        is_dir = de.is_dir(follow_symlinks=False)
+                        blocked, child = trie.step(node, de.name, is_dir)
+                        if blocked:
+                            continue
                         p = Path(de.path)
-                        if de.is_dir(follow_symlinks=False):
-                            if p.name in exclude_dirnames:
-                                continue
+                        if is_dir:
                             mtime = de.stat(follow_symlinks=False).st_mtime
                             yield FileEntry(p, True, 0, mtime)
                             if depth < max_depth:
-                                stack.append((p, depth+1))
+                                stack.append((p, depth+1, child))
                         else:
                             st = de.stat(follow_symlinks=False)
                             yield FileEntry(p, False, st.st_size, st.st_mtime)
@@ -36,3 +45,92 @@ def iter_tree(root: Path, exclude_roots: set[Path], exclude_dirnames: set[str],
                         continue
         except (NotADirectoryError, PermissionError, FileNotFoundError):
             continue
+
+_Node = Optional[Dict[str, Any]]
+
+def _scan_dir(cur: Path, depth: int, node: _Node, trie: BlacklistTrie, max_depth: int) -> tuple[list[FileEntry], list[tuple[Path, int, _Node]]]:
+    """디렉터리 1개를 읽어 (항목 목록, 내려갈 하위 디렉터리 목록) 반환. 워커 스레드에서 실행."""
+    entries: list[FileEntry] = []
+    subdirs: list[tuple[Path, int, _Node]] = []
+    try:
+        with os.scandir(cur) as it:
+            for de in it:
+                try:
+                    is_dir = de.is_dir(follow_symlinks=False)
+                    blocked, child = trie.step(node, de.name, is_dir)
+                    if blocked:
+                        continue
+                    p = Path(de.path)
+                    if is_dir:
+                        mtime = de.stat(follow_symlinks=False).st_mtime
+                        entries.append(FileEntry(p, True, 0, mtime))
+                        if depth < max_depth:
+                            subdirs.append((p, depth+1, child))
+                    else:
+                        st = de.stat(follow_symlinks=False)
+                        entries.append(FileEntry(p, False, st.st_size, st.st_mtime))
+                except (PermissionError, FileNotFoundError):
+                    continue
+    except (NotADirectoryError, PermissionError, FileNotFoundError):
+        pass
+    return entries, subdirs
+
+def iter_tree_parallel(root: Path, exclude_roots: set[Path], exclude_dirnames: set[str], max_depth: int = 12,
+                       workers: int = 8, max_pending: int = 64, ordered: bool = False) -> Iterator[FileEntry]:
+    """
+    iter_tree 의 병렬 버전. 디렉터리 단위 scandir+stat 을 스레드 풀로 분산.
+    - max_pending: 동시에 진행 중인 디렉터리 목록 작업 수 상한(메모리/큐 제한)
+    - ordered=True: iter_tree 와 완전히 같은 순서로 반환(스택 상단을 미리 읽어두는 방식)
+    - ordered=False: 먼저 끝난 디렉터리부터 반환(최대 처리량)
+    """
+    root = root.resolve()
+    trie = compile_blacklist(exclude_roots, exclude_dirnames)
+    blocked, node = trie.locate(root)
+    if blocked:
+        return
+    ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aifiler-scan")
+    try:
+        if ordered:
+            yield from _walk_ordered(ex, root, node, trie, max_depth, max_pending)
+        else:
+            yield from _walk_unordered(ex, root, node, trie, max_depth, max_pending)
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+def _walk_unordered(ex: ThreadPoolExecutor, root: Path, node: _Node, trie: BlacklistTrie, max_depth: int, max_pending: int):
+    pending: deque[tuple[Path, int, _Node]] = deque([(root, 0, node)])
+    inflight: set[Future] = set()
+    while pending or inflight:
+        while pending and len(inflight) < max_pending:
+            cur, depth, node = pending.pop()  # LIFO → 깊이 우선으로 대기열 크기 억제
+            inflight.add(ex.submit(_scan_dir, cur, depth, node, trie, max_depth))
+        done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+        for fut in done:
+            entries, subdirs = fut.result()
+            pending.extend(subdirs)
+            yield from entries
+
+def _walk_ordered(ex: ThreadPoolExecutor, root: Path, node: _Node, trie: BlacklistTrie, max_depth: int, max_pending: int):
+    stack: list[tuple[Path, int, _Node]] = [(root, 0, node)]
+    futures: dict[Path, Future] = {}
+
+    def prefetch() -> None:
+        # 곧 pop 될 스택 상단부터 미리 제출
+        i = len(stack) - 1
+        looked = 0
+        while i >= 0 and len(futures) < max_pending and looked < max_pending * 2:
+            cur, depth, node = stack[i]
+            if cur not in futures:
+                futures[cur] = ex.submit(_scan_dir, cur, depth, node, trie, max_depth)
+            i -= 1
+            looked += 1
+
+    while stack:
+        cur, depth, node = stack.pop()
+        fut = futures.pop(cur, None)
+        if fut is None:
+            fut = ex.submit(_scan_dir, cur, depth, node, trie, max_depth)
+        prefetch()
+        entries, subdirs = fut.result()
+        yield from entries
+        stack.extend(subdirs)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse, datetime, json, math, os, random, shutil, time
+
+# 파일명 패턴(이름 규칙/이웃 다수결이 실제로 갈리도록 사진·영수증·일반 문서를 섞음)
+PATTERNS: Dict[str, str] = {
+    "img": "IMG_{n:04d}.jpg",
+    "dsc": "DSC_{n:05d}.JPG",
+    "screenshot": "Screenshot_{date}_{n}.png",
+    "photo": "photo_{n}.jpeg",          # 확장자만 사진(점수 0.7)
+    "receipt": "영수증_{date}_{n}.pdf",
+    "invoice": "invoice-{n}.pdf",
+    "pdf": "document_{n}.pdf",
+    "doc": "report_{n}.docx",
+    "text": "notes_{n}.txt",
+    "misc": "file_{n}.bin",
+}
+DEFAULT_WEIGHTS: Dict[str, float] = {"img": 3, "dsc": 2, "screenshot": 1, "photo": 1, "receipt": 1, "invoice": 0.5,
+                                     "pdf": 1, "doc": 1, "text": 1, "misc": 1}
+HEADER_BYTES = 32            # 파일마다 다른 앞부분(나머지는 희소 영역) → 샘플 해시가 파일마다 달라짐
+DUP_POOL = 10_000            # 중복 원본 후보로 기억해 둘 최근 파일 수
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+
+@dataclass
+class SynthSpec:
+    """
+    합성 트리 설정. 같은 설정(seed 포함)이면 항상 같은 트리(경로/크기/내용/mtime)를 만듦.
+    - 폴더: 깊이 depth, 폴더당 하위 폴더 fanout 개의 완전 트리. 파일은 모든 폴더에 고르게 나눔
+    - 크기: 로그정규(중앙값 size_median, sigma=size_sigma, 최대 size_max). sigma=0 이면 고정 크기
+    - 이름: patterns 가중치로 고르되, 폴더마다 주 패턴을 정해 cluster 비율만큼 그 패턴을 씀
+    - 중복: dup_ratio 비율의 파일은 앞서 만든 파일과 같은 크기/내용(다른 폴더일 수 있음)
+    """
+    files: int = 10_000
+    depth: int = 3
+    fanout: int = 8
+    size_median: int = 16 * 1024
+    size_sigma: float = 1.0
+    size_max: int = 16 * 1024 * 1024
+    dup_ratio: float = 0.05
+    patterns: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_WEIGHTS))
+    cluster: float = 0.8
+    mtime_days: int = 365 * 3
+    seed: int = 0
+
+@dataclass
+class SynthStats:
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+
+def _dir_paths(root: Path, depth: int, fanout: int) -> List[Path]:
+    """root 포함, 너비 우선 순서의 폴더 목록."""
+    out = [root]
+    level = [root]
+    for d in range(depth):
+        level = [p / f"d{d}_{i:03d}" for p in level for i in range(fanout)]
+        out.extend(level)
+    return out
+
+def _size(rng: random.Random, spec: SynthSpec) -> int:
+    if spec.size_sigma <= 0:
+        return spec.size_median
+    return min(spec.size_max, int(rng.lognormvariate(math.log(max(1, spec.size_median)), spec.size_sigma)))
+
+def _write(path: Path, header: bytes, size: int, mtime: float) -> None:
+    with open(path, "wb") as f:
+        f.write(header[:size])
+        if size > len(header):
+            f.truncate(size)  # 희소 파일: 디스크를 거의 쓰지 않고 크기만 맞춤
+    os.utime(path, (mtime, mtime))
+
+def spec_path(root: Path) -> Path:
+    """생성에 쓴 설정 기록(트리 밖에 두어 스캔 결과에 섞이지 않도록)."""
+    return root.parent / f"{root.name}.synth.json"
+
+def generate(root: Path, spec: SynthSpec) -> SynthStats:
+    t0 = time.perf_counter()
+    rng = random.Random(spec.seed)
+    stats = SynthStats()
+    dirs = _dir_paths(root, spec.depth, spec.fanout)
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+    stats.dirs = len(dirs)
+    names, weights = zip(*[(k, w) for k, w in spec.patterns.items() if w > 0 and k in PATTERNS])
+    pool: List[Tuple[bytes, int]] = []   # 중복 원본 후보 (header, size)
+    per_dir, extra = divmod(spec.files, len(dirs))
+    n = 0
+    for di, d in enumerate(dirs):
+        main = rng.choices(names, weights)[0]
+        for _ in range(per_dir + (1 if di < extra else 0)):
+            pat = main if rng.random() < spec.cluster else rng.choices(names, weights)[0]
+            mtime = EPOCH + rng.random() * spec.mtime_days * 86400
+            date = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc).strftime("%Y%m%d")
+            name = PATTERNS[pat].format(n=n, date=date)
+            if pool and rng.random() < spec.dup_ratio:
+                header, size = pool[rng.randrange(len(pool))]
+                stats.duplicates += 1
+            else:
+                header, size = rng.randbytes(HEADER_BYTES), _size(rng, spec)
+                if len(pool) < DUP_POOL:
+                    pool.append((header, size))
+                else:
+                    pool[rng.randrange(DUP_POOL)] = (header, size)
+            _write(d / name, header, size, mtime)
+            stats.files += 1
+            stats.bytes += size
+            n += 1
+    stats.seconds = time.perf_counter() - t0
+    spec_path(root).write_text(json.dumps({"spec": asdict(spec), "stats": asdict(stats)}, ensure_ascii=False),
+                               encoding="utf-8")
+    return stats
+
+def ensure_tree(root: Path, spec: SynthSpec) -> Optional[SynthStats]:
+    """root 에 같은 설정으로 만든 트리가 이미 있으면 재사용(None 반환), 아니면 지우고 새로 생성."""
+    marker = spec_path(root)
+    if root.exists() and marker.exists():
+        try:
+            if json.loads(marker.read_text(encoding="utf-8")).get("spec") == asdict(spec):
+                return None
+        except ValueError:
+            pass
+    if root.exists():
+        shutil.rmtree(root)
+    return generate(root, spec)
+
+def _weights(items: List[str]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for it in items:
+        name, _, w = it.partition("=")
+        if name not in PATTERNS:
+            raise SystemExit(f"알 수 없는 패턴: {name} (가능: {', '.join(PATTERNS)})")
+        out[name] = float(w or 1)
+    return out
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m aifiler.synth", description="벤치마크용 합성 파일 트리 생성")
+    ap.add_argument("root", type=Path)
+    ap.add_argument("--files", type=int, default=SynthSpec.files)
+    ap.add_argument("--depth", type=int, default=SynthSpec.depth)
+    ap.add_argument("--fanout", type=int, default=SynthSpec.fanout)
+    ap.add_argument("--size-median", type=int, default=SynthSpec.size_median)
+    ap.add_argument("--size-sigma", type=float, default=SynthSpec.size_sigma)
+    ap.add_argument("--size-max", type=int, default=SynthSpec.size_max)
+    ap.add_argument("--dup-ratio", type=float, default=SynthSpec.dup_ratio)
+    ap.add_argument("--pattern", action="append", default=[], metavar="NAME=WEIGHT",
+                    help=f"파일명 패턴 가중치(여러 번). 가능: {', '.join(PATTERNS)}")
+    ap.add_argument("--cluster", type=float, default=SynthSpec.cluster)
+    ap.add_argument("--seed", type=int, default=SynthSpec.seed)
+    args = ap.parse_args(argv)
+    spec = SynthSpec(files=args.files, depth=args.depth, fanout=args.fanout, size_median=args.size_median,
+                     size_sigma=args.size_sigma, size_max=args.size_max, dup_ratio=args.dup_ratio,
+                     patterns=_weights(args.pattern) if args.pattern else dict(DEFAULT_WEIGHTS),
+                     cluster=args.cluster, seed=args.seed)
+    stats = ensure_tree(args.root, spec)
+    print(json.dumps(asdict(stats) if stats else {"reused": True}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,173 @@
 from __future__ import annotations
-from collections import defaultdict
-from typing import Any
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import heapq, os
 from .scanner import FileEntry
+from .entrytable import EntryTable
 
-def build_tree(entries: list[FileEntry]) -> dict[str, Any]:
-    root: dict[str, Any] = {"files": [], "dirs": defaultdict(lambda: {"files": [], "dirs": defaultdict(dict)})}
-    for e in entries:
-        parts = e.path.parts
-        node = root
-        for part in parts[:-1]:
-            node = node["dirs"][part]
-        if e.is_dir:
-            node["dirs"][e.path.name]
+@dataclass(frozen=True)
+class DirStat:
+    id: int
+    path: str
+    files: int        # 하위 전체(누적) 파일 수
+    bytes: int        # 하위 전체(누적) 바이트
+    newest: float     # 하위 전체에서 가장 최근 mtime (파일이 없으면 0)
+    own_files: int    # 이 폴더 바로 아래 파일 수
+
+class DirIndex:
+    """
+    폴더 단위 평면 인덱스. 항목을 한 번 훑으며 만들고 파일별 dict 는 만들지 않음.
+    - 폴더 경로는 id 로 intern, parent 배열(-1 = 최상위)로 트리를 표현(부모 id < 자식 id)
+    - 폴더별 직속 파일 수/바이트 + 누적(하위 전체) 파일 수/바이트/최신 mtime
+    - 자식 목록은 처음 펼칠 때 한 번에 CSR 로 만들어 두고 이후 재사용
+    """
+
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.parent = array("i")
+        self.own_files = array("Q")
+        self.own_bytes = array("Q")
+        self.files = array("Q")
+        self.bytes = array("Q")
+        self.newest = array("d")
+        self._child_off: Optional[array] = None
+        self._child_ids: Optional[array] = None
+
+    # ---- 구축 ----
+
+    def _intern(self, d: str) -> int:
+        did = self._ids.get(d)
+        if did is not None:
+            return did
+        # 아직 없는 조상부터 차례로 등록(부모가 항상 먼저 id 를 받음)
+        chain = [d]
+        while True:
+            up = os.path.dirname(chain[-1])
+            if up == chain[-1] or up in self._ids:
+                break
+            chain.append(up)
+        for p in reversed(chain):
+            up = os.path.dirname(p)
+            pid = -1 if up == p else self._ids[up]
+            did = len(self.paths)
+            self.paths.append(p)
+            self._ids[p] = did
+            self.parent.append(pid)
+            for col in (self.own_files, self.own_bytes, self.files, self.bytes):
+                col.append(0)
+            self.newest.append(0.0)
+        return did
+
+    def _add_file(self, did: int, size: int, mtime: float) -> None:
+        self.own_files[did] += 1
+        self.own_bytes[did] += size
+        if mtime > self.newest[did]:
+            self.newest[did] = mtime
+
+    def _finish(self) -> "DirIndex":
+        """직속 값을 부모 쪽으로 누적. 자식 id 가 부모보다 크므로 역순 한 번이면 됨."""
+        self.files = array("Q", self.own_files)
+        self.bytes = array("Q", self.own_bytes)
+        parent, files, nbytes, newest = self.parent, self.files, self.bytes, self.newest
+        for did in range(len(parent) - 1, -1, -1):
+            pid = parent[did]
+            if pid >= 0:
+                files[pid] += files[did]
+                nbytes[pid] += nbytes[did]
+                if newest[did] > newest[pid]:
+                    newest[pid] = newest[did]
+        self._child_off = self._child_ids = None
+        return self
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[FileEntry]) -> "DirIndex":
+        if isinstance(entries, EntryTable):
+            return cls.from_table(entries)
+        idx = cls()
+        for e in entries:
+            p = os.fspath(e.path)
+            if e.is_dir:
+                idx._intern(p)
+            else:
+                idx._add_file(idx._intern(os.path.dirname(p)), e.size, e.mtime)
+        return idx._finish()
+
+    @classmethod
+    def from_table(cls, table: EntryTable) -> "DirIndex":
+        """EntryTable 의 부모 폴더 id 를 그대로 이용(행마다 경로 문자열을 만들지 않음)."""
+        idx = cls()
+        dir_map: Dict[int, int] = {}
+        parent, is_dir, size, mtime = table.parent, table.is_dir, table.size, table.mtime
+        for i in range(len(table)):
+            if is_dir[i]:
+                idx._intern(os.fspath(table.path(i)))
+                continue
+            tdid = parent[i]
+            did = dir_map.get(tdid)
+            if did is None:
+                did = dir_map[tdid] = idx._intern(table.parent_str(i))
+            idx._add_file(did, size[i], mtime[i])
+        return idx._finish()
+
+    # ---- 조회 ----
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def find(self, path: os.PathLike | str) -> Optional[int]:
+        return self._ids.get(os.fspath(path))
+
+    def stat(self, did: int) -> DirStat:
+        return DirStat(did, self.paths[did], self.files[did], self.bytes[did], self.newest[did], self.own_files[did])
+
+    def roots(self) -> List[int]:
+        return [d for d in range(len(self.parent)) if self.parent[d] < 0]
+
+    def _build_children(self) -> Tuple[array, array]:
+        if self._child_off is None:
+            n = len(self.parent)
+            counts = array("I", bytes(4 * (n + 1)))
+            for pid in self.parent:
+                if pid >= 0:
+                    counts[pid + 1] += 1
+            for i in range(n):
+                counts[i + 1] += counts[i]
+            fill = array("I", counts)
+            ids = array("I", bytes(4 * counts[n]))
+            for did, pid in enumerate(self.parent):
+                if pid >= 0:
+                    ids[fill[pid]] = did
+                    fill[pid] += 1
+            self._child_off, self._child_ids = counts, ids
+        return self._child_off, self._child_ids
+
+    def children(self, did: int, sort: str = "bytes", limit: Optional[int] = None) -> List[DirStat]:
+        """직속 하위 폴더. sort: "bytes"(큰 순) | "files"(많은 순) | "name" """
+        off, ids = self._build_children()
+        kids = ids[off[did]:off[did + 1]]
+        if sort == "name":
+            order = sorted(kids, key=lambda c: self.paths[c])
         else:
-            node["files"].append({"name": e.path.name, "size": e.size, "mtime": e.mtime, "path": str(e.path)})
-    return root
+            col = self.bytes if sort == "bytes" else self.files
+            order = sorted(kids, key=lambda c: col[c], reverse=True)
+        return [self.stat(c) for c in order[:limit]]
+
+    def descendants(self, did: int) -> List[int]:
+        off, ids = self._build_children()
+        out, stack = [], [did]
+        while stack:
+            cur = stack.pop()
+            out.append(cur)
+            stack.extend(ids[off[cur]:off[cur + 1]])
+        return out
+
+    def top_k(self, k: int = 10, under: Optional[int] = None) -> List[DirStat]:
+        """누적 바이트가 가장 큰 하위 트리 k 개. under 를 주면 그 아래에서만(under 자신 제외)."""
+        cands = range(len(self.paths)) if under is None else self.descendants(under)[1:]
+        return [self.stat(d) for d in heapq.nlargest(k, cands, key=self.bytes.__getitem__)]
+
+def build_tree(entries: Iterable[FileEntry]) -> DirIndex:
+    """폴더 인덱스(DirIndex)를 만듦. 이전의 중첩 dict 대신 폴더별 누적 통계를 제공."""
+    return DirIndex.from_entries(entries)
@@ -1,67 +1,204 @@
 from __future__ import annotations
 from pathlib import Path
-import json, shutil, os
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import datetime, shutil, os, threading, time
+from typing import List, Dict, Any, Optional, Tuple
+from .undostore import UndoStore
 
 def read_undo_log(undo_log: Path) -> List[Dict[str, Any]]:
-    """배치 단위 레코드를 최신순으로 반환."""
+    """배치 단위 레코드를 최신순으로 반환. (목록 화면은 UndoStore.list_batches 로 페이지 단위 조회)"""
     if not undo_log.exists():
         return []
-    lines = [ln for ln in undo_log.read_text(encoding="utf-8").splitlines() if ln.strip()]
-    recs = [json.loads(x) for x in lines]
-    # 오래된 → 최신순으로 저장되어 있으니 최신순으로 뒤집자
-    return list(reversed(recs))
-
-def _safe_rmdir(path: Path) -> None:
-    """비어있으면 제거. 상위도 비어있게 되면 상위도 정리(너무 위로 올라가지 않도록 제어)."""
-    try:
-        if path.exists() and path.is_dir():
-            # 비어있을 때만 삭제
-            if not any(path.iterdir()):
-                path.rmdir()
-                # 상위 한 단계만 추가로 시도(중첩 생성을 깔끔히)
-                parent = path.parent
-                if parent.exists() and parent.is_dir() and not any(parent.iterdir()):
-                    parent.rmdir()
-    except Exception:
-        pass
+    with UndoStore(undo_log) as store:
+        return list(store.iter_records())
+
+Move = Tuple[Path, Path]  # (원래 위치 src, 이동된 위치 dst)
+
+@dataclass
+class RollbackReport:
+    batch_id: str
+    restored: int = 0
+    renamed: int = 0                # 같은 장치: os.rename 빠른 경로
+    copied: int = 0                 # 다른 장치: shutil.move
+    removed_dirs: int = 0
+    seconds: float = 0.0
+    conflicts: List[Dict[str, str]] = field(default_factory=list)  # {"src", "dst", "reason"}
+
+    @property
+    def files_per_s(self) -> float:
+        return self.restored / self.seconds if self.seconds else 0.0
+
+def _restore_groups(moves: List[Move]) -> Tuple[List[List[int]], List[int]]:
+    """
+    되돌리기 실행 계획. 같은 경로(src 또는 dst)를 건드리는 move 들은 한 묶음으로 모아 배치의 역순으로 실행하고,
+    경로를 공유하지 않는 묶음끼리만 동시에 실행.
+    (역순이면 앞선 move 가 자리를 덮어썼든 비워 줬든 배치 당시 상태를 그대로 거꾸로 밟으므로 임시 이름이 필요 없음)
+    반환: (묶음들[실행 순서], 덮어써진 move 번호들 — 나중 move 가 같은 dst 를 덮어써 복원할 내용이 없는 것)
+    """
+    parent = list(range(len(moves)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[Path, int] = {}       # 경로 → 그 경로를 처음 건드린 move
+    holder: Dict[Path, int] = {}      # 경로 → 지금 그 자리에 내용을 둔 move
+    overwritten: List[int] = []
+    for i, (src, dst) in enumerate(moves):
+        for p in (src, dst):
+            j = owner.setdefault(p, i)
+            if j != i:
+                parent[find(i)] = find(j)
+        holder.pop(src, None)
+        prev = holder.get(dst)
+        if prev is not None:
+            overwritten.append(prev)
+        holder[dst] = i
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(moves) - 1, -1, -1):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values()), overwritten
+
+class _Restorer:
+    def __init__(self, report: RollbackReport):
+        self.report = report
+        self.lock = threading.Lock()
+        self._dir_dev: Dict[Path, int] = {}
+
+    def conflict(self, src: Path, dst: Path, reason: str) -> None:
+        with self.lock:
+            self.report.conflicts.append({"src": str(src), "dst": str(dst), "reason": reason})
+
+    def _parent_dev(self, d: Path) -> int:
+        dev = self._dir_dev.get(d)
+        if dev is None:
+            d.mkdir(parents=True, exist_ok=True)
+            dev = self._dir_dev[d] = os.stat(d).st_dev
+        return dev
+
+    def move(self, cur: Path, src: Path, dst: Path) -> bool:
+        """cur(현재 위치) → src 복원. dst 는 보고용 원래 이동 위치."""
+        if not os.path.lexists(cur):
+            self.conflict(src, dst, "missing")        # 이동된 파일이 사라짐
+            return False
+        if os.path.lexists(src):
+            self.conflict(src, dst, "occupied")       # 원래 자리를 다른 파일이 차지함
+            return False
+        try:
+            fast = os.lstat(cur).st_dev == self._parent_dev(src.parent)
+            if fast:
+                os.rename(cur, src)
+            else:
+                shutil.move(str(cur), str(src))
+        except OSError as ex:
+            self.conflict(src, dst, f"error: {ex}")
+            return False
+        with self.lock:
+            self.report.restored += 1
+            if fast:
+                self.report.renamed += 1
+            else:
+                self.report.copied += 1
+        return True
+
+    def run_group(self, moves: List[Move], group: List[int], skip: frozenset) -> None:
+        for i in group:
+            if i not in skip:
+                src, dst = moves[i]
+                self.move(dst, src, dst)
+
+def _remove_created_dirs(dirs: List[str]) -> int:
+    """생성했던 폴더를 깊은 것부터 한 번씩 rmdir(비어 있을 때만 성공). 제거한 폴더의 바깥 상위도 한 번 시도."""
+    removed = 0
+    created = {Path(d) for d in dirs}
+    parents = set()
+    for d in sorted(created, key=lambda p: len(p.parts), reverse=True):
+        try:
+            os.rmdir(d)
+        except OSError:
+            continue
+        removed += 1
+        if d.parent not in created:
+            parents.add(d.parent)
+    for p in sorted(parents, key=lambda p: len(p.parts), reverse=True):
+        try:
+            os.rmdir(p)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def rollback_moves(moves: List[Move], created_dirs: List[str], batch_id: str = "", workers: int = 4) -> RollbackReport:
+    """
+    이동 목록을 되돌림.
+    - 경로가 얽힌 move 들(사슬/순환/덮어쓰기)은 한 묶음으로 배치의 역순으로 처리
+    - 서로 독립인 묶음은 workers 개 스레드로 동시에 실행(대기 작업은 workers*2 로 제한)
+    - 원래 자리가 배치 이후 다른 파일로 채워졌거나 이동된 파일이 없으면 건너뛰고 conflicts 에 기록
+    """
+    t0 = time.perf_counter()
+    report = RollbackReport(batch_id)
+    r = _Restorer(report)
+    groups, overwritten = _restore_groups(moves)
+    for i in overwritten:
+        r.conflict(moves[i][0], moves[i][1], "overwritten")
+    skip = frozenset(overwritten)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aifiler-undo") as pool:
+        inflight = set()
+        for g in groups:
+            inflight.add(pool.submit(r.run_group, moves, g, skip))
+            if len(inflight) >= workers * 2:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+        for f in inflight:
+            f.result()
+    report.removed_dirs = _remove_created_dirs(created_dirs)
+    report.seconds = time.perf_counter() - t0
+    return report
+
+def rollback_batch_report(undo_log: Path, batch_id: str, workers: int = 4) -> RollbackReport:
+    """특정 배치 ID를 롤백하고 처리량/충돌 보고를 반환. 해당 배치 줄만 읽고 로그에는 삭제 표시만 추가."""
+    if not undo_log.exists():
+        return RollbackReport(batch_id)
+    with UndoStore(undo_log) as store:
+        return _rollback_in(store, batch_id, workers)
 
 def rollback_batch(undo_log: Path, batch_id: str) -> int:
     """특정 배치 ID를 롤백. 반환: 복원된 파일 수."""
-    if not undo_log.exists():
-        return 0
+    return rollback_batch_report(undo_log, batch_id).restored
 
-    lines = [ln for ln in undo_log.read_text(encoding="utf-8").splitlines() if ln.strip()]
-    recs = [json.loads(x) for x in lines]
-
-    restored = 0
-    kept: List[Dict[str, Any]] = []
-    for rec in recs:
-        if rec.get("id") == batch_id:
-            # 이 배치의 move들을 역순으로 처리(안전)
-            for mv in reversed(rec.get("moves", [])):
-                src, dst = Path(mv["src"]), Path(mv["dst"])
-                if Path(dst).exists():
-                    src.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.move(str(dst), str(src))
-                    restored += 1
-            # 생성했던 폴더 삭제 시도(비어있을 때만)
-            for d in rec.get("created_dirs", []):
-                _safe_rmdir(Path(d))
-            # 해당 배치 로그는 제거(=미포함)
-        else:
-            kept.append(rec)
-
-    # kept를 다시 오래된→최신 순서로 기록
-    kept_lines = "\n".join(json.dumps(x, ensure_ascii=False) for x in kept)
-    undo_log.write_text(kept_lines + ("\n" if kept_lines else ""), encoding="utf-8")
-    return restored
+def _rollback_in(store: UndoStore, batch_id: str, workers: int = 4) -> RollbackReport:
+    """
+    배치를 되돌리고 삭제 표시. 복원하지 못한 move 가 있으면 그것만 담은 잔여 배치
+    ({"id": "<원래 id>_r<시각>", "residual_of": 원래 id, ...})를 먼저 추가해 나중에 다시 시도할 수 있게 함.
+    """
+    rec = store.get(batch_id)
+    if rec is None:
+        return RollbackReport(batch_id)
+    moves = [(Path(mv["src"]), Path(mv["dst"])) for mv in rec.get("moves", []) if mv["src"] != mv["dst"]]
+    created = rec.get("created_dirs", [])
+    report = rollback_moves(moves, created, batch_id, workers)
+    # 덮어써진 move 는 복원할 내용 자체가 없으므로 잔여 배치에 넣지 않음
+    residual = [{"src": c["src"], "dst": c["dst"]} for c in report.conflicts if c["reason"] != "overwritten"]
+    if residual:
+        now = datetime.datetime.utcnow().isoformat()
+        base = rec.get("residual_of", batch_id)
+        store.append({"id": f"{base}_r{now.replace(':', '').replace('-', '').replace('.', '')}", "time": now,
+                      "mode": rec.get("mode", "move"), "moves": residual,
+                      "created_dirs": [d for d in created if os.path.isdir(d)], "residual_of": base})
+    store.tombstone(batch_id)
+    return report
 
 def rollback_recent(undo_log: Path, count: Optional[int] = None) -> int:
     """최근 N개 배치를 롤백. 반환: 복원된 파일 총 수."""
-    all_batches = read_undo_log(undo_log)  # 최신순
-    targets = all_batches if count is None else all_batches[:count]
+    if not undo_log.exists():
+        return 0
     total = 0
-    for b in targets:
-        total += rollback_batch(undo_log, b.get("id", ""))
+    with UndoStore(undo_log) as store:
+        ids = [b["id"] for b in store.list_batches(limit=-1 if count is None else count)]
+        for batch_id in ids:
+            total += _rollback_in(store, batch_id).restored
     return total
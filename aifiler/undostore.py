@@ -0,0 +1,191 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json, os, sqlite3
+
+from .journal import JOURNAL_DIR
+
+COMPACT_DEAD_RATIO = 0.5            # 죽은(롤백된) 배치가 로그 바이트의 이 비율을 넘으면 압축
+COMPACT_MIN_BYTES = 1024 * 1024     # 로그가 이보다 작으면 압축하지 않음
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    off INTEGER NOT NULL,
+    len INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS batches_live ON batches(dead, seq);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+def index_path_for(undo_log: Path) -> Path:
+    return undo_log.parent / f"{undo_log.stem}_index.sqlite"
+
+class UndoStore:
+    """
+    undo.jsonl(추가 전용) 위의 배치 인덱스(SQLite).
+    - 인덱스: 배치 id → (바이트 오프셋, 길이, 시간, 모드, 파일 수, dead)
+    - 로그가 늘어난 부분만 읽어 인덱스에 반영(sync). 파일이 교체/축소되면 처음부터 다시 색인
+    - 롤백은 파일을 다시 쓰지 않고 {"tombstone": id} 줄을 추가, 죽은 바이트가 많아지면 compact()
+    sqlite 연결은 만든 스레드에서만 사용.
+    """
+
+    def __init__(self, undo_log: Path, index_path: Optional[Path] = None, journal_dir: Path = JOURNAL_DIR):
+        undo_log.parent.mkdir(parents=True, exist_ok=True)
+        self.undo_log = undo_log
+        self.journal_dir = journal_dir
+        self.conn = sqlite3.connect(str(index_path or index_path_for(undo_log)))
+        self.conn.executescript(_SCHEMA)
+        self.sync()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "UndoStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- 색인 ----
+
+    def _meta(self, key: str, default: int = 0) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, **kv: int) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO meta(key, value) VALUES (?,?)", kv.items())
+
+    def _reset(self) -> None:
+        self.conn.execute("DELETE FROM batches")
+        self.conn.execute("DELETE FROM meta")
+
+    def sync(self) -> int:
+        """로그에 새로 추가된 줄을 색인. 반환: 새로 읽은 줄 수."""
+        try:
+            st = os.stat(self.undo_log)
+        except FileNotFoundError:
+            if self._meta("synced"):
+                self._reset()
+                self.conn.commit()
+            return 0
+        synced = self._meta("synced")
+        if self._meta("ino", -1) != st.st_ino or st.st_size < synced:
+            self._reset()
+            synced = 0
+        if st.st_size == synced:
+            return 0
+        n = 0
+        with self.undo_log.open("rb") as f:
+            f.seek(synced)
+            off = synced
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # 기록 중인 마지막 줄은 다음 sync 에서
+                self._index_line(raw, off)
+                off += len(raw)
+                n += 1
+        self._set_meta(synced=off, ino=st.st_ino)
+        self.conn.commit()
+        return n
+
+    def _index_line(self, raw: bytes, off: int) -> None:
+        if not raw.strip():
+            return
+        try:
+            rec = json.loads(raw)
+        except ValueError:
+            return
+        if "tombstone" in rec:
+            self.conn.execute("UPDATE batches SET dead=1 WHERE id=?", (rec["tombstone"],))
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO batches(id, off, len, time, mode, files, dead) VALUES (?,?,?,?,?,?,0)",
+            (rec.get("id", ""), off, len(raw), rec.get("time", ""), rec.get("mode", ""), len(rec.get("moves", []))),
+        )
+
+    # ---- 조회 ----
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM batches WHERE dead=0").fetchone()[0]
+
+    def list_batches(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """살아 있는 배치 요약을 최신순으로 한 페이지. (moves 는 읽지 않음)"""
+        rows = self.conn.execute(
+            "SELECT id, time, mode, files FROM batches WHERE dead=0 ORDER BY seq DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [{"id": i, "time": t, "mode": m, "files": n} for i, t, m, n in rows]
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """배치 레코드 전체(해당 줄만 읽음)."""
+        row = self.conn.execute("SELECT off, len FROM batches WHERE id=? AND dead=0", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        with self.undo_log.open("rb") as f:
+            f.seek(row[0])
+            return json.loads(f.read(row[1]))
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """살아 있는 배치 레코드를 최신순으로 하나씩."""
+        ids = [r[0] for r in self.conn.execute("SELECT id FROM batches WHERE dead=0 ORDER BY seq DESC")]
+        for batch_id in ids:
+            rec = self.get(batch_id)
+            if rec is not None:
+                yield rec
+
+    # ---- 삭제/압축 ----
+
+    def append(self, rec: Dict[str, Any]) -> None:
+        """배치 레코드 한 줄 추가(롤백 후 남은 잔여 배치 등)."""
+        with self.undo_log.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.sync()
+
+    def tombstone(self, batch_id: str) -> None:
+        """배치를 삭제 표시(로그에 한 줄 추가). 필요하면 압축."""
+        with self.undo_log.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"tombstone": batch_id}, ensure_ascii=False) + "\n")
+        self.sync()
+        self.maybe_compact()
+
+    def dead_ratio(self) -> Tuple[float, int]:
+        total = self._meta("synced")
+        live = self.conn.execute("SELECT COALESCE(SUM(len), 0) FROM batches WHERE dead=0").fetchone()[0]
+        return (1.0 - live / total if total else 0.0), total
+
+    def maybe_compact(self) -> bool:
+        ratio, total = self.dead_ratio()
+        if total < COMPACT_MIN_BYTES or ratio < COMPACT_DEAD_RATIO:
+            return False
+        return self.compact()
+
+    def compact(self) -> bool:
+        """
+        살아 있는 배치 줄만 새 파일로 복사한 뒤 교체하고 다시 색인.
+        적용 중(저널이 남아 있음)이면 저널의 오프셋이 어긋나므로 건너뜀. 반환: 압축했는지.
+        """
+        if self.journal_dir.exists() and any(self.journal_dir.glob("*.jsonl")):
+            return False
+        self.sync()
+        tmp = self.undo_log.with_name(self.undo_log.name + ".compact")
+        rows = self.conn.execute("SELECT off, len FROM batches WHERE dead=0 ORDER BY seq").fetchall()
+        with self.undo_log.open("rb") as src, tmp.open("wb") as out:
+            for off, length in rows:
+                src.seek(off)
+                out.write(src.read(length))
+            synced = self._meta("synced")
+            src.seek(synced)
+            out.write(src.read())  # 색인 이후 추가된 꼬리는 그대로 보존
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.undo_log)
+        self._reset()
+        self.conn.commit()
+        self.sync()
+        return True
@@ -0,0 +1,457 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import argparse, bisect, ctypes, ctypes.util, os, select, stat, struct, sys, threading, time
+
+from .scanner import FileEntry, iter_tree
+from .blacklist import EXCLUDE_DIR_NAMES, combined_blacklist, compile_blacklist
+from .recommender import name_based_label, plan_destinations
+from .rules import Rule, load_rules
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+# 내용 수정(IN_MODIFY)은 쓰는 동안 계속 오므로 닫힐 때(IN_CLOSE_WRITE)만 봄
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+DEBOUNCE_S = 0.5     # 마지막 이벤트 후 이만큼 조용하면 반영
+MAX_DELAY_S = 2.0    # 이벤트가 계속 와도 첫 이벤트 후 이 시간이 지나면 반영
+READ_BUF = 256 * 1024
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (+ name[len])
+
+class Inotify:
+    """libc inotify 를 ctypes 로 감싼 최소 래퍼. 감시 디스크립터(wd) ↔ 폴더 경로를 관리."""
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise RuntimeError("inotify 감시는 Linux 에서만 지원")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._libc = libc
+        self.fd = fd
+        self.wd_path: Dict[int, str] = {}
+        self.path_wd: Dict[str, int] = {}
+        self.failed = 0   # 감시 한도(max_user_watches)/권한 등으로 못 건 폴더 수
+
+    def add_watch(self, path: str) -> Optional[int]:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            self.failed += 1
+            return None
+        old = self.wd_path.get(wd)
+        if old is not None and old != path:
+            self.path_wd.pop(old, None)  # 같은 inode 가 다른 이름으로 옮겨진 경우
+        self.wd_path[wd] = path
+        self.path_wd[path] = wd
+        return wd
+
+    def rm_tree(self, path: str) -> None:
+        """path 와 그 아래 폴더들의 감시 해제(폴더가 루트 밖으로 옮겨졌을 때)."""
+        sub = os.path.join(path, "")
+        for p in [p for p in self.path_wd if p == path or p.startswith(sub)]:
+            wd = self.path_wd.pop(p)
+            self.wd_path.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def forget(self, wd: int) -> None:
+        """커널이 이미 해제한 wd(IN_IGNORED) 정리."""
+        p = self.wd_path.pop(wd, None)
+        if p is not None and self.path_wd.get(p) == wd:
+            del self.path_wd[p]
+
+    def read(self, timeout: float) -> List[Tuple[int, int, int, str]]:
+        """timeout 초까지 기다려 쌓인 이벤트를 모두 읽음. [(wd, mask, cookie, name)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        out: List[Tuple[int, int, int, str]] = []
+        while True:
+            try:
+                buf = os.read(self.fd, READ_BUF)
+            except BlockingIOError:
+                break
+            off = 0
+            while off + _EVENT.size <= len(buf):
+                wd, mask, cookie, n = _EVENT.unpack_from(buf, off)
+                off += _EVENT.size
+                out.append((wd, mask, cookie, os.fsdecode(buf[off:off + n].rstrip(b"\0"))))
+                off += n
+        return out
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class LiveIndex:
+    """
+    감시 중인 트리의 메모리 색인과 이동 계획(추천 모드: 이름 → 이웃 다수결 → others_review).
+    - 폴더별 파일 집합과 라벨 히스토그램(점수 0.7 이상 라벨별 파일 경로, 정렬 상태)을 유지
+    - 파일 하나가 바뀌면 그 파일만 다시 추천하고, 폴더 히스토그램은 그 파일만 넣고/뺌
+    - 형제 파일들은 폴더의 다수결 결과(서명)가 실제로 바뀐 경우에만 다시 계획
+    neighbor_majority_batch 를 경로 순으로 정렬한 파일 목록에 적용한 것과 같음 — 동률은 (자기 자신을 뺀) 형제 중
+    경로가 가장 앞선 파일의 라벨을 택하므로, 이벤트가 들어온 순서와 무관하게 결과가 정해짐.
+    """
+
+    def __init__(self, rules: Iterable[Rule], base_dest: Path):
+        self.rules = list(rules)
+        self.rule_map = {r.name: r for r in self.rules}
+        self.base_dest = base_dest
+        self.files: Dict[str, FileEntry] = {}
+        self.dir_files: Dict[str, Set[str]] = {}
+        self.dir_dirs: Dict[str, Set[str]] = {}
+        self._own: Dict[str, Tuple[Optional[str], bool]] = {}   # 파일 → (이웃 집계용 라벨, 이름만으로 확정인지)
+        self._hist: Dict[str, Dict[str, List[str]]] = {}   # 폴더 → 라벨 → 그 라벨인 파일 경로(정렬)
+        self._sig: Dict[str, Dict] = {}
+        self.dest: Dict[str, str] = {}      # 이동 계획 src → dst (제자리면 없음)
+        self.rules_of: Dict[str, str] = {}  # 파일 → 적용된 규칙 이름
+        self._dirty: Set[str] = set()
+        self._stale: Set[str] = set()       # 다시 계획할 파일
+        self.changed: Set[str] = set()      # 마지막 settle() 에서 계획이 바뀐(또는 사라진) src
+
+    # ---- 항목 반영 ----
+
+    def add_dir(self, path: str) -> None:
+        if path in self.dir_dirs:
+            return
+        self.dir_dirs[path] = set()
+        self.dir_files.setdefault(path, set())
+        up = os.path.dirname(path)
+        if up in self.dir_dirs:
+            self.dir_dirs[up].add(path)
+
+    def add_file(self, e: FileEntry) -> None:
+        p = os.fspath(e.path)
+        if p in self.files:
+            self.remove_file(p)
+        d = os.path.dirname(p)
+        lab, sc, _ = name_based_label(e)
+        q = lab if (lab and sc >= 0.7) else None
+        self.files[p] = e
+        self._own[p] = (q, bool(lab and sc >= 0.8))
+        self.dir_files.setdefault(d, set()).add(p)
+        if q:
+            bisect.insort(self._hist.setdefault(d, {}).setdefault(q, []), p)
+        self._dirty.add(d)
+        self._stale.add(p)
+
+    def remove_file(self, p: str) -> None:
+        if self.files.pop(p, None) is None:
+            return
+        d = os.path.dirname(p)
+        q, _ = self._own.pop(p)
+        self.dir_files.get(d, set()).discard(p)
+        if q:
+            h = self._hist[d]
+            paths = h[q]
+            del paths[bisect.bisect_left(paths, p)]
+            if not paths:
+                del h[q]
+        self._dirty.add(d)
+        self._stale.discard(p)
+        self.rules_of.pop(p, None)
+        if self.dest.pop(p, None) is not None:
+            self.changed.add(p)
+
+    def remove_tree(self, path: str) -> None:
+        """폴더와 그 아래 전체 제거(하위 폴더 집합을 따라가므로 해당 트리 크기에 비례)."""
+        stack = [path]
+        while stack:
+            d = stack.pop()
+            for p in list(self.dir_files.get(d, ())):
+                self.remove_file(p)
+            self.dir_files.pop(d, None)
+            self._hist.pop(d, None)
+            self._sig.pop(d, None)
+            self._dirty.discard(d)
+            stack.extend(self.dir_dirs.pop(d, ()))
+        up = os.path.dirname(path)
+        if up in self.dir_dirs:
+            self.dir_dirs[up].discard(path)
+
+    def remove_path(self, path: str) -> None:
+        if path in self.files:
+            self.remove_file(path)
+        elif path in self.dir_dirs or path in self.dir_files:
+            self.remove_tree(path)
+
+    # ---- 추천/계획 ----
+
+    def _neighbor(self, d: str, own: Optional[str], p: Optional[str] = None) -> Optional[Tuple[str, int]]:
+        """라벨이 own 인 파일 p 의 이웃 다수 라벨과 개수. 동률이면 p 를 뺀 첫 파일의 경로가 앞선 라벨."""
+        best: Optional[Tuple[str, int, str]] = None
+        for lab, paths in self._hist.get(d, {}).items():
+            cnt, first = len(paths), paths[0]
+            if lab == own:
+                cnt -= 1
+                if first == p and cnt:
+                    first = paths[1]
+            if cnt > 0 and (best is None or cnt > best[1] or (cnt == best[1] and first < best[2])):
+                best = (lab, cnt, first)
+        return best[:2] if best else None
+
+    def recommend(self, p: str) -> Dict[str, object]:
+        """파일 하나의 추천(recommend_rule_for_file 의 use_meta=False 와 같은 단계)."""
+        e = self.files[p]
+        q, strong = self._own[p]
+        if strong:
+            lab, sc, why = name_based_label(e)
+            return {"rule": lab, "score": sc, "why": why}
+        nb = self._neighbor(os.path.dirname(p), q, p)
+        if nb:
+            return {"rule": nb[0], "score": 0.7 + min(0.2, nb[1] / 50), "why": f"neighbor({nb[1]})"}
+        return {"rule": "others_review", "score": 0.0, "why": "fallback"}
+
+    def _signature(self, d: str) -> Dict:
+        """
+        자기 라벨이 q 인 형제가 받을 이웃 라벨((맨 앞 파일, 그 파일이 받을 라벨, 나머지 파일이 받을 라벨)).
+        개수만 바뀌고 이 값이 같으면 형제의 목적지는 그대로.
+        """
+        h = self._hist.get(d)
+        if not h:
+            return {}
+        sig = {None: (self._neighbor(d, None) or (None,))[0]}
+        for q, paths in h.items():
+            sig[q] = (paths[0], (self._neighbor(d, q, paths[0]) or (None,))[0], (self._neighbor(d, q) or (None,))[0])
+        return sig
+
+    def settle(self) -> Set[str]:
+        """
+        쌓인 변경을 계획에 반영. 반환: 계획이 바뀐 src 집합(사라진 파일 포함).
+        - 새로/바뀐 파일: 그 파일만 다시 계획
+        - 히스토그램이 바뀐 폴더: 서명이 달라졌을 때만 이름으로 확정되지 않은 형제를 다시 계획
+        """
+        for d in self._dirty:
+            sig = self._signature(d)
+            if sig != self._sig.get(d, {}):
+                self._stale.update(p for p in self.dir_files.get(d, ()) if not self._own[p][1])
+            if sig:
+                self._sig[d] = sig
+            else:
+                self._sig.pop(d, None)
+        self._dirty.clear()
+        stale = [p for p in self._stale if p in self.files]
+        self._stale.clear()
+        if stale:
+            entries = [self.files[p] for p in stale]
+            names = [str(self.recommend(p)["rule"]) for p in stale]
+            dsts = plan_destinations(entries, names, self.rule_map, self.base_dest, as_str=True)
+            for p, rname, dst in zip(stale, names, dsts):
+                self.rules_of[p] = rname
+                old = self.dest.get(p)
+                if dst == p:
+                    self.dest.pop(p, None)
+                elif old != dst:
+                    self.dest[p] = dst
+                if self.dest.get(p) != old:
+                    self.changed.add(p)
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def plan_items(self) -> List[Tuple[str, str]]:
+        return sorted(self.dest.items())
+
+class Watcher:
+    """
+    스캔 루트를 inotify 로 감시하며 LiveIndex 를 최신으로 유지.
+    - 시작 시 전체 스캔 + 모든 폴더에 감시 등록, 새 폴더가 생기거나 들어오면 그 하위 트리를 훑고 감시 추가
+    - 이벤트는 경로별로 합쳐(마지막 상태만 lstat 으로 확인) debounce 초 조용해지거나 max_delay 초가 지나면 한 번에 반영
+    - 커널 큐가 넘치면(IN_Q_OVERFLOW) 놓친 이벤트를 알 수 없으므로 전체 재스캔
+    on_change(index, 바뀐 src 집합) 는 반영할 때마다 감시 스레드에서 호출.
+    """
+
+    def __init__(self, root: Path, rules: Iterable[Rule], base_dest: Path,
+                 exclude_roots: Optional[Set[Path]] = None, exclude_dirnames: Set[str] = EXCLUDE_DIR_NAMES,
+                 max_depth: int = 12, debounce: float = DEBOUNCE_S, max_delay: float = MAX_DELAY_S,
+                 on_change: Optional[Callable[[LiveIndex, Set[str]], None]] = None):
+        self.root = root.resolve()
+        self.rules = list(rules)
+        self.base_dest = base_dest
+        # 계획된 목적지 아래에서 생기는 이벤트(적용 결과)는 추천 대상이 아니므로 함께 제외
+        self.exclude_roots = set(exclude_roots or ()) | {base_dest.resolve()}
+        self.exclude_dirnames = set(exclude_dirnames)
+        self._trie = compile_blacklist(self.exclude_roots, self.exclude_dirnames)
+        self.max_depth = max_depth
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_change = on_change
+        self.index = LiveIndex(self.rules, base_dest)
+        self.ino: Optional[Inotify] = None
+        self.rescans = 0
+        self.stop_event = threading.Event()
+
+    # ---- 스캔 ----
+
+    def _depth(self, path: str) -> int:
+        """path 가 들어 있는 폴더의 깊이(루트 = 0). iter_tree 의 max_depth 와 같은 기준."""
+        return len(Path(path).relative_to(self.root).parts) - 1
+
+    def _walk(self, top: str) -> None:
+        """
+        top 폴더(포함)를 감시 등록하고 하위 항목을 색인. 감시를 먼저 걸어 훑는 사이 생긴 항목을 놓치지 않음.
+        내용이 max_depth 를 넘는 폴더는 색인만 하고 감시하지 않음.
+        """
+        self.index.add_dir(top)
+        inner = self._depth(top) + 1
+        if inner > self.max_depth:
+            return
+        self.ino.add_watch(top)
+        for e in iter_tree(Path(top), self.exclude_roots, self.exclude_dirnames, self.max_depth - inner):
+            p = os.fspath(e.path)
+            if e.is_dir:
+                self.index.add_dir(p)
+                if self._depth(p) < self.max_depth:
+                    self.ino.add_watch(p)
+            else:
+                self.index.add_file(e)
+
+    def rescan(self) -> Set[str]:
+        """전체 재스캔. 계획이 바뀐 src 집합 반환."""
+        old = dict(self.index.dest)
+        self.index = LiveIndex(self.rules, self.base_dest)
+        self.ino.rm_tree(str(self.root))
+        self._walk(str(self.root))
+        self.index.settle()
+        self.rescans += 1
+        new = self.index.dest
+        return {p for p in old.keys() | new.keys() if old.get(p) != new.get(p)}
+
+    def start(self) -> None:
+        if self.ino is None:
+            self.ino = Inotify()
+        self._walk(str(self.root))
+        self.index.settle()
+        if self.on_change:
+            self.on_change(self.index, set(self.index.dest))
+
+    # ---- 이벤트 ----
+
+    def _apply(self, pending: Dict[str, bool]) -> Set[str]:
+        """합쳐진 경로들의 현재 상태를 확인해 색인에 반영."""
+        for path in pending:
+            if self._trie.is_blocked(Path(path)) or self._depth(path) > self.max_depth:
+                continue
+            try:
+                st = os.lstat(path)
+            except OSError:
+                st = None
+            if st is None:
+                if path in self.index.dir_dirs:
+                    self.ino.rm_tree(path)
+                self.index.remove_path(path)
+            elif stat.S_ISDIR(st.st_mode):
+                if path in self.index.files:
+                    self.index.remove_file(path)
+                if path in self.index.dir_dirs:
+                    self.ino.add_watch(path)
+                else:
+                    self._walk(path)   # 새로 생기거나 다른 곳에서 옮겨 온 폴더
+            else:
+                if path in self.index.dir_dirs:
+                    self.ino.rm_tree(path)
+                    self.index.remove_tree(path)
+                self.index.add_file(FileEntry(Path(path), False, st.st_size, st.st_mtime))
+        return self.index.settle()
+
+    def run(self, stop: Optional[threading.Event] = None, timeout: Optional[float] = None) -> None:
+        """stop 이 설정되거나 timeout 초가 지날 때까지 이벤트를 처리(블로킹). start() 를 먼저 호출."""
+        stop = stop or self.stop_event
+        end = None if timeout is None else time.monotonic() + timeout
+        pending: Dict[str, bool] = {}   # 경로 → 폴더 여부(삽입 순서 = 첫 이벤트 순서)
+        first = last = 0.0
+        poll = max(0.01, min(self.debounce, 0.25))
+        while not stop.is_set() and (end is None or time.monotonic() < end):
+            overflow = False
+            for wd, mask, _cookie, name in self.ino.read(poll):
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.ino.forget(wd)
+                    continue
+                base = self.ino.wd_path.get(wd)
+                if base is None:
+                    continue
+                path = base if (mask & (IN_DELETE_SELF | IN_MOVE_SELF)) else os.path.join(base, name)
+                pending[path] = bool(mask & IN_ISDIR)
+                now = time.monotonic()
+                first = first or now
+                last = now
+            if overflow:
+                pending.clear()
+                first = 0.0
+                changed = self.rescan()
+                if self.on_change:
+                    self.on_change(self.index, changed)
+                continue
+            now = time.monotonic()
+            if pending and (now - last >= self.debounce or now - first >= self.max_delay):
+                batch, pending, first = pending, {}, 0.0
+                changed = self._apply(batch)
+                if changed and self.on_change:
+                    self.on_change(self.index, changed)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        if self.ino is not None:
+            self.ino.close()
+            self.ino = None
+
+    def __enter__(self) -> "Watcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m aifiler.watch")
+    ap.add_argument("root", type=Path)
+    ap.add_argument("--dest", type=Path, default=None, help="정리 대상 루트(기본: <root>/_정리됨)")
+    ap.add_argument("--rules", type=Path, default=Path("data/rules.yaml"))
+    ap.add_argument("--max-depth", type=int, default=12)
+    ap.add_argument("--debounce", type=float, default=DEBOUNCE_S)
+    args = ap.parse_args(argv)
+
+    def report(index: LiveIndex, changed: Set[str]) -> None:
+        for p in sorted(changed):
+            dst = index.dest.get(p)
+            print(f"+ {p} -> {dst}" if dst else f"- {p}", flush=True)
+        print(f"# 계획 {len(index.dest)}건 / 파일 {len(index.files)}개", file=sys.stderr, flush=True)
+
+    dest = args.dest or (args.root / "_정리됨")
+    w = Watcher(args.root, load_rules(args.rules), dest, combined_blacklist(),
+                max_depth=args.max_depth, debounce=args.debounce, on_change=report)
+    with w:
+        try:
+            w.run()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
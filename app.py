@@ -1,18 +1,159 @@
 import streamlit as st
 from pathlib import Path
 from aifiler.blacklist import combined_blacklist, EXCLUDE_DIR_NAMES, suggested_roots_from_drives_only, list_first_level_dirs
-from aifiler.scanner import iter_tree, FileEntry
+from aifiler.index import ScanIndex
+from aifiler.entrytable import EntryTable
+from aifiler.tree import DirIndex
 from aifiler.rules import load_rules
-from aifiler.recommender import recommend_rule_for_file, to_move_dest, name_based_label
-from aifiler.diff import plan_moves
-from aifiler.actions import apply_moves
-from aifiler.dupes import find_duplicates
-from aifiler.llm_local import prompt_to_rules_yaml
-import os, sys, subprocess
+from aifiler.rulematch import compile_rules
+from aifiler.recommender import recommend_batch, plan_destinations, name_based_label
+from aifiler.diff import MovePlan
+from aifiler.actions import apply_moves_with_stats, recover_interrupted
+from aifiler.dupes import find_duplicates_staged
+from aifiler.hashcache import HashCache
+from aifiler.meta import META_CACHE_PATH
+from aifiler.llm_local import discover_model, prompt_to_rules_yaml, warm_up
+from aifiler.llm_classify import classify_others
+from aifiler.jobs import Job, JobCancelled, JobManager
+import datetime, os, sys, subprocess
 
 st.set_page_config(page_title="AI 파일정리 비서 (MVP)", layout="wide")
 st.title("🗂️ AI 파일정리 비서 (MVP)")
 
+@st.cache_resource
+def _recover_on_startup():
+    """이전 실행이 적용 도중 종료됐으면 저널로 마저 적용하고 작업기록에 남김(프로세스당 1회)."""
+    return recover_interrupted(Path("data/undo.jsonl"))
+
+for r in _recover_on_startup():
+    st.warning(f"중단된 적용 복구: 배치ID={r.batch_id}, 완료 {r.done}건 + 이어서 실행 {r.completed}건 "
+               "(작업기록 페이지에서 롤백 가능)")
+
+@st.cache_resource
+def _job_manager() -> JobManager:
+    """탐색/중복/미리보기 작업 풀(프로세스당 1개, 세션 간 공유)."""
+    return JobManager(workers=3)
+
+jobs = _job_manager()
+
+@st.fragment(run_every=1.0)
+def _job_panel(kind: str, key, label: str) -> None:
+    """작업 진행률 + 취소 버튼. 이 부분만 1초마다 다시 그리고, 작업이 끝나면 전체 화면을 한 번 다시 그림."""
+    job = jobs.get(kind, key)
+    if job is None:
+        return
+    if job.running:
+        p = job.progress
+        text = f"{label} 중... {p.stage} {p.done:,}" + (f"/{p.total:,}" if p.total else "")
+        if p.bytes:
+            text += f" · 읽은 바이트 {p.bytes / 1e6:,.1f} MB"
+        if p.eta is not None:
+            text += f" · 남은 시간 약 {p.eta:,.0f}초"
+        st.progress(p.fraction or 0.0, text=text)
+        if st.button("취소", key=f"cancel_{kind}"):
+            job.cancel()
+    elif st.session_state.get(f"_shown_{kind}") != job.seq:
+        st.session_state[f"_shown_{kind}"] = job.seq
+        st.rerun()
+
+def _job_outcome(job: Job | None, label: str):
+    """끝난 작업의 결과(없으면 None). 취소/오류는 화면에 알림."""
+    if job is None:
+        return None
+    if job.status == "cancelled":
+        st.info(f"{label}이(가) 취소되었습니다.")
+    elif job.status == "error":
+        st.error(f"{label} 실패: {job.error}")
+    for w in job.warnings:
+        st.warning(w)
+    return job.result
+
+def _scan_job(job: Job, root: Path, bl: set, exts: list[str]):
+    with ScanIndex() as index:
+        # 증분 인덱스: 변경되지 않은 디렉터리는 재-stat 없이 인덱스에서 재사용
+        scan = index.scan(root, bl, EXCLUDE_DIR_NAMES, max_depth=12)
+        files_set = set(e.lower() for e in exts)
+        # 압축된 열 단위 테이블로 보관(항목당 FileEntry+Path 대신). 진행 중 테이블을 부분 결과로 공개
+        table = EntryTable()
+        job.report(stage="탐색", partial=table)
+        try:
+            for e in scan:
+                if files_set and not (e.is_dir or e.path.suffix.lower() in files_set):
+                    continue
+                table.append(e.path, e.is_dir, e.size, e.mtime)
+                if len(table) % 2000 == 0:
+                    job.report(done=len(table))
+        finally:
+            scan.close()
+        delta = index.last_delta
+    job.report(stage="폴더 집계")
+    return table, delta, DirIndex.from_table(table)
+
+def _dupes_job(job: Job, entries: EntryTable):
+    files = list(entries.iter_files())
+    with HashCache() as hcache:
+        return find_duplicates_staged(files, cache=hcache, progress=lambda stage, done, total, nbytes: job.report(
+            done=done, total=total, bytes=nbytes, stage={"sample": "샘플 해시", "full": "전체 해시"}[stage]))
+
+def _llm_stage(job: Job, names: list[str], rules) -> list:
+    """선택 단계인 LLM 분류. 모델이 없거나 불러오지 못하면 경고만 남기고 건너뜀(미리보기는 계속)."""
+    try:
+        model_file, mdir = discover_model(MODELS_DIR)
+        if not (mdir / model_file).exists():
+            job.warn(f"LLM 분류를 건너뜀: {MODELS_DIR} 에 모델 파일(*.gguf)이 없습니다")
+            return []
+        return classify_others(names, rules, MODELS_DIR,
+                               progress=lambda done, total: job.report(done=done, total=total, stage="LLM 분류"))
+    except JobCancelled:
+        raise
+    except Exception as e:
+        job.warn(f"LLM 분류를 건너뜀: {e}")
+        return []
+
+def _preview_job(job: Job, entries: EntryTable, mode: str, rules, rule_map, base_dest: Path, use_meta: bool,
+                 use_llm: bool = False) -> MovePlan:
+    files = list(entries.iter_files())
+    # 규칙 설정 모드: rules.yaml 의 match 절을 전체 파일에 한 번에 평가
+    rule_hits = compile_rules(rules).match_batch(e.path.name for e in files) if mode == "규칙 설정(AI 추천)" else None
+    # 이웃 다수결은 폴더별 라벨 히스토그램으로 일괄 계산(폴더 크기에 선형)
+    # 메타 확인은 남은 파일만 풀에서 처리하고, 결과는 순서대로 흘려받아 진행률 표시
+    meta_mask = [not h for h in rule_hits] if rule_hits else None
+    meta_cache = HashCache(META_CACHE_PATH)
+    batch_recs = recommend_batch(files, use_meta=use_meta and mode != "자동(미리 설정)", meta_mask=meta_mask,
+                                 meta_cache=meta_cache)
+    try:
+        job.report(stage="추천 계산", total=len(files))
+        rule_names: list[str] = []
+        for i, (e, batch_rec) in enumerate(batch_recs):
+            rec = {"rule":"others_review","score":0.0,"why":"fallback"}
+            if mode == "자동(미리 설정)":
+                lab, sc, _ = name_based_label(e)
+                if lab: rec = {"rule":lab,"score":sc,"why":"auto"}
+            elif rule_hits and rule_hits[i]:
+                rec = {"rule":rules[rule_hits[i][0]].name,"score":1.0,"why":"rule:match"}
+            else:
+                rec = batch_rec
+            rule_names.append(rec["rule"])
+            if i % 500 == 0:
+                job.report(done=i)
+    finally:
+        batch_recs.close()
+        meta_cache.close()
+    # 남은 '검토 필요' 파일은 (선택) 로컬 LLM 으로 파일명 패턴당 한 번만 분류
+    rest = [i for i, r in enumerate(rule_names) if r == "others_review"]
+    if use_llm and rest and rules:
+        for i, rec in zip(rest, _llm_stage(job, [files[i].path.name for i in rest], rules)):
+            if rec and rec["rule"] in rule_map:
+                rule_names[i] = rec["rule"]
+    # 대상 경로는 (규칙, 날짜) 단위로 한 번만 렌더링, 계획은 열 단위로 한 번만 보관
+    job.report(stage="대상 경로", total=len(files))
+    plan = MovePlan()
+    for e, dst in zip(files, plan_destinations(files, rule_names, rule_map, base_dest, as_str=True)):
+        src = os.fspath(e.path)
+        if src != dst:
+            plan.add(src, dst)
+    return plan
+
 # 1) 블랙리스트(기본+사용자)
 bl = combined_blacklist()
 with st.sidebar:
@@ -60,22 +201,47 @@ base_dest_str = st.text_input("정리될 기준 루트(대상)", value=base_dest
 root = Path(root_str)
 base_dest = Path(base_dest_str)
 
-# 2-2) 탐색 버튼
+# 2-2) 탐색 버튼 (백그라운드 작업: 같은 루트/설정이면 다른 세션·새로고침 후에도 결과 재사용)
+scan_key = (str(root), tuple(sorted(ext_multi)), tuple(sorted(str(b) for b in bl)))
 if st.button("폴더 탐색(블랙리스트 제외)"):
-    with st.spinner("탐색 중..."):
-        entries_all = list(iter_tree(root, bl, EXCLUDE_DIR_NAMES, max_depth=12))
-        if ext_multi:
-            files_set = set(e.lower() for e in ext_multi)
-            entries = [e for e in entries_all if (e.is_dir or e.path.suffix.lower() in files_set)]
-        else:
-            entries = entries_all
-    st.session_state["entries"] = entries
-    st.success(f"탐색 완료: {len(entries)}개 항목")
-entries = st.session_state.get("entries", [])
+    jobs.submit("scan", scan_key, lambda job: _scan_job(job, root, bl, ext_multi), restart=True)
+_job_panel("scan", scan_key, "탐색")
+scan_job = jobs.get("scan", scan_key)
+entries, delta, dir_index = _job_outcome(scan_job, "탐색") or ([], None, None)
+if scan_job is not None and scan_job.running and scan_job.partial is not None:
+    st.caption(f"지금까지 {len(scan_job.partial):,}개 항목 발견")
 
 if entries:
     st.subheader("2) 인덱스 요약")
     st.write(f"총 항목: {len(entries)} (파일/폴더 포함)")
+    if delta is not None and not delta.initial:
+        st.caption(f"직전 탐색 대비 변경: 추가 {len(delta.added)} / 삭제 {len(delta.removed)} / 수정 {len(delta.modified)}")
+    root_id = dir_index.find(root.resolve()) if dir_index is not None else None
+    if root_id is not None:
+        def _dir_rows(stats):
+            return [{"폴더": s.path, "파일": s.files, "크기(MB)": round(s.bytes / 1e6, 1),
+                     "최근 수정": datetime.datetime.fromtimestamp(s.newest).strftime("%Y-%m-%d") if s.newest else ""}
+                    for s in stats]
+        with st.expander("용량이 큰 폴더 상위 10"):
+            st.dataframe(_dir_rows(dir_index.top_k(10, under=root_id)))
+        with st.expander("폴더 둘러보기"):
+            cur = st.session_state.get("tree_cur", root_id)
+            up = cur if cur < len(dir_index) else -1
+            while up >= 0 and up != root_id:
+                up = dir_index.parent[up]
+            if up != root_id:  # 다른 루트를 탐색한 뒤라면 처음부터
+                cur = root_id
+            st.caption(dir_index.paths[cur])
+            kids = dir_index.children(cur, limit=200)
+            st.dataframe(_dir_rows(kids))
+            opts = ["(선택)"] + [k.path for k in kids]
+            pick = st.selectbox("하위 폴더 열기", options=opts, index=0, key=f"tree_pick_{cur}")
+            if pick != opts[0]:
+                st.session_state["tree_cur"] = dir_index.find(pick)
+                st.rerun()
+            if cur != root_id and st.button("상위 폴더로"):
+                st.session_state["tree_cur"] = dir_index.parent[cur]
+                st.rerun()
 
 # 3) 모드 선택
 st.subheader("3) 정리 모드 선택")
@@ -88,86 +254,94 @@ rule_map = {r.name: r for r in rules}
 # 프롬프트 → rules.yaml (모델 자동 탐지/다운로드)
 MODELS_DIR = Path("models")
 if mode == "프롬프트 기반(AI 추천)":
+    warm_up(MODELS_DIR)  # 모델 파일이 있으면 백그라운드에서 미리 로드
     prompt = st.text_area("정리 방법을 한국어로 작성하세요", height=120,
                           placeholder="예) txt는 문서/{연-월}, 엑셀은 재무/보고서, 사진은 사진/{연/월} ...")
     if st.button("프롬프트로 규칙 생성(내장 LLM)"):
-        with st.spinner("규칙 생성 중(모델 자동 탐지/다운로드)…"):
-            yml = prompt_to_rules_yaml(prompt, MODELS_DIR)
-        st.code(yml, language="yaml")
-        if st.button("위 YAML을 rules.yaml로 저장"):
-            Path("data").mkdir(exist_ok=True)
-            rules_path.write_text(yml, encoding="utf-8")
-            rules = load_rules(rules_path)
-            st.success("rules.yaml 저장 및 로드 완료")
+        yml = None
+        try:
+            with st.spinner("규칙 생성 중(모델 자동 탐지/다운로드)…"):
+                yml = prompt_to_rules_yaml(prompt, MODELS_DIR)
+        except (RuntimeError, ValueError) as e:
+            st.error(str(e))
+        if yml:
+            st.code(yml, language="yaml")
+            if st.button("위 YAML을 rules.yaml로 저장"):
+                Path("data").mkdir(exist_ok=True)
+                rules_path.write_text(yml, encoding="utf-8")
+                rules = load_rules(rules_path)
+                st.success("rules.yaml 저장 및 로드 완료")
 
 # 4) 전/후 비교(DRY-RUN) + 중복 알림
 st.subheader("4) 전/후 비교 (DRY-RUN)")
 use_meta = st.checkbox("초저비용 메타 사용(옵션)", value=False)
+use_llm = st.checkbox("남은 '검토 필요' 파일을 로컬 LLM으로 분류(옵션, 파일명 패턴당 1회)", value=False)
 
-move_map = {}
-dupes = {}
+scan_seq = scan_job.seq if scan_job is not None else 0
+dupes_key = (scan_key, scan_seq)
+rules_sig = rules_path.stat().st_mtime_ns if rules_path.exists() else 0
+preview_key = (scan_key, scan_seq, mode, use_meta, use_llm, str(base_dest), rules_sig)
 if st.button("미리보기 생성"):
     if not entries:
         st.warning("먼저 탐색을 실행하세요.")
     else:
-        with st.spinner("미리보기와 중복 후보 분석 중..."):
-            files = [e for e in entries if not e.is_dir]
-            dupes = find_duplicates(files)
-            siblings_by_parent: dict[Path, list[FileEntry]] = {}
-            for e in files:
-                siblings_by_parent.setdefault(e.path.parent, []).append(e)
-            for e in files:
-                sibs = siblings_by_parent.get(e.path.parent, [])
-                rec = {"rule":"others_review","score":0.0,"why":"fallback"}
-                if mode == "자동(미리 설정)":
-                    lab, sc, _ = name_based_label(e)
-                    if lab: rec = {"rule":lab,"score":sc,"why":"auto"}
-                else:
-                    rec = recommend_rule_for_file(e, sibs, use_meta=use_meta)
-                dst = to_move_dest(rule_map, rec, e, base_dest)
-                if e.path != dst:
-                    move_map[e.path] = dst
-            plan = plan_moves(move_map)
-        st.session_state["plan"] = plan
-        st.session_state["move_map"] = move_map
-        st.session_state["dupes"] = dupes
-        st.success(f"미리보기 완성: {plan['total']}건 이동 예정")
-
-plan = st.session_state.get("plan")
-dupes = st.session_state.get("dupes", {})
+        jobs.submit("dupes", dupes_key, lambda job: _dupes_job(job, entries), restart=True)
+        jobs.submit("preview", preview_key,
+                    lambda job: _preview_job(job, entries, mode, rules, rule_map, base_dest, use_meta, use_llm),
+                    restart=True)
+_job_panel("preview", preview_key, "미리보기")
+_job_panel("dupes", dupes_key, "중복 후보 분석")
+
+plan = _job_outcome(jobs.get("preview", preview_key), "미리보기")
+dupe_report = _job_outcome(jobs.get("dupes", dupes_key), "중복 후보 분석")
+dupes = dupe_report.groups if dupe_report is not None else {}
+if plan is not None:
+    st.success(f"미리보기 완성: {len(plan)}건 이동 예정")
 
 # 4-1) 대상 폴더별 개수 + 클릭 시 상세
 if plan:
     st.markdown("**대상 폴더별 개수:** (클릭하여 항목 확인)")
-    per_dest = plan["per_dest"]
-    per_dest_items = plan.get("per_dest_items", {})
-    for dest, cnt in sorted(per_dest.items(), key=lambda x: x[0]):
+    for dest, cnt in sorted(plan.per_dest().items(), key=lambda x: x[0]):
         with st.expander(f"{dest}  —  {cnt}건"):
-            items = per_dest_items.get(dest, [])
-            for src, dst in items[:500]:
+            for src, dst in plan.dest_page(dest, 0, 500):
                 st.write(f"• {src}  ➜  {dst}")
-    st.markdown("**일부 전체 변경 목록:**")
-    st.dataframe(plan["changes"][:300])
+    st.markdown("**전체 변경 목록:**")
+    PLAN_PAGE = 300
+    n_pages = max(1, (len(plan) + PLAN_PAGE - 1) // PLAN_PAGE)
+    pg = st.number_input(f"페이지 (1~{n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key="plan_page")
+    st.dataframe(plan.page((int(pg) - 1) * PLAN_PAGE, PLAN_PAGE))
+    exp_fmt = st.radio("내보내기 형식", ["csv", "jsonl"], horizontal=True)
+    if st.button("계획 내보내기"):
+        out = Path(f"data/plan_export.{exp_fmt}")
+        n = plan.export(out)
+        st.success(f"{n}건 → {out}")
 
 # 4-2) 중복 후보 그룹 표시
 if dupes:
     st.subheader("중복 후보 그룹")
-    st.info(f"그룹 수: {len(dupes)}  —  동일 사이즈 + 헤드 해시 기준")
-    for i, ((size, hh), group) in enumerate(dupes.items(), start=1):
-        with st.expander(f"그룹 #{i} (size={size}, headSHA1={hh})"):
+    st.info(f"그룹 수: {len(dupes)}  —  동일 사이즈 + 전체 내용 해시 기준")
+    ds = dupe_report.stats
+    if ds is not None:
+        st.caption(f"크기 후보 {ds.size_candidates} / 샘플 후보 {ds.sample_candidates} (전체 {ds.files}) — "
+                   f"읽은 바이트: 샘플 {ds.bytes_read['sample']:,} / 전체 {ds.bytes_read['full']:,} — "
+                   f"해시 캐시 적중 {ds.cache_hits} / 미스 {ds.cache_misses}")
+    for i, ((size, algo, hh), group) in enumerate(dupes.items(), start=1):
+        with st.expander(f"그룹 #{i} (size={size}, {algo}={hh})"):
             for e in group:
                 st.write(str(e.path))
 
 # 5) 적용 (배치 로그 + 적용 후 탐색기 열기)
 st.subheader("5) 적용")
 if st.button("변경 적용(이동)"):
-    move_map = st.session_state.get("move_map", {})
-    if not move_map:
+    if not plan:
         st.warning("미리보기 후 실행하세요.")
     else:
         applied_log = Path("data/undo.jsonl")
-        batch_id = apply_moves(move_map, applied_log, mode="move")
-        st.success(f"적용 완료: 배치ID={batch_id}, 이동 파일 {len(move_map)}건")
+        with st.spinner("파일 이동 중..."):
+            batch_id, mstats = apply_moves_with_stats(plan.items(), applied_log, mode="move")
+        st.success(f"적용 완료: 배치ID={batch_id}, 이동 파일 {mstats.files}건")
+        st.caption(f"빠른 이동(rename) {mstats.renamed}건 · 장치 간 복사 {mstats.copied}건 · "
+                   f"{mstats.files_per_s:,.0f} 파일/s · {mstats.bytes_per_s / 1e6:,.1f} MB/s")
         # 적용 후 대상 폴더 열기
         try:
             if os.name == "nt":
@@ -178,9 +352,8 @@ if st.button("변경 적용(이동)"):
                 subprocess.Popen(["xdg-open", str(base_dest)])
         except Exception:
             pass
-        # 세션 정리
-        st.session_state.pop("plan", None)
-        st.session_state.pop("move_map", None)
-        st.session_state.pop("dupes", None)
+        # 적용한 계획/중복 결과는 더 이상 유효하지 않음
+        jobs.forget("preview", preview_key)
+        jobs.forget("dupes", dupes_key)
 
 st.caption("※ 롤백은 좌측 Pages의 '작업 기록 & 롤백' 페이지에서 수행하세요.")
@@ -43,10 +43,11 @@ with col2:
 
 st.markdown("---")
 st.subheader("추천 블랙리스트 (실제 PC 스캔 기반)")
+bl_depth = st.slider("실행파일 밀도 검사 깊이(폴더 단계)", min_value=0, max_value=5, value=2)
 if st.button("추천 계산"):
-    with st.spinner("스캔 중..."):
+    with st.spinner("스캔 중... (변경 없는 폴더는 이전 결과 재사용)"):
         drives = list_drive_roots_windows()
-        recs = recommend_blacklist_from_scan(drives)
+        recs = recommend_blacklist_from_scan(drives, max_depth=bl_depth)
     st.session_state["bl_recs"] = [str(p) for p in recs]
 
 recs = st.session_state.get("bl_recs", [])
@@ -1,27 +1,38 @@
 import streamlit as st
 from pathlib import Path
-from aifiler.undo import read_undo_log, rollback_recent, rollback_batch
+from aifiler.undo import rollback_recent, rollback_batch_report
+from aifiler.undostore import UndoStore
 
 st.set_page_config(page_title="작업 기록 & 롤백", layout="wide")
 st.title("📝 작업 기록 & 롤백 (배치 단위)")
 
 LOG_PATH = Path("data/undo.jsonl")
+PAGE_SIZE = 50
 
 st.subheader("배치 기록")
-batches = read_undo_log(LOG_PATH)  # 최신순
-st.write(f"총 {len(batches)} 건 (한 번의 '적용' 클릭 = 1건)")
+with UndoStore(LOG_PATH) as store:
+    total = store.count()
+    pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+    page = st.number_input(f"페이지 (1~{pages})", min_value=1, max_value=pages, value=1, step=1) if total else 1
+    batches = store.list_batches(offset=(int(page) - 1) * PAGE_SIZE, limit=PAGE_SIZE)  # 최신순
+st.write(f"총 {total} 건 (한 번의 '적용' 클릭 = 1건)")
 
 if batches:
     # 표 요약: 배치ID, 시간, 파일 개수
-    view = [{"batch_id":b.get("id",""), "time":b.get("time",""), "files":len(b.get("moves",[])), "mode":b.get("mode","")} for b in batches]
-    st.dataframe(view[:1000])
+    view = [{"batch_id":b["id"], "time":b["time"], "files":b["files"], "mode":b["mode"]} for b in batches]
+    st.dataframe(view)
 
     st.markdown("### 특정 배치 롤백")
-    ids = ["(선택)"] + [b.get("id","") for b in batches]
-    pick = st.selectbox("배치 ID 선택", options=ids, index=0)
+    ids = ["(선택)"] + [b["id"] for b in batches]
+    pick = st.selectbox("배치 ID 선택 (현재 페이지)", options=ids, index=0)
     if st.button("선택 배치 롤백") and pick != "(선택)":
-        n = rollback_batch(LOG_PATH, pick)
-        st.success(f"복원 파일 수: {n}")
+        rep = rollback_batch_report(LOG_PATH, pick)
+        st.success(f"복원 파일 수: {rep.restored} ({rep.files_per_s:,.0f} 파일/s), 정리한 폴더 {rep.removed_dirs}개")
+        if rep.conflicts:
+            st.warning(f"복원하지 못한 파일 {len(rep.conflicts)}건 "
+                       "(occupied: 원래 자리에 다른 파일 / missing: 이동된 파일 없음 / overwritten: 같은 배치에서 덮어씀) — "
+                       "overwritten 외에는 잔여 배치로 남아 원인을 해결한 뒤 다시 롤백할 수 있습니다")
+            st.dataframe(rep.conflicts)
 
     st.markdown("### 최근 N건 롤백")
     n = st.number_input("N 입력", min_value=1, value=1, step=1)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+from pathlib import Path
+
+import pytest
+
+from aifiler.actions import apply_moves_with_stats
+
+def test_failed_first_move_leaves_no_batch_record(tmp_path):
+    undo_log = tmp_path / "undo.jsonl"
+    journal_dir = tmp_path / "journal"
+    missing = tmp_path / "missing.txt"
+    with pytest.raises(OSError):
+        apply_moves_with_stats([(missing, tmp_path / "dst.txt")], undo_log, journal_dir=journal_dir)
+    assert not undo_log.exists() or undo_log.read_text(encoding="utf-8") == ""
+    assert not list(journal_dir.glob("*.jsonl"))
+
+def test_completed_moves_are_recorded(tmp_path):
+    undo_log = tmp_path / "undo.jsonl"
+    src = tmp_path / "a.txt"
+    src.write_text("a")
+    batch_id, st = apply_moves_with_stats([(src, tmp_path / "out" / "a.txt")], undo_log, journal_dir=tmp_path / "j")
+    assert st.files == 1 and batch_id in undo_log.read_text(encoding="utf-8")
@@ -0,0 +1,43 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+from aifiler import cli
+
+@pytest.mark.parametrize("argv, quiet", [
+    (["scan", "src"], False),
+    (["scan", "src", "-q"], True),
+    (["-q", "scan", "src"], True),
+    (["--quiet", "rollback", "--list"], True),
+    (["apply", "plan.jsonl", "--dry-run", "--quiet"], True),
+    (["plan", "--dest", "out", "-q"], True),
+    (["dupes", "-q"], True),
+])
+def test_quiet_before_or_after_subcommand(argv, quiet):
+    assert cli.build_parser().parse_args(argv).quiet is quiet
+
+def test_apply_dry_run_closes_input(tmp_path, monkeypatch, capsys):
+    plan = tmp_path / "plan.jsonl"
+    plan.write_text("".join(json.dumps({"src": f"/a/{i}", "dst": f"/b/{i}"}) + "\n" for i in range(3)), encoding="utf-8")
+    opened = []
+    real_open_in = cli._open_in
+    monkeypatch.setattr(cli, "_open_in", lambda path: opened.append(real_open_in(path)) or opened[-1])
+    assert cli.main(["apply", str(plan), "--dry-run", "--undo-log", str(tmp_path / "undo.jsonl")]) == 0
+    assert opened and opened[0].closed
+    assert "dry run: 3 moves" in capsys.readouterr().err
+
+def test_apply_dry_run_does_not_recover_journals(tmp_path, monkeypatch, capsys):
+    plan = tmp_path / "plan.jsonl"
+    plan.write_text(json.dumps({"src": "/a/1", "dst": "/b/1"}) + "\n", encoding="utf-8")
+    pending = tmp_path / "journal" / "b1.jsonl"
+
+    def no_recovery(*a, **kw):
+        raise AssertionError("dry run 에서 복구(파일 이동)를 실행함")
+    monkeypatch.setattr(cli, "recover_interrupted", no_recovery)
+    monkeypatch.setattr(cli, "pending_journals", lambda: [pending])
+    monkeypatch.setattr(cli, "owner_alive", lambda path: False)
+    undo_log = tmp_path / "undo.jsonl"
+    assert cli.main(["apply", str(plan), "--dry-run", "--undo-log", str(undo_log)]) == 0
+    assert str(pending) in capsys.readouterr().err
+    assert not undo_log.exists()
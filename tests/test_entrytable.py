@@ -0,0 +1,78 @@
+from __future__ import annotations
+import os, tracemalloc
+from pathlib import Path
+
+from aifiler.dupes import find_duplicates_staged
+from aifiler.entrytable import EntryRow, EntryTable
+from aifiler.recommender import neighbor_majority, neighbor_majority_batch
+from aifiler.scanner import FileEntry, iter_tree
+from aifiler.tree import DirIndex
+
+def _synthetic(n: int, dirs: int = 100):
+    return [FileEntry(Path(f"/data/photos/2024/album_{i % dirs:03d}/IMG_{i:07d}.jpg"), False, 1000 + i, 1.7e9 + i)
+            for i in range(n)]
+
+def test_table_bytes_per_entry():
+    n = 50_000
+    entries = _synthetic(n)
+    for e in entries:
+        os.fspath(e.path)  # Path 가 캐시하는 문자열은 입력 쪽 메모리이므로 미리 만들어 둠
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        table = EntryTable.from_entries(entries)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    # 열 단위: dir id 4 + 이름 오프셋 8 + size 8 + mtime 8 + is_dir 1 + 이름(~15) ≈ 44 바이트/항목
+    assert len(table) == n
+    assert used / n < 80, used / n   # FileEntry + Path 는 항목당 수백 바이트
+    assert table.nbytes() / n < 80
+    assert table[123].path == entries[123].path and table[-1].size == entries[-1].size
+
+def _tree(root: Path) -> None:
+    # 사진 폴더(이웃 다수결), 영수증 폴더, 섞인 폴더 + 폴더를 넘나드는 중복
+    files = {
+        "photos/IMG_0001.jpg": b"a" * 300, "photos/IMG_0002.jpg": b"b" * 300, "photos/untitled.dat": b"a" * 300,
+        "photos/sub/DSC_0003.JPG": b"c" * 50, "receipts/영수증_1.pdf": b"r" * 120, "receipts/invoice-2.pdf": b"r" * 120,
+        "receipts/scan.bin": b"s" * 120, "misc/notes.txt": b"n" * 10, "misc/copy.txt": b"n" * 10, "misc/empty": b"",
+    }
+    for rel, data in files.items():
+        p = root / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(data)
+
+def _entries_and_table(root: Path):
+    entries = list(iter_tree(root, set(), set()))
+    return entries, EntryTable.from_entries(entries)
+
+def test_entryrow_matches_fileentry(tmp_path):
+    _tree(tmp_path)
+    entries, table = _entries_and_table(tmp_path)
+    rows = list(table)
+    assert all(isinstance(r, EntryRow) for r in rows)
+    assert [(r.path, r.is_dir, r.size, r.mtime) for r in rows] == [(e.path, e.is_dir, e.size, e.mtime) for e in entries]
+
+    files = [e for e in entries if not e.is_dir]
+    frows = list(table.iter_files())
+    by_parent = {}
+    for e, r in zip(files, frows):
+        by_parent.setdefault(e.path.parent, ([], []))
+        by_parent[e.path.parent][0].append(e)
+        by_parent[e.path.parent][1].append(r)
+    for e, r in zip(files, frows):
+        sib_e, sib_r = by_parent[e.path.parent]
+        assert neighbor_majority(e, sib_e) == neighbor_majority(r, sib_r)
+    assert neighbor_majority_batch(files) == neighbor_majority_batch(frows)
+
+    def groups(report):
+        return sorted((k, sorted(os.fspath(x.path) for x in v)) for k, v in report.groups.items())
+    assert groups(find_duplicates_staged(files)) == groups(find_duplicates_staged(frows))
+    assert groups(find_duplicates_staged(files))  # 중복이 실제로 있어야 의미 있는 비교
+
+    a, b = DirIndex.from_entries(entries), DirIndex.from_table(table)
+    assert len(a) == len(b)
+    def stats(idx: DirIndex):
+        return sorted((s.path, s.files, s.bytes, s.newest, s.own_files) for s in map(idx.stat, range(len(idx))))
+    assert stats(a) == stats(b)
+    assert [s.path for s in a.top_k(3)] == [s.path for s in b.top_k(3)]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+from itertools import zip_longest
+from pathlib import Path
+
+from aifiler.index import ScanIndex
+
+def _tree(root: Path, dirs: int, files: int) -> None:
+    for d in range(dirs):
+        sub = root / f"d{d:02d}"
+        sub.mkdir(parents=True)
+        for f in range(files):
+            (sub / f"f{f:02d}.txt").write_text("x")
+
+def test_concurrent_scans_share_index(tmp_path):
+    # 같은 인덱스 파일에서 두 스캔을 번갈아 진행 — 한쪽이 쓰기 잠금을 끝까지 들고 있으면 "database is locked"
+    a, b = tmp_path / "a", tmp_path / "b"
+    _tree(a, 5, 3)
+    _tree(b, 4, 2)
+    db = tmp_path / "index.sqlite"
+    with ScanIndex(db) as ia, ScanIndex(db) as ib:
+        out_a, out_b = [], []
+        for ea, eb in zip_longest(ia.scan(a, set(), set()), ib.scan(b, set(), set())):
+            if ea is not None:
+                out_a.append(ea)
+            if eb is not None:
+                out_b.append(eb)
+    assert sum(not e.is_dir for e in out_a) == 15
+    assert sum(not e.is_dir for e in out_b) == 8
+    with ScanIndex(db) as idx:
+        again = list(idx.scan(a, set(), set()))
+        assert sorted(e.path for e in again) == sorted(e.path for e in out_a)
+        assert not idx.last_delta and not idx.last_delta.initial
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import json, re
+
+import pytest
+
+from aifiler.llm_classify import classify_others, classify_patterns, filename_pattern
+from aifiler.llm_local import set_model_factory
+from aifiler.rules import Rule
+
+RULES = [Rule("Receipts", {}, "영수증", {}), Rule("photos", {}, "사진", {})]
+
+class FakeModel:
+    """프롬프트의 번호 목록을 읽어 파일명에 따라 답하는 가짜 모델. answer 로 답을 바꿀 수 있음."""
+
+    def __init__(self):
+        self.prompts = []
+        self.answer = None
+
+    def generate(self, text: str, max_tokens: int = 0, temp: float = 0.0) -> str:
+        self.prompts.append(text)
+        if self.answer is not None:
+            return self.answer
+        items = re.findall(r"^(\d+)\. (.+)$", text.split("Filenames:\n", 1)[1], re.M)
+        out = {}
+        for num, name in items:
+            name = name.lower()
+            if "receipt" in name:
+                out[num] = " RECEIPTS "   # 대소문자/공백이 달라도 규칙 이름으로 맞춰야 함
+            elif "img" in name:
+                out[num] = "photos"
+            elif "memo" in name:
+                out[num] = "none"
+            else:
+                out[num] = "music"       # 없는 규칙 이름
+        return "```json\n" + json.dumps(out) + "\n```"
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "fake.gguf").write_bytes(b"weights")
+    model = FakeModel()
+    set_model_factory(lambda model_file, model_dir: model)
+    yield models, model, tmp_path / "llm.sqlite"
+    set_model_factory(None)
+
+def _items(prompt: str) -> list[str]:
+    return re.findall(r"^\d+\. (.+)$", prompt.split("Filenames:\n", 1)[1], re.M)
+
+@pytest.mark.parametrize("name, pattern", [
+    ("Report_2024-03-01_v2.DOCX", "report_#_v#.docx"),
+    ("IMG 0001 (3).jpg", "img # (#).jpg"),
+    ("scan_20240301_001.pdf", "scan_#.pdf"),
+    ("receipt-7.pdf", "receipt-#.pdf"),
+    ("notes.txt", "notes.txt"),
+    ("song 1.mp3", "song #.mp3"),
+    ("clip 1.MP4", "clip #.mp4"),
+    ("voice 12.m4a", "voice #.m4a"),
+    ("backup_2.7z", "backup_#.7z"),
+    ("movie.3gp", "movie.3gp"),
+])
+def test_filename_pattern(name, pattern):
+    assert filename_pattern(name) == pattern
+
+def test_one_generate_per_pattern_across_batches(fake):
+    models, model, cache = fake
+    names = [f"receipt_{i}.pdf" for i in range(30)] + [f"IMG_{i:04d}.jpg" for i in range(30)] + ["memo 1.txt", "song 2.mp3"]
+    got = classify_patterns(names, RULES, models, batch_size=3, cache_path=cache)
+    assert got == {"receipt_#.pdf": "Receipts", "img_#.jpg": "photos", "memo #.txt": None, "song #.mp3": None}
+    assert len(model.prompts) == 2   # 4 패턴 / batch_size 3
+    sent = [n for p in model.prompts for n in _items(p)]
+    assert len(sent) == 4 and sorted(map(filename_pattern, sent)) == sorted(got)
+
+def test_second_run_hits_cache(fake):
+    models, model, cache = fake
+    names = ["receipt_1.pdf", "IMG_0001.jpg"]
+    first = classify_patterns(names, RULES, models, cache_path=cache)
+    second = classify_patterns(["receipt_99.pdf", "IMG_0420.jpg"], RULES, models, cache_path=cache)
+    assert first == second
+    assert len(model.prompts) == 1
+
+def test_malformed_output_is_not_cached(fake):
+    models, model, cache = fake
+    model.answer = "Sure! receipt_1.pdf is a receipt."
+    assert classify_patterns(["receipt_1.pdf"], RULES, models, cache_path=cache) == {"receipt_#.pdf": None}
+    model.answer = None
+    assert classify_patterns(["receipt_1.pdf"], RULES, models, cache_path=cache) == {"receipt_#.pdf": "Receipts"}
+    assert len(model.prompts) == 2
+
+def test_classify_others_unknown_and_none_map_to_none(fake):
+    models, model, cache = fake
+    out = classify_others(["receipt_3.pdf", "memo 2.txt", "song 1.mp3"], RULES, models, cache_path=cache)
+    assert out[0] == {"rule": "Receipts", "score": 0.6, "why": "llm:pattern"}
+    assert out[1:] == [None, None]
+
+def test_same_stem_different_extension_are_separate_patterns(fake):
+    models, model, cache = fake
+    got = classify_patterns(["song 1.mp3", "song 2.mp4", "song 3.m4a", "song 4.m4v"], RULES, models, cache_path=cache)
+    assert sorted(got) == ["song #.m4a", "song #.m4v", "song #.mp3", "song #.mp4"]
+    assert len(_items(model.prompts[0])) == 4
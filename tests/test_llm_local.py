@@ -0,0 +1,115 @@
+from __future__ import annotations
+import json, threading
+from pathlib import Path
+
+import pytest
+
+from aifiler import llm_local
+from aifiler.llm_local import generate_text, prompt_to_rules_yaml, set_model_factory, validate_rules_json
+
+RULES = {"rules": [{"name": "pdf", "match": {"ext": [".pdf"]}, "dest": "문서/PDF"}]}
+
+class FakeModel:
+    """gpt4all 대신 쓰는 가짜 모델. 로드/생성 횟수와 생성한 스레드를 기록."""
+    loads = 0
+
+    def __init__(self, model_file: str, model_dir: Path):
+        FakeModel.loads += 1
+        self.calls = []
+        self.output = json.dumps(RULES)
+
+    def generate(self, text: str, max_tokens: int = 0, temp: float = 0.0) -> str:
+        self.calls.append((text, threading.current_thread().ident))
+        return self.output
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # 해시 캐시(data/) 가 작업 폴더에 생기도록
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "fake.gguf").write_bytes(b"weights-v1")
+    made = []
+
+    def factory(model_file: str, model_dir: Path) -> FakeModel:
+        made.append(FakeModel(model_file, model_dir))
+        return made[-1]
+
+    FakeModel.loads = 0
+    set_model_factory(factory)
+    yield models, made
+    set_model_factory(None)
+
+def test_model_loads_lazily_and_worker_is_reused(fake):
+    models, made = fake
+    assert FakeModel.loads == 0 and llm_local._worker is None
+    generate_text("a", models)
+    generate_text("b", models)
+    assert FakeModel.loads == 1
+    calls = made[0].calls
+    assert [t for t, _ in calls] == ["a", "b"]
+    assert calls[0][1] == calls[1][1] != threading.current_thread().ident
+
+def test_normalized_repeat_prompt_hits_cache(fake, tmp_path):
+    models, made = fake
+    cache = tmp_path / "llm.sqlite"
+    first = prompt_to_rules_yaml("PDF 는  문서/PDF 로", models, cache_path=cache)
+    again = prompt_to_rules_yaml("  pdf 는 문서/pdf 로\n", models, cache_path=cache)
+    assert again == first and "문서/PDF" in first
+    assert len(made[0].calls) == 1
+
+def test_model_fingerprint_change_invalidates_cache(fake, tmp_path):
+    models, made = fake
+    cache = tmp_path / "llm.sqlite"
+    prompt_to_rules_yaml("pdf 정리", models, cache_path=cache)
+    (models / "fake.gguf").write_bytes(b"weights-v2-retrained")
+    prompt_to_rules_yaml("pdf 정리", models, cache_path=cache)
+    assert len(made[0].calls) == 2
+
+def test_invalid_output_is_rejected_and_not_cached(fake, tmp_path):
+    models, made = fake
+    cache = tmp_path / "llm.sqlite"
+    generate_text("load", models)
+    made[0].output = "rules: - not json"
+    with pytest.raises(ValueError):
+        prompt_to_rules_yaml("pdf 정리", models, cache_path=cache)
+    made[0].output = json.dumps(RULES)
+    prompt_to_rules_yaml("pdf 정리", models, cache_path=cache)
+    assert len(made[0].calls) == 3
+
+@pytest.mark.parametrize("text", [
+    "not json",
+    "[]",
+    '{"rules": []}',
+    '{"rules": [{"name": "a"}]}',
+    '{"rules": [{"name": "a", "dest": "b", "match": {"size": [1]}}]}',
+    '{"rules": [{"name": "a", "dest": "b", "match": {"ext": ".pdf"}}]}',
+])
+def test_validate_rules_json_rejects(text):
+    with pytest.raises(ValueError):
+        validate_rules_json(text)
+
+def test_validate_rules_json_accepts():
+    assert json.loads(validate_rules_json(json.dumps(RULES))) == RULES
+
+def test_failed_load_is_retried_on_next_call(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "fake.gguf").write_bytes(b"weights")
+    attempts = []
+
+    def flaky(model_file: str, model_dir: Path) -> FakeModel:
+        attempts.append(model_file)
+        if len(attempts) == 1:
+            raise OSError("download interrupted")
+        return FakeModel(model_file, model_dir)
+
+    set_model_factory(flaky)
+    try:
+        with pytest.raises(OSError):
+            generate_text("a", models)
+        assert json.loads(generate_text("b", models)) == RULES
+        assert json.loads(generate_text("c", models)) == RULES
+        assert len(attempts) == 2
+    finally:
+        set_model_factory(None)
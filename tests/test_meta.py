@@ -0,0 +1,124 @@
+from __future__ import annotations
+import zlib
+from pathlib import Path
+
+from aifiler.meta import cheap_meta_peek, peek_with_stats
+
+PAD = 100 * 1024  # Info 객체가 끝부분 64 KiB 밖에 놓이도록 하는 채움 스트림
+
+def _xref_stream_pdf(path: Path, flate: bool = False, objstm: bool = False, bad_startxref: bool = False,
+                     head_pad: bool = True) -> None:
+    """
+    PDF 1.5+ 형식(xref 스트림)의 최소 문서. Info(2번)는 가운데, xref 스트림(4번)은 끝에 둠.
+    head_pad=False 이면 Info 가 앞쪽 64 KiB 안에 놓임(앞부분 검색 대체 경로용).
+    """
+    out = bytearray(b"%PDF-1.5\n")
+    offs = {}
+
+    def obj(num: int, body: bytes) -> None:
+        offs[num] = len(out)
+        out.extend(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def stream(num: int, d: bytes, data: bytes) -> None:
+        obj(num, b"<< " + d + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+
+    obj(1, b"<< /Type /Catalog >>")
+    if head_pad:
+        stream(6, b"", b"\0" * PAD)
+    info = b"<< /Title (Receipt 2024) /Producer (scanner) >>"
+    if objstm:
+        hdr = b"2 0 "
+        stream(5, b"/Type /ObjStm /N 1 /First %d" % len(hdr), hdr + info)
+    else:
+        obj(2, info)
+    stream(3, b"", b"\0" * PAD)
+    offs[4] = len(out)
+    rows = [(0, 0, 0xFFFF), (1, offs[1], 0)]
+    rows.append((2, 5, 0) if objstm else (1, offs[2], 0))
+    rows += [(1, offs[3], 0), (1, offs[4], 0)]
+    rows.append((1, offs[5], 0) if objstm else (0, 0, 0))
+    if head_pad:
+        rows.append((1, offs[6], 0))
+    raw = b"".join(t.to_bytes(1, "big") + f2.to_bytes(4, "big") + f3.to_bytes(2, "big") for t, f2, f3 in rows)
+    d = b"/Type /XRef /W [1 4 2] /Index [0 %d] /Size %d /Root 1 0 R /Info 2 0 R" % (len(rows), len(rows))
+    if flate:
+        # PNG Up 예측자(행마다 필터 바이트 2 + 이전 행과의 차이)
+        prev, pred = bytes(7), bytearray()
+        for i in range(0, len(raw), 7):
+            row = raw[i:i + 7]
+            pred += b"\x02" + bytes((a - b) & 0xFF for a, b in zip(row, prev))
+            prev = row
+        raw = zlib.compress(bytes(pred))
+        d += b" /Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 7 >>"
+    stream(4, d, raw)
+    out.extend(b"startxref\n%d\n%%%%EOF\n" % (1 if bad_startxref else offs[4]))
+    path.write_bytes(bytes(out))
+
+def test_pdf_info_via_uncompressed_xref_stream(tmp_path):
+    p = tmp_path / "a.pdf"
+    _xref_stream_pdf(p)
+    (label, _, why), read = peek_with_stats(p)
+    assert (label, why) == ("receipts_pdf", "meta:pdfinfo")
+    assert read < 80 * 1024  # 끝부분 + Info 객체 위치만 읽음(앞쪽 채움 스트림은 건너뜀)
+
+def test_pdf_info_via_flate_xref_stream(tmp_path):
+    p = tmp_path / "b.pdf"
+    _xref_stream_pdf(p, flate=True)
+    assert cheap_meta_peek(p)[0] == "receipts_pdf"
+
+def test_pdf_info_in_object_stream(tmp_path):
+    p = tmp_path / "c.pdf"
+    _xref_stream_pdf(p, flate=True, objstm=True)
+    assert cheap_meta_peek(p)[0] == "receipts_pdf"
+
+def test_pdf_info_head_fallback_when_xref_unreadable(tmp_path):
+    p = tmp_path / "d.pdf"
+    _xref_stream_pdf(p, bad_startxref=True, head_pad=False)
+    assert cheap_meta_peek(p)[0] == "receipts_pdf"
+
+def _linearized_pdf(path: Path) -> None:
+    """
+    선형화(Fast Web View) 배치: 첫 페이지 xref/트레일러(/Info, /Prev)는 앞쪽, 본 xref 는 끝에 있고
+    끝의 트레일러에는 /Info 가 없음. 마지막 startxref 는 첫 페이지 xref 를 가리킴. Info(4번)는 가운데.
+    """
+    def build(prev: int, first_xref: int) -> tuple[bytes, int, int]:
+        out = bytearray(b"%PDF-1.4\n")
+        offs = {}
+
+        def obj(num: int, body: bytes) -> None:
+            offs[num] = len(out)
+            out.extend(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+        def xref(subs) -> None:
+            for first, count in subs:
+                out.extend(b"%d %d\n" % (first, count))
+                for num in range(first, first + count):
+                    out.extend(b"%010d 00000 n \n" % offs[num] if num in offs else b"0000000000 65535 f \n")
+
+        obj(1, b"<< /Linearized 1 /L 0 /O 2 /N 1 >>")
+        fx = len(out)
+        out.extend(b"xref\n")
+        xref([(1, 2)])
+        out.extend(b"trailer\n<< /Size 6 /Root 2 0 R /Info 4 0 R /Prev %010d >>\nstartxref\n0\n%%%%EOF\n" % prev)
+        obj(2, b"<< /Type /Catalog >>")
+        pad = b"\0" * PAD
+        obj(3, b"<< /Length %d >>\nstream\n" % len(pad) + pad + b"\nendstream")
+        obj(4, b"<< /Title (Invoice 2024) /Creator (writer) >>")
+        obj(5, b"<< /Length %d >>\nstream\n" % len(pad) + pad + b"\nendstream")
+        mx = len(out)
+        out.extend(b"xref\n")
+        xref([(0, 1), (3, 3)])
+        out.extend(b"trailer\n<< /Size 6 >>\nstartxref\n%d\n%%%%EOF\n" % first_xref)
+        return bytes(out), fx, mx
+
+    _, fx, mx = build(0, 0)
+    data, fx2, mx2 = build(mx, fx)
+    assert (fx2, mx2) == (fx, mx)
+    path.write_bytes(data)
+
+def test_pdf_info_in_linearized_first_page_trailer(tmp_path):
+    p = tmp_path / "lin.pdf"
+    _linearized_pdf(p)
+    (label, _, why), read = peek_with_stats(p)
+    assert (label, why) == ("receipts_pdf", "meta:pdfinfo")
+    assert read < 96 * 1024  # 끝부분 + 첫 페이지 xref/트레일러 + Info 객체(앞부분 전체는 읽지 않음)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+import time
+from pathlib import Path
+
+import aifiler.recommender as recommender
+from aifiler.scanner import FileEntry
+
+def _entries(tmp_path: Path, n: int):
+    out = []
+    for i in range(n):
+        p = tmp_path / f"blob_{i:03d}.bin"   # 이름/이웃 단계로 정해지지 않는 파일 → 모두 메타 단계로 감
+        p.write_bytes(b"x")
+        out.append(FileEntry(path=p, is_dir=False, size=1, mtime=0.0))
+    return out
+
+def test_meta_timeout_counts_from_task_start(tmp_path, monkeypatch):
+    # 각 확인은 0.4초 → 제한 1초 안에 끝나야 함. 대기열에서 기다린 시간이 섞이면 뒤쪽이 줄줄이 timeout 남
+    def slow_peek(path):
+        time.sleep(0.4)
+        return None, 0.0, ""
+    monkeypatch.setattr(recommender, "cheap_meta_peek", slow_peek)
+    files = _entries(tmp_path, 24)
+    out = list(recommender.recommend_batch(files, use_meta=True, workers=4, timeout=1.0))
+    assert [e.path for e, _ in out] == [e.path for e in files]
+    assert not [r for _, r in out if r.get("why") == "meta:timeout"]
+
+def test_meta_timeout_still_applies_to_slow_peek(tmp_path, monkeypatch):
+    def peek(path):
+        if path.name == "blob_001.bin":
+            time.sleep(1.0)
+        return None, 0.0, ""
+    monkeypatch.setattr(recommender, "cheap_meta_peek", peek)
+    out = list(recommender.recommend_batch(_entries(tmp_path, 6), use_meta=True, workers=2, timeout=0.3))
+    assert [r.get("why") == "meta:timeout" for _, r in out] == [False, True, False, False, False, False]
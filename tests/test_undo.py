@@ -0,0 +1,68 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+
+from aifiler.actions import MoveExecutor, apply_moves_with_stats
+from aifiler.undo import rollback_batch_report, rollback_moves
+from aifiler.undostore import UndoStore
+
+def _write(p: Path, text: str) -> Path:
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(text, encoding="utf-8")
+    return p
+
+def test_rollback_chain_where_later_move_takes_vacated_slot(tmp_path):
+    # A→B 다음 B→C: 역순으로 C→B, B→A 여야 A 의 내용이 A 로 돌아옴
+    a, b, c = tmp_path / "A", tmp_path / "B", tmp_path / "C"
+    _write(a, "a")
+    moves = [(a, b), (b, c)]
+    MoveExecutor().run(moves)
+    assert c.read_text() == "a" and not a.exists() and not b.exists()
+    report = rollback_moves(moves, [])
+    assert a.read_text() == "a"
+    assert not b.exists() and not c.exists()
+    assert report.conflicts == []
+
+def test_rollback_chain_when_earlier_move_overwrote_slot(tmp_path):
+    a, b, c = tmp_path / "A", tmp_path / "B", tmp_path / "C"
+    _write(a, "a")
+    _write(b, "b")          # A→B 가 기존 B 를 덮어씀(원래 B 내용은 복구 불가)
+    moves = [(a, b), (b, c)]
+    MoveExecutor().run(moves)
+    report = rollback_moves(moves, [])
+    assert a.read_text() == "a"
+    assert not c.exists()
+    assert report.conflicts == []
+
+def test_rollback_swap_cycle(tmp_path):
+    a, b, t = tmp_path / "A", tmp_path / "B", tmp_path / "T"
+    _write(a, "a")
+    _write(b, "b")
+    moves = [(a, t), (b, a), (t, b)]
+    MoveExecutor().run(moves)
+    assert a.read_text() == "b" and b.read_text() == "a"
+    rollback_moves(moves, [])
+    assert a.read_text() == "a" and b.read_text() == "b" and not t.exists()
+
+def test_conflicts_are_kept_as_residual_batch(tmp_path):
+    undo_log = tmp_path / "undo.jsonl"
+    src1, src2 = _write(tmp_path / "in" / "x.txt", "x"), _write(tmp_path / "in" / "y.txt", "y")
+    dst1, dst2 = tmp_path / "out" / "x.txt", tmp_path / "out" / "y.txt"
+    batch_id, _ = apply_moves_with_stats([(src1, dst1), (src2, dst2)], undo_log, journal_dir=tmp_path / "journal")
+    _write(src2, "new")     # 원래 자리를 다른 파일이 차지 → occupied
+    report = rollback_batch_report(undo_log, batch_id)
+    assert report.restored == 1
+    assert [c["reason"] for c in report.conflicts] == ["occupied"]
+    with UndoStore(undo_log, journal_dir=tmp_path / "journal") as store:
+        batches = store.list_batches()
+        assert len(batches) == 1 and batches[0]["id"] != batch_id
+        rec = store.get(batches[0]["id"])
+    assert rec["residual_of"] == batch_id
+    assert rec["moves"] == [{"src": str(src2), "dst": str(dst2)}]
+    # 자리를 비우면 잔여 배치로 다시 시도 가능
+    src2.unlink()
+    report = rollback_batch_report(undo_log, rec["id"])
+    assert report.restored == 1 and report.conflicts == []
+    assert src2.read_text() == "y"
+    assert not (tmp_path / "out").exists()
+    assert json.loads(undo_log.read_text(encoding="utf-8").splitlines()[-1]) == {"tombstone": rec["id"]}
@@ -0,0 +1,54 @@
+from __future__ import annotations
+import os, random
+from pathlib import Path
+
+from aifiler.recommender import plan_destinations, recommend_batch
+from aifiler.rules import Rule
+from aifiler.scanner import FileEntry
+from aifiler.watch import LiveIndex
+
+RULES = [Rule("photos_by_date", {}, "사진/{year}/{month}", {}), Rule("receipts_pdf", {}, "재무/영수증/{year}", {})]
+BASE = Path("/dest")
+NAMES = ["a_photo.png", "b_영수증.pdf", "c_notes.txt", "d_IMG_1.jpg", "e_invoice.pdf", "f_draft.pdf",
+         "g_pic.jpeg", "h_data.csv"]
+
+def _entry(p: str, mtime: float) -> FileEntry:
+    return FileEntry(Path(p), False, 10, mtime)
+
+def _batch_plan(files):
+    """같은 파일 집합을 경로 순으로 한 번에 다시 계산한 계획."""
+    files = sorted(files, key=lambda e: os.fspath(e.path))
+    names = [rec["rule"] for _, rec in recommend_batch(files)]
+    dsts = plan_destinations(files, names, {r.name: r for r in RULES}, BASE, as_str=True)
+    return {os.fspath(e.path): d for e, d in zip(files, dsts) if d != os.fspath(e.path)}
+
+def test_tie_break_does_not_depend_on_event_history():
+    idx = LiveIndex(RULES, BASE)
+    for n in ("a_photo.png", "b_영수증.pdf", "c_notes.txt"):
+        idx.add_file(_entry(f"/w/{n}", 1.7e9))
+    idx.settle()
+    assert idx.rules_of["/w/c_notes.txt"] == "photos_by_date"   # 1:1 동률 → 경로가 앞선 a_photo 의 라벨
+    # 사진 라벨이 0 개가 됐다가 다시 생겨도 동률 판정은 그대로
+    idx.remove_file("/w/a_photo.png")
+    idx.settle()
+    assert idx.rules_of["/w/c_notes.txt"] == "receipts_pdf"
+    idx.add_file(_entry("/w/a_photo.png", 1.7e9))
+    idx.settle()
+    assert idx.rules_of["/w/c_notes.txt"] == "photos_by_date"
+    assert idx.dest == _batch_plan(idx.files.values())
+
+def test_random_events_match_batch_recompute():
+    rng = random.Random(7)
+    idx = LiveIndex(RULES, BASE)
+    dirs = ["/w/x", "/w/y", "/w/y/z"]
+    for step in range(400):
+        p = f"{rng.choice(dirs)}/{rng.choice(NAMES)}"
+        if p in idx.files and rng.random() < 0.6:
+            idx.remove_path(p)
+        else:
+            idx.add_file(_entry(p, 1.6e9 + rng.randrange(4) * 4e7))  # 다시 추가되면 날짜(목적지)도 바뀔 수 있음
+        if step % 5 == 0 or rng.random() < 0.2:
+            idx.settle()
+            assert idx.dest == _batch_plan(idx.files.values()), step
+    idx.settle()
+    assert idx.dest == _batch_plan(idx.files.values())